@@ -0,0 +1,104 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Batch rendering benchmark: render_parameters() against one entry point call per parameter.
+
+Generates parameters of all four types the way Python wrappers do, renders them both ways,
+checks that the output is identical and reports the time per parameter:
+
+    python benchmarks/bench_batch.py                  # 10k parameters
+    python benchmarks/bench_batch.py --parameters 100000 --repeat 3
+"""
+
+import argparse
+import gc
+import sys
+import time
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import active_choice
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+KINDS = sorted(active_choice.SPECS)
+
+
+def make_items(count, variants):
+    items = []
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        data = {'name': 'PARAM_%d' % i, 'project': 'project-%d' % (i % 100), 'description': 'parameter %d' % i}
+        script = "return ['%d-a', '%d-b']" % (i % variants, i % variants)
+        if kind == 'cascade-choice':
+            data.update({'script': script, 'fallback-script': "return ['none']", 'reference': 'PARAM_0'})
+        else:
+            data['groovy'] = {'script': script, 'sandbox': True}
+            if kind != 'active-choice':
+                data['reference'] = 'PARAM_0'
+                data['fallback'] = {'script': "return ['none']"}
+        items.append((kind, data))
+    return items
+
+
+def one_by_one(items):
+    parent = Xml.Element('parameterDefinitions')
+    for kind, data in items:
+        active_choice.ENTRY_POINTS[kind](None, parent, data)
+    return parent
+
+
+def batch(items):
+    parent = Xml.Element('parameterDefinitions')
+    active_choice.render_parameters(parent, items)
+    return parent
+
+
+def best_of(func, items, repeat):
+    best = result = None
+    for _ in range(repeat):
+        # the previous tree is freed and the collector kept out of the measurement, like timeit does
+        result = None
+        gc.collect()
+        gc.disable()
+        try:
+            start = _clock()
+            result = func(items)
+            elapsed = _clock() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, Xml.tostring(result)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--parameters', type=int, default=10000)
+    args.add_argument('--variants', type=int, default=50, help='number of distinct scripts')
+    args.add_argument('--repeat', type=int, default=5, help='runs per mode, the best one is reported')
+    args = args.parse_args(argv)
+
+    items = make_items(args.parameters, args.variants)
+    single_seconds, single = best_of(one_by_one, items, args.repeat)
+    batch_seconds, batched = best_of(batch, items, args.repeat)
+    if single != batched:
+        print('batch output differs from the entry points')
+        return 1
+
+    for name, seconds in (('entry points', single_seconds), ('render_parameters', batch_seconds)):
+        print('%-18s %8.3fs %8.2fus/parameter' % (name, seconds, seconds / args.parameters * 1e6))
+    print('speedup: %.2fx' % (single_seconds / batch_seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Process-parallel rendering benchmark: wall time of a fleet rendered with 1 .. N worker processes.
+
+Generates the same synthetic fleet as bench_render.py, expands it once and renders it with an
+increasing number of processes, checking that the output is byte-identical to the serial path:
+
+    python benchmarks/bench_parallel.py                        # 1000 jobs, 1 .. cpu count processes
+    python benchmarks/bench_parallel.py --jobs 10000 --processes 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_render import generate_project
+
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import parallel
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--jobs', type=int, default=1000)
+    args.add_argument('--script-size', type=int, default=2000)
+    args.add_argument('--processes', type=int, nargs='+',
+                      default=sorted(set([1, 2, 4, multiprocessing.cpu_count()])))
+    args = args.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='jjb-active-choice-bench-')
+    try:
+        yaml_parser = jobs.load([generate_project(directory, args.jobs, args.script_size, 2, 2)])
+    finally:
+        shutil.rmtree(directory)
+
+    start = _clock()
+    serial = parallel.render_serial(yaml_parser)
+    baseline = _clock() - start
+    print('%-12s %8.3fs %8.1f jobs/s' % ('serial', baseline, args.jobs / baseline))
+    for processes in args.processes:
+        start = _clock()
+        rendered = parallel.render(yaml_parser, processes)
+        elapsed = _clock() - start
+        if rendered != serial:
+            print('output of %d processes differs from the serial path' % processes)
+            return 1
+        print('%-12s %8.3fs %8.1f jobs/s  speedup %.2fx' % (
+            '%d process%s' % (processes, 'es' if processes > 1 else ''), elapsed, args.jobs / elapsed,
+            baseline / elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
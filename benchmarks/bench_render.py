@@ -0,0 +1,266 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Synthetic-fleet benchmark for active choice XML generation.
+
+Generates YAML projects that mix all four parameter types, renders them through the same
+parser.YamlParser path the tests use and reports jobs/sec, per-parameter latency percentiles
+and peak memory. Every scenario runs in a fresh process so peak memory is per scenario.
+
+    python benchmarks/bench_render.py                         # quick preset
+    python benchmarks/bench_render.py --preset full           # 100 .. 50k jobs
+    python benchmarks/bench_render.py --jobs 5000 --script-size 100000
+    python benchmarks/bench_render.py --save-baseline baseline.json
+    python benchmarks/bench_render.py --baseline baseline.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+PRESETS = {
+    # (jobs, script bytes, classpath entries, scriptler parameters)
+    'quick': [
+        (100, 200, 2, 2),
+        (1000, 200, 2, 2),
+        (100, 100000, 50, 200),
+    ],
+    'full': [
+        (100, 200, 2, 2),
+        (1000, 200, 2, 2),
+        (10000, 200, 2, 2),
+        (50000, 200, 2, 2),
+        (100, 100000, 50, 200),
+        (1000, 100000, 50, 200),
+        (10000, 5000, 200, 1000),
+    ],
+}
+
+# number of distinct scripts in a fleet, jobs share them round-robin like templated jobs do
+SCRIPT_VARIANTS = 10
+
+
+def scenario_name(jobs, script_size, classpath, scriptler_params):
+    return 'jobs=%d,script=%d,classpath=%d,scriptler=%d' % (jobs, script_size, classpath, scriptler_params)
+
+
+def make_script(size, variant):
+    lines = ['// synthetic script %d' % variant, 'def result = []']
+    total = sum(len(x) + 1 for x in lines)
+    i = 0
+    while total < size:
+        line = "result << 'item-%d-%d'  // padding to reach the requested size" % (variant, i)
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    lines.append('return result')
+    return '\n'.join(lines) + '\n'
+
+
+def make_job(index, scripts, classpath, scriptler_params):
+    script = scripts[index % len(scripts)]
+    return {'job': {
+        'name': 'bench-job-%d' % index,
+        'parameters': [
+            {'string': {'name': 'STR_PARAM', 'default': 'x'}},
+            {'active-choice': {
+                'name': 'CHOICE',
+                'project': 'bench-job-%d' % index,
+                'groovy': {'script': script, 'sandbox': True, 'classpath': classpath},
+                'choice-type': 'multi',
+            }},
+            {'active-choice-reactive': {
+                'name': 'REACTIVE',
+                'project': 'bench-job-%d' % index,
+                'groovy': {'script': script},
+                'fallback': {'script': "return ['error']\n", 'sandbox': True},
+                'reference': 'STR_PARAM,CHOICE',
+            }},
+            {'active-choice-reactive-reference': {
+                'name': 'REFERENCE',
+                'project': 'bench-job-%d' % index,
+                'scriptler': {'script': 'bench.groovy', 'parameters': scriptler_params},
+                'reference': 'REACTIVE',
+                'choice-type': 'formatted-html',
+            }},
+            {'cascade-choice': {
+                'name': 'CASCADE',
+                'project': 'bench-job-%d' % index,
+                'script': script,
+                'reference': 'CHOICE',
+            }},
+        ],
+    }}
+
+
+def generate_project(directory, jobs, script_size, classpath, scriptler_params):
+    """Writes a synthetic fleet and returns the path of the yaml file."""
+    scripts = [make_script(script_size, i) for i in range(SCRIPT_VARIANTS)]
+    classpath = ','.join('file:/opt/lib/dependency-%d.jar' % i for i in range(classpath))
+    scriptler_params = [{'PARAM_%d' % i: 'value-%d' % i} for i in range(scriptler_params)]
+    path = os.path.join(directory, 'fleet.yaml')
+    with open(path, 'w') as stream:
+        yaml.safe_dump([make_job(i, scripts, classpath, scriptler_params) for i in range(jobs)], stream)
+    return path
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def latency_percentiles(seconds):
+    return dict((name, percentile(seconds, fraction) * 1e6)
+                for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)))
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def run_scenario(jobs, script_size, classpath, scriptler_params):
+    from jenkins_jobs import parser
+    from jenkins_jobs_active_choice import stats
+
+    latencies = {}
+
+    def hook(kind, element, elapsed):
+        latencies.setdefault(kind, []).append(elapsed)
+
+    directory = tempfile.mkdtemp(prefix='jjb-active-choice-bench-')
+    try:
+        path = generate_project(directory, jobs, script_size, classpath, scriptler_params)
+        start = _clock()
+        yaml_parser = parser.YamlParser()
+        yaml_parser.parse(path)
+        yaml_parser.expandYaml()
+        parse_seconds = _clock() - start
+
+        stats.add_hook(hook)
+        try:
+            start = _clock()
+            output_bytes = 0
+            for job in yaml_parser.jobs:
+                output_bytes += len(yaml_parser.getXMLForJob(job).output())
+            render_seconds = _clock() - start
+        finally:
+            stats.remove_hook(hook)
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'name': scenario_name(jobs, script_size, classpath, scriptler_params),
+        'jobs': jobs,
+        'parse_seconds': parse_seconds,
+        'render_seconds': render_seconds,
+        'jobs_per_sec': jobs / render_seconds,
+        'output_mb': output_bytes / (1024.0 * 1024.0),
+        'peak_memory_mb': peak_memory_mb(),
+        'latency_us': dict((kind, latency_percentiles(values)) for kind, values in latencies.items()),
+    }
+
+
+def run_isolated(scenario):
+    pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+    try:
+        return pool.apply(run_scenario, scenario)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def print_result(result):
+    memory = result['peak_memory_mb']
+    print('%s: %.1f jobs/sec, render %.2fs, parse %.2fs, output %.1f MB, peak memory %s' % (
+        result['name'], result['jobs_per_sec'], result['render_seconds'], result['parse_seconds'],
+        result['output_mb'], '%.1f MB' % memory if memory is not None else 'n/a'))
+    for kind, latency in sorted(result['latency_us'].items()):
+        print('    %-34s p50 %8.1fus  p90 %8.1fus  p99 %8.1fus' % (
+            kind, latency['p50'], latency['p90'], latency['p99']))
+
+
+def compare(results, baseline, tolerance):
+    """Returns the names of scenarios whose throughput dropped below the baseline."""
+    regressions = []
+    for result in results:
+        reference = baseline.get(result['name'])
+        if reference is None:
+            continue
+        ratio = result['jobs_per_sec'] / reference['jobs_per_sec']
+        print('%s: %.1f%% of baseline throughput' % (result['name'], ratio * 100))
+        if ratio < 1.0 - tolerance:
+            regressions.append(result['name'])
+    return regressions
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    args.add_argument('--jobs', type=int, nargs='+', help='run a custom matrix instead of a preset')
+    args.add_argument('--script-size', type=int, nargs='+', default=[200])
+    args.add_argument('--classpath', type=int, default=2, help='classpath entries per groovy block')
+    args.add_argument('--scriptler-params', type=int, default=2, help='parameters per scriptler block')
+    args.add_argument('--json', help='write results to this file')
+    args.add_argument('--baseline', help='compare throughput against a saved baseline')
+    args.add_argument('--tolerance', type=float, default=0.1, help='allowed throughput drop (default 10%%)')
+    args.add_argument('--save-baseline', help='store the results as a baseline')
+    args = args.parse_args(argv)
+
+    if args.jobs:
+        scenarios = [(jobs, size, args.classpath, args.scriptler_params)
+                     for jobs in args.jobs for size in args.script_size]
+    else:
+        scenarios = PRESETS[args.preset]
+
+    results = []
+    for scenario in scenarios:
+        result = run_isolated(scenario)
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump(results, stream, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as stream:
+            json.dump(dict((r['name'], r) for r in results), stream, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as stream:
+            regressions = compare(results, json.load(stream), args.tolerance)
+        if regressions:
+            print('throughput regressions: %s' % ', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
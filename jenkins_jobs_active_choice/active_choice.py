@@ -13,9 +13,21 @@
 
 # use system logging
 import xml.etree.ElementTree as Xml
+import collections
 import re
-import sys
 import logging
+import math
+
+from jenkins_jobs_active_choice import analyzer
+from jenkins_jobs_active_choice import cache
+from jenkins_jobs_active_choice import compat
+from jenkins_jobs_active_choice import files
+from jenkins_jobs_active_choice import groovy as groovy_library
+from jenkins_jobs_active_choice import scriptler as scriptler_library
+from jenkins_jobs_active_choice import stats
+from jenkins_jobs_active_choice import templates
+
+logger = logging.getLogger(__name__)
 
 # XXXXXX still here for backwards compatibility
 # these are common tags for both cascade-choice and dynamic-reference
@@ -33,13 +45,14 @@ FALLBACK_OPTIONAL = [
 ]
 
 
+# compiled once, these are matched for every sandbox and classpath entry
+_SANDBOX_RE = re.compile(r"(true|false)")
+_CLASSPATH_RE = re.compile(r"(file:/|https*://)", re.IGNORECASE)
+
+
 def _to_str(x):
-    if (sys.version_info > (3, 0)):
-        if not isinstance(x, (str, str)):
-            return str(x).lower()
-    else:
-        if not isinstance(x, (str, unicode)):
-            return str(x).lower()
+    if not isinstance(x, compat.STRING_TYPES):
+        return str(x).lower()
     return x
 
 
@@ -57,13 +70,14 @@ def _add_script(xml_parent, tag, value):
 def _add_sandbox(xml_parent, data):
     if data:
         # check for true/false
-        if not re.match(r"(true|false)", _to_str(data)):
-            raise Exception("sandbox must be true or false, not this: '%s'" % _to_str(data))
+        value = _to_str(data)
+        if not _SANDBOX_RE.match(value):
+            raise Exception("sandbox must be true or false, not this: '%s'" % value)
         else:
-            _add_element(xml_parent, 'sandbox', _to_str(data))
+            Xml.SubElement(xml_parent, 'sandbox').text = value
     else:
         # default
-        _add_element(xml_parent, 'sandbox', 'false')
+        Xml.SubElement(xml_parent, 'sandbox').text = 'false'
 
 
 def _add_classpath(xml_parent, data):
@@ -71,21 +85,101 @@ def _add_classpath(xml_parent, data):
         # create the classpath section
         section = Xml.SubElement(xml_parent, 'classpath')
         # add the elements
-        uri_match = re.compile(r"(file:/|https*://)", re.IGNORECASE)
         for url in [x.strip() for x in data.split(',')]:
-            if uri_match.match(url):
-                _add_element(section, 'entry', url)
+            if _CLASSPATH_RE.match(url):
+                Xml.SubElement(section, 'entry').text = url
             else:
                 raise Exception("classpath entries must start with file:/... or http[s]://... : %s" % url)
 
 
-def _add_groovy(xml_parent, param_name, groovy_data, fallback_data):
-    script_section = Xml.SubElement(xml_parent, 'script', {'class': 'org.biouno.unochoice.model.GroovyScript'})
+def _worth_caching(*sections):
+    # a bare script and sandbox pair is built faster than its cache key is computed and copied
+    return any(section.get('classpath') or groovy_library.minify_enabled(section) for section in sections if section)
+
+
+def _is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _is_timeout(value):
+    # the generated wrapper waits in whole milliseconds
+    return (isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isinf(value) and
+            value >= 0.001)
+
+
+# options of the groovy section that wrap the script in generated code
+_WRAPPER_OPTIONS = ('cache-ttl', 'cache-size', 'timeout')
+
+
+def _wrapper_errors(param_name, groovy_data, fallback_data):
+    errors = []
+    if isinstance(fallback_data, dict) and any(x in fallback_data for x in _WRAPPER_OPTIONS):
+        errors.append("cache-ttl, cache-size and timeout are only supported in the groovy section of %s" % param_name)
+    if 'cache-ttl' in groovy_data:
+        if not _is_positive_int(groovy_data['cache-ttl']):
+            errors.append("cache-ttl must be a positive number of seconds, not this: '%s'" % groovy_data['cache-ttl'])
+        if 'cache-size' in groovy_data and not _is_positive_int(groovy_data['cache-size']):
+            errors.append("cache-size must be a positive number, not this: '%s'" % groovy_data['cache-size'])
+    elif 'cache-size' in groovy_data:
+        errors.append("cache-size needs cache-ttl in %s" % param_name)
+    if 'timeout' in groovy_data and not _is_timeout(groovy_data['timeout']):
+        errors.append("timeout must be a finite number of seconds of at least 0.001, not this: '%s'"
+                      % groovy_data['timeout'])
+    wrapped = [x for x in ('cache-ttl', 'timeout') if x in groovy_data]
+    if wrapped and _to_str(groovy_data.get('sandbox')) == 'true':
+        errors.append("%s cannot be used with sandbox: true in %s, the generated code is not allowed in the "
+                      "sandbox" % (' and '.join(wrapped), param_name))
+    # the generated code runs the scripts in closures, where groovy does not accept declarations
+    sections = [('groovy', groovy_data)] if wrapped else []
+    if 'timeout' in groovy_data and isinstance(fallback_data, dict):
+        sections.append(('fallback', fallback_data))
+    for section, data in sections:
+        if not isinstance(data.get('script'), compat.STRING_TYPES):
+            continue
+        try:
+            names = groovy_library.declarations(_to_str(data['script']))
+        except Exception as e:
+            errors.append("%s in the %s section of %s" % (e, section, param_name))
+            continue
+        if names:
+            errors.append("%s cannot be used in %s, the %s script declares methods or classes: %s"
+                          % (' and '.join(wrapped), param_name, section, ', '.join(names)))
+    return errors
+
+
+def _wrapped(script, param_name, groovy_data, fallback_data, reference, store):
+    errors = _wrapper_errors(param_name, groovy_data, fallback_data)
+    if errors:
+        raise Exception(errors[0])
+    if 'cache-ttl' in groovy_data:
+        script = templates.memoize(script, param_name, store, reference, groovy_data['cache-ttl'],
+                                   groovy_data.get('cache-size', templates.DEFAULT_CACHE_SIZE))
+    if 'timeout' in groovy_data:
+        # outside of the result cache, so that fallback results are never cached
+        fallback = fallback_data.get('script') if fallback_data else None
+        script = templates.timeout(script, param_name, store, groovy_data['timeout'],
+                                   _to_str(fallback) if fallback else None)
+    return script
+
+
+def _add_groovy(xml_parent, param_name, groovy_data, fallback_data, reference=None, store=None):
+    # the same groovy/fallback blocks are shared by many jobs, reuse the already validated subtree
+    key = None
+    if cache.subtree_cache.size and _worth_caching(groovy_data, fallback_data):
+        key = cache.key('groovy', groovy_data, fallback_data)
+        if key is not None and ('cache-ttl' in groovy_data or 'timeout' in groovy_data):
+            # the generated wrappers also depend on the parameter they are rendered for
+            key += (param_name, reference, store)
+    if cache.subtree_cache.graft(xml_parent, key):
+        return
+
+    script_section = Xml.Element('script', {'class': 'org.biouno.unochoice.model.GroovyScript'})
 
     script = groovy_data.get('script')
     if script:
+        script = _wrapped(_to_str(script), param_name, groovy_data, fallback_data, reference, store)
         section = Xml.SubElement(script_section, 'secureScript')
-        _add_element(section, 'script', script)
+        Xml.SubElement(section, 'script').text = groovy_library.script_text(groovy_data, script)
         _add_sandbox(section, groovy_data.get('sandbox'))
         _add_classpath(section, groovy_data.get('classpath'))
     else:
@@ -95,10 +189,13 @@ def _add_groovy(xml_parent, param_name, groovy_data, fallback_data):
         script = fallback_data.get('script')
         if script:
             section = Xml.SubElement(script_section, 'secureFallbackScript')
-            _add_element(section, 'script', script)
+            Xml.SubElement(section, 'script').text = groovy_library.script_text(fallback_data, _to_str(script))
             _add_sandbox(section, fallback_data.get('sandbox'))
             _add_classpath(section, fallback_data.get('classpath'))
 
+    cache.subtree_cache.put(key, script_section)
+    xml_parent.append(script_section)
+
 
 def _add_scriptler_parameters(xml_parent, data):
     # create the parameters section
@@ -108,12 +205,16 @@ def _add_scriptler_parameters(xml_parent, data):
         for d in data:
             for k, v in d.items():
                 entry = Xml.SubElement(parameters, 'entry')
-                _add_element(entry, "string", k)
-                _add_element(entry, "string", v)
+                Xml.SubElement(entry, 'string').text = _to_str(k)
+                Xml.SubElement(entry, 'string').text = _to_str(v)
 
 
 def _add_scriptler(xml_parent, param_name, data):
-    section = Xml.SubElement(xml_parent, 'script', {'class': 'org.biouno.unochoice.model.ScriptlerScript'})
+    key = cache.key('scriptler', data) if cache.subtree_cache.size and data.get('parameters') else None
+    if cache.subtree_cache.graft(xml_parent, key):
+        return
+
+    section = Xml.Element('script', {'class': 'org.biouno.unochoice.model.ScriptlerScript'})
 
     script = data['script']
     if script:
@@ -122,12 +223,87 @@ def _add_scriptler(xml_parent, param_name, data):
     else:
         raise Exception("missing Scriptler script argument in %s" % param_name)
 
+    cache.subtree_cache.put(key, section)
+    xml_parent.append(section)
+
 
 def _unique_string(project, name):
     return 'choice-param-{0}-{1}'.format(project, name).lower()
 
 
+# a parameter type, with its tables compiled once at import instead of on every call:
+# optional defaults are already converted to their xml text
+ParameterSpec = collections.namedtuple('ParameterSpec', ['kind', 'element_name', 'required', 'optional', 'choice_type'])
+
+
+def _compile_spec(kind, element_name, optional, choice_type):
+    required = (
+        # fields( yaml tag, xml tag )
+        ('name', 'name'),
+        ('project', 'projectName'),
+    )
+    return ParameterSpec(kind, element_name, required,
+                         tuple((name, tag, _to_str(default)) for name, tag, default in optional),
+                         dict(choice_type))
+
+
+CHOICE_TYPE = {
+    'default': 'PT_SINGLE_SELECT',
+    'single': 'PT_SINGLE_SELECT',
+    'multi': 'PT_MULTI_SELECT',
+    'checkbox': 'PT_CHECKBOX',
+    'radio': 'PT_RADIO',
+}
+
+REFERENCE_CHOICE_TYPE = {
+    'default': 'ET_TEXT_BOX',
+    'input-text': 'ET_TEXT_BOX',
+    'numbered-list': 'ET_ORDERED_LIST',
+    'bullet-list': 'ET_UNORDERED_LIST',
+    'formatted-html': 'ET_FORMATTED_HTML',
+    'formatted-hidden-html': 'ET_FORMATTED_HIDDEN_HTML'
+}
+
+SPECS = {
+    'cascade-choice': _compile_spec('cascade-choice', 'org.biouno.unochoice.CascadeChoiceParameter', [
+        # fields( yaml tag, xml tag, default value )
+        ('description', 'description', ''),
+        ('visible-item-count', 'visibleItemCount', 1),
+        ('reference', 'referencedParameters', ''),
+        ('filterable', 'filterable', False),
+    ], dict((k, v) for k, v in CHOICE_TYPE.items() if k != 'default')),
+
+    'active-choice': _compile_spec('active-choice', 'org.biouno.unochoice.ChoiceParameter', [
+        # fields( yaml tag, xml tag, default value )
+        ('description', 'description', ''),
+        ('visible-item-count', 'visibleItemCount', 1),
+        ('filterable', 'filterable', False),
+        ('filter-length', 'filterLength', 1)
+    ], CHOICE_TYPE),
+
+    'active-choice-reactive': _compile_spec('active-choice-reactive', 'org.biouno.unochoice.CascadeChoiceParameter', [
+        # fields( yaml tag, xml tag, default value )
+        ('description', 'description', ''),
+        ('visible-item-count', 'visibleItemCount', 1),
+        ('reference', 'referencedParameters', ''),
+        ('filterable', 'filterable', False),
+        ('filter-length', 'filterLength', 1)
+    ], CHOICE_TYPE),
+
+    'active-choice-reactive-reference': _compile_spec(
+        'active-choice-reactive-reference', 'org.biouno.unochoice.DynamicReferenceParameter', [
+            # fields( yaml tag, xml tag, default value )
+            ('description', 'description', ''),
+            ('visible-item-count', 'visibleItemCount', 1),
+            ('reference', 'referencedParameters', ''),
+            ('filterable', 'filterable', False),
+            ('filter-length', 'filterLength', 1)
+        ], REFERENCE_CHOICE_TYPE),
+}
+
+
 # XXXXXXX still here for backwards compatibility
+@stats.instrumented('cascade-choice')
 def cascade_choice_parameter(parser, xml_parent, data):
     """yaml: cascade-choice
     Creates an active choice parameter
@@ -135,9 +311,11 @@ def cascade_choice_parameter(parser, xml_parent, data):
 
     :arg str name: the name of the parameter
     :arg str script: the groovy script which generates choices
+    :arg str script-file: a file with the groovy script, instead of script
     :arg str description: a description of the parameter (optional)
     arg: int visible-item-count: a number of visible items
     arg: str fallback-script: a groovy script which will be evaluated if main script fails (optional)
+    arg: str fallback-script-file: a file with the fallback groovy script, instead of fallback-script
     arg: str reference: the name of parameter on changing that the parameter will be re-evaluated
     arg: str choice-type: a choice type, can be on of single, multi, checkbox or radio
     arg: bool filterable: added text box to filter elements
@@ -152,41 +330,22 @@ def cascade_choice_parameter(parser, xml_parent, data):
             return ['foo', 'bar']
     """
 
-    CHOICE_TYPE = {
-        'single': 'PT_SINGLE_SELECT',
-        'multi': 'PT_MULTI_SELECT',
-        'checkbox': 'PT_CHECKBOX',
-        'radio': 'PT_RADIO',
-    }
-
-    REQUIRED = [
-        # fields(yaml tag)
-        ('name', 'name'),
-        ('project', 'projectName'),
-    ]
-
-    OPTIONAL = [
-        # fields( yaml tag, xml tag, default value )
-        ('description', 'description', ''),
-        ('visible-item-count', 'visibleItemCount', 1),
-        ('reference', 'referencedParameters', ''),
-        ('filterable', 'filterable', False),
-    ]
+    _render(xml_parent, SPECS['cascade-choice'], _resolve_files(parser, data), _cascade_choice_steps)
 
-    element_name = 'org.biouno.unochoice.CascadeChoiceParameter'
 
-    section = Xml.SubElement(xml_parent, element_name)
+def _cascade_choice_steps(xml_parent, spec, data):
+    section = Xml.SubElement(xml_parent, spec.element_name)
     scripts = Xml.SubElement(section, 'script', {'class': 'org.biouno.unochoice.model.GroovyScript'})
     Xml.SubElement(section, 'parameters', {'class': 'linked-hash-map'})
 
-    for name, tag in REQUIRED:
+    for name, tag in spec.required:
         try:
             _add_element(section, tag, data[name])
         except KeyError:
             raise Exception("missing mandatory argument %s" % name)
 
-    for name, tag, default in OPTIONAL:
-        _add_element(section, tag, data.get(name, default))
+    for name, tag, default in spec.optional:
+        Xml.SubElement(section, tag).text = _to_str(data[name]) if name in data else default
 
     try:
         _add_script(scripts, "secureScript", data["script"])
@@ -195,30 +354,58 @@ def cascade_choice_parameter(parser, xml_parent, data):
 
     _add_script(scripts, "secureFallbackScript", data.get("fallback-script", ""))
 
-    _add_element(section, 'choiceType', CHOICE_TYPE[data.get('choice-type', 'single')])
+    _add_element(section, 'choiceType', spec.choice_type[data.get('choice-type', 'single')])
     # add calculated fields
-    logging.debug('cascade_choice data: %s' % data['project'])
+    logger.debug('cascade_choice data: %s', data['project'])
     _add_element(section, 'randomName', _unique_string(data['project'], data['name']))
 
 
-def _common_steps(xml_parent, element_name, REQUIRED, OPTIONAL, CHOICE_TYPE, data):
-    logging.debug('_common_steps data: data = %s' % data)
+def _resolve_files(parser, data):
+    # script files are inlined first, so that every cache keys on their content
+    return files.resolve(data, getattr(parser, 'path', None) or ())
 
-    section = Xml.SubElement(xml_parent, element_name)
 
-    for name, tag in REQUIRED:
+def _check_scriptler(data):
+    # every rendered section is recorded, whether it comes from a cache or not
+    section = data.get('scriptler') or scriptler_library.externalized(data)
+    if section and not _scriptler_section_errors(data.get('name'), section):
+        scriptler_library.catalog.check(data.get('name'), section)
+
+
+def _render(xml_parent, spec, data, steps):
+    """Renders one parameter with steps, or takes it from the on-disk cache when that is enabled."""
+    analyzer.enforce(data)
+    if scriptler_library.catalog is not None:
+        _check_scriptler(data)
+    disk_cache = cache.disk_cache
+    if disk_cache is None:
+        return steps(xml_parent, spec, data)
+
+    key = disk_cache.fingerprint(spec.kind, data)
+    if disk_cache.graft(xml_parent, key):
+        return
+    steps(xml_parent, spec, data)
+    disk_cache.put(key, xml_parent[-1])
+
+
+def _common_steps(xml_parent, spec, data):
+    logger.debug('_common_steps data: data = %s', data)
+
+    section = Xml.SubElement(xml_parent, spec.element_name)
+
+    for name, tag in spec.required:
         try:
-            _add_element(section, tag, data[name])
+            Xml.SubElement(section, tag).text = _to_str(data[name])
         except KeyError:
             raise Exception("missing mandatory argument %s" % name)
 
     param_name = data.get('name')
-    logging.debug('_common_steps data: param_name = %s' % param_name)
+    logger.debug('_common_steps data: param_name = %s', param_name)
     project = data.get('project')
-    logging.debug('_common_steps data: project = %s' % project)
+    logger.debug('_common_steps data: project = %s', project)
 
-    for name, tag, default in OPTIONAL:
-        _add_element(section, tag, data.get(name, default))
+    for name, tag, default in spec.optional:
+        Xml.SubElement(section, tag).text = _to_str(data[name]) if name in data else default
 
     # check to see which scripts were defined
     groovy = data.get('groovy')
@@ -234,25 +421,192 @@ def _common_steps(xml_parent, element_name, REQUIRED, OPTIONAL, CHOICE_TYPE, dat
         raise Exception("illegal use of both groovy/fallback and scriptler scripts in the same parameter %s"
                         % param_name)
 
+    # shared scripts moved to scriptler by the dedup tool are referenced instead of inlined
+    externalized = scriptler_library.externalized(data)
+    if externalized:
+        groovy, scriptler = None, externalized
+
     # at this point, we know it's either groovy/fallback or scriptler, but not both
     if groovy:
         # add groovy, along with optional fallback
-        _add_groovy(section, param_name, groovy, fallback)
+        _add_groovy(section, param_name, groovy, fallback, data.get('reference'), _unique_string(project, param_name))
     elif scriptler:
         # add scriptler
         _add_scriptler(section, param_name, scriptler)
 
     # set the choice-type
-    _add_element(section, 'choiceType', CHOICE_TYPE[data.get('choice-type', 'default')])
+    Xml.SubElement(section, 'choiceType').text = spec.choice_type[data.get('choice-type', 'default')]
 
     # add an empty parameters section
     # not sure why this is needed, but this is what the active choice plug-in does, so...
     Xml.SubElement(section, 'parameters', {'class': 'linked-hash-map'})
 
     # add calculated fields
-    _add_element(section, 'randomName', _unique_string(project, param_name))
+    Xml.SubElement(section, 'randomName').text = _unique_string(project, param_name)
+
+
+# steps of every parameter type, looked up once per kind by render_parameters
+_STEPS = {
+    'cascade-choice': _cascade_choice_steps,
+    'active-choice': _common_steps,
+    'active-choice-reactive': _common_steps,
+    'active-choice-reactive-reference': _common_steps,
+}
 
 
+def render_parameters(xml_parent, items, parser=None):
+    """Renders many active choice parameters under xml_parent in one pass.
+
+    The output is identical to calling the entry point of every parameter in order, without
+    repeating the per-call setup: the type tables, the script file search path and the
+    instrumentation check are resolved once for the whole batch. Rendering stops at the first
+    invalid definition; use validate() to collect every problem up front.
+
+    :arg xml_parent: the element the parameters are appended to, usually parameterDefinitions
+    :arg items: an iterable of (kind, data) pairs, kind being one of SPECS
+    :arg parser: the jenkins-job-builder parser, if any, whose include path is searched for script files
+    """
+    if stats.has_hooks():
+        # hooks expect to see every parameter, keep the instrumented entry points
+        for kind, data in items:
+            _entry_point(kind)(parser, xml_parent, data)
+        return
+
+    search_path = getattr(parser, 'path', None) or ()
+    table = {}
+    for kind, data in items:
+        entry = table.get(kind)
+        if entry is None:
+            _entry_point(kind)
+            entry = table[kind] = (SPECS[kind], _STEPS[kind])
+        _render(xml_parent, entry[0], files.resolve(data, search_path), entry[1])
+
+
+def _entry_point(kind):
+    try:
+        return ENTRY_POINTS[kind]
+    except KeyError:
+        raise Exception("unknown active choice parameter type '%s', expected one of: %s"
+                        % (kind, ', '.join(sorted(ENTRY_POINTS))))
+
+
+def _sandbox_errors(data):
+    if data and not _SANDBOX_RE.match(_to_str(data)):
+        return ["sandbox must be true or false, not this: '%s'" % _to_str(data)]
+    return []
+
+
+def _classpath_errors(data):
+    if not data:
+        return []
+    if not isinstance(data, compat.STRING_TYPES):
+        return ["classpath must be a comma-separated string, not this: '%s'" % _to_str(data)]
+    return ["classpath entries must start with file:/... or http[s]://... : %s" % url
+            for url in [x.strip() for x in data.split(',')] if not _CLASSPATH_RE.match(url)]
+
+
+def _minify_errors(section):
+    try:
+        if section.get('script'):
+            groovy_library.script_text(section, _to_str(section['script']))
+    except Exception as e:
+        return [str(e)]
+    return []
+
+
+def _groovy_errors(param_name, groovy_data, fallback_data):
+    errors = []
+    for section, data in (('groovy', groovy_data), ('fallback', fallback_data)):
+        if data and not isinstance(data, dict):
+            errors.append("%s must be a mapping in %s" % (section, param_name))
+    if errors:
+        return errors
+
+    if not groovy_data.get('script'):
+        errors.append("missing groovy script argument in %s" % param_name)
+    errors.extend(_sandbox_errors(groovy_data.get('sandbox')))
+    errors.extend(_classpath_errors(groovy_data.get('classpath')))
+    errors.extend(_minify_errors(groovy_data))
+    errors.extend(_wrapper_errors(param_name, groovy_data, fallback_data))
+    if fallback_data and fallback_data.get('script'):
+        errors.extend(_sandbox_errors(fallback_data.get('sandbox')))
+        errors.extend(_classpath_errors(fallback_data.get('classpath')))
+        errors.extend(_minify_errors(fallback_data))
+    return errors
+
+
+def _scriptler_section_errors(param_name, data):
+    if not isinstance(data, dict):
+        return ["scriptler must be a mapping in %s" % param_name]
+    errors = []
+    if not data.get('script'):
+        errors.append("missing Scriptler script argument in %s" % param_name)
+    parameters = data.get('parameters')
+    if parameters and (not isinstance(parameters, list) or not all(isinstance(x, dict) for x in parameters)):
+        errors.append("scriptler parameters must be a list of key-value pairs in %s" % param_name)
+    return errors
+
+
+def _scriptler_errors(param_name, data):
+    errors = _scriptler_section_errors(param_name, data)
+    if not errors and scriptler_library.catalog is not None:
+        errors.extend(scriptler_library.catalog.errors(param_name, data))
+    return errors
+
+
+def _choice_type_errors(spec, data, default):
+    choice_type = data.get('choice-type', default)
+    if isinstance(choice_type, compat.STRING_TYPES) and choice_type in spec.choice_type:
+        return []
+    return ["unknown choice-type '%s' in %s, expected one of: %s" % (
+        choice_type, data.get('name'), ', '.join(sorted(k for k in spec.choice_type if k != 'default')))]
+
+
+def validate(kind, data, search_path=()):
+    """Returns every problem of a parameter definition, without building any xml.
+
+    :arg str kind: the yaml name of the parameter type, one of SPECS
+    :arg dict data: the parameter definition
+    :arg list search_path: directories searched for script files after the include path
+    """
+    spec = SPECS[kind]
+    if not isinstance(data, dict):
+        return ["%s definition must be a mapping, not this: '%s'" % (kind, data)]
+
+    errors = ["missing mandatory argument %s" % name for name, tag in spec.required if name not in data]
+    try:
+        data = files.resolve(data, search_path)
+    except Exception as e:
+        errors.append(str(e))
+    errors.extend(analyzer.errors(data))
+
+    if kind == 'cascade-choice':
+        if 'script' not in data:
+            errors.append("missing mandatory argument script")
+        errors.extend(_choice_type_errors(spec, data, 'single'))
+        return errors
+
+    param_name = data.get('name')
+    groovy = data.get('groovy')
+    fallback = data.get('fallback')
+    scriptler = data.get('scriptler')
+
+    if not groovy and not scriptler:
+        errors.append("missing script argument. need either groovy or scriptler in parameter %s" % param_name)
+    if (groovy or fallback) and scriptler:
+        errors.append("illegal use of both groovy/fallback and scriptler scripts in the same parameter %s"
+                      % param_name)
+
+    if groovy:
+        errors.extend(_groovy_errors(param_name, groovy, fallback))
+    elif scriptler:
+        errors.extend(_scriptler_errors(param_name, scriptler))
+
+    errors.extend(_choice_type_errors(spec, data, 'default'))
+    return errors
+
+
+@stats.instrumented('active-choice')
 def active_choice(parser, xml_parent, data):
     """yaml: active-choice
     Creates an active choice parameter
@@ -264,15 +618,35 @@ def active_choice(parser, xml_parent, data):
     # REQUIRED: YOU MUST USE EITHER groovy or scripter, not both
     :arg hash-map groovy: the section to define the main groovy script to generate the values for this parameter
         :arg str script: the actual groovy script
+        :arg str script-file: a file with the groovy script, instead of script; looked up in
+            JJB_ACTIVE_CHOICE_INCLUDE_PATH, then in the jenkins-job-builder include path
+        :arg str choices-from: a JSON, YAML or CSV file with the choices, rendered into a script that returns
+            them, instead of script; looked up like script-file
+        :arg str choices-key: a referenced parameter whose value selects the choices in a choices-from file
+            holding a mapping (OPTIONAL)
         :arg str classpath: additional class paths for your groovy code (OPTIONAL; URLs of the form file:/...
             or http[s]://...)
         :arg str sandbox: run this script in a sandbox (OPTIONAL; default false)
+        :arg bool minify: strip comments and redundant whitespace from the script (OPTIONAL; default false,
+            or the JJB_ACTIVE_CHOICE_MINIFY environment variable)
+        :arg int cache-ttl: cache the results of the script for this many seconds, per value of the
+            referenced parameters; the script runs inside a generated wrapper, so it cannot declare
+            methods or classes, and cannot run in the sandbox (OPTIONAL)
+        :arg int cache-size: the number of results kept, the least recently used are dropped
+            (OPTIONAL; default 100, requires cache-ttl)
+        :arg float timeout: seconds the script is given before it is cancelled and the fallback script
+            runs in its place; the script runs on a thread pool shared by its job, inside a
+            generated wrapper, so it cannot declare methods or classes, and cannot run in the sandbox
+            (OPTIONAL)
     :arg hash-map fallback: the section to define the fallback groovy script to generate the values when the main
         groovy fails (OPTIONAL)
         :arg str script: the actual fallback groovy script (REQIRED, IF you define fallback)
+        :arg str script-file: a file with the fallback groovy script, instead of script
         :arg str classpath: additional class paths for your groovy code (OPTIONAL; URLs of the form file:/...
             or http[s]://...)
         :arg str sandbox: run this script in a sandbox (OPTIONAL; default false)
+        :arg bool minify: strip comments and redundant whitespace from the script (OPTIONAL; default false,
+            or the JJB_ACTIVE_CHOICE_MINIFY environment variable)
     :arg hash-map scriptler: the section to define the main groovy script to generate the values for this parameter
         :arg str script: simple file name of the scriptler script from the system library of scripts; not an
             absolute path (REQIRED, IF you define scriptler)
@@ -317,33 +691,11 @@ def active_choice(parser, xml_parent, data):
 
     """
 
-    CHOICE_TYPE = {
-        'default': 'PT_SINGLE_SELECT',
-        'single': 'PT_SINGLE_SELECT',
-        'multi': 'PT_MULTI_SELECT',
-        'checkbox': 'PT_CHECKBOX',
-        'radio': 'PT_RADIO',
-    }
-
-    REQUIRED = [
-        # fields(yaml tag)
-        ('name', 'name'),
-        ('project', 'projectName'),
-    ]
-
-    OPTIONAL = [
-        # fields( yaml tag, xml tag, default value )
-        ('description', 'description', ''),
-        ('visible-item-count', 'visibleItemCount', 1),
-        ('filterable', 'filterable', False),
-        ('filter-length', 'filterLength', 1)
-    ]
-
-    element_name = 'org.biouno.unochoice.ChoiceParameter'
-    logging.debug('active_choice data: data = %s' % data)
-    _common_steps(xml_parent, element_name, REQUIRED, OPTIONAL, CHOICE_TYPE, data)
+    logger.debug('active_choice data: data = %s', data)
+    _render(xml_parent, SPECS['active-choice'], _resolve_files(parser, data), _common_steps)
 
 
+@stats.instrumented('active-choice-reactive')
 def active_choice_reactive(parser, xml_parent, data):
     """yaml: active-choice-reactive
     Creates an active choice reactive parameter
@@ -355,15 +707,35 @@ def active_choice_reactive(parser, xml_parent, data):
     # REQUIRED: YOU MUST USE EITHER groovy or scripter, not both
     :arg hash-map groovy: the section to define the main groovy script to generate the values for this parameter
         :arg str script: the actual groovy script
+        :arg str script-file: a file with the groovy script, instead of script; looked up in
+            JJB_ACTIVE_CHOICE_INCLUDE_PATH, then in the jenkins-job-builder include path
+        :arg str choices-from: a JSON, YAML or CSV file with the choices, rendered into a script that returns
+            them, instead of script; looked up like script-file
+        :arg str choices-key: a referenced parameter whose value selects the choices in a choices-from file
+            holding a mapping (OPTIONAL)
         :arg str classpath: additional class paths for your groovy code (OPTIONAL; URLs of the form file:/...
             or http[s]://...)
         :arg str sandbox: run this script in a sandbox (OPTIONAL; default false)
+        :arg bool minify: strip comments and redundant whitespace from the script (OPTIONAL; default false,
+            or the JJB_ACTIVE_CHOICE_MINIFY environment variable)
+        :arg int cache-ttl: cache the results of the script for this many seconds, per value of the
+            referenced parameters; the script runs inside a generated wrapper, so it cannot declare
+            methods or classes, and cannot run in the sandbox (OPTIONAL)
+        :arg int cache-size: the number of results kept, the least recently used are dropped
+            (OPTIONAL; default 100, requires cache-ttl)
+        :arg float timeout: seconds the script is given before it is cancelled and the fallback script
+            runs in its place; the script runs on a thread pool shared by its job, inside a
+            generated wrapper, so it cannot declare methods or classes, and cannot run in the sandbox
+            (OPTIONAL)
     :arg hash-map fallback: the section to define the fallback groovy script to generate the values when the main
         groovy fails (OPTIONAL)
         :arg str script: the actual fallback groovy script (REQIRED, IF you define fallback)
+        :arg str script-file: a file with the fallback groovy script, instead of script
         :arg str classpath: additional class paths for your groovy code (OPTIONAL; URLs of the form file:/...
             or http[s]://...)
         :arg str sandbox: run this script in a sandbox (OPTIONAL; default false)
+        :arg bool minify: strip comments and redundant whitespace from the script (OPTIONAL; default false,
+            or the JJB_ACTIVE_CHOICE_MINIFY environment variable)
     :arg hash-map scriptler: the section to define the main groovy script to generate the values for this parameter
         :arg str script: simple file name of the scriptler script from the system library of scripts; not an
             absolute path (REQIRED, IF you define scriptler)
@@ -412,34 +784,11 @@ def active_choice_reactive(parser, xml_parent, data):
 
     """
 
-    CHOICE_TYPE = {
-        'default': 'PT_SINGLE_SELECT',
-        'single': 'PT_SINGLE_SELECT',
-        'multi': 'PT_MULTI_SELECT',
-        'checkbox': 'PT_CHECKBOX',
-        'radio': 'PT_RADIO',
-    }
-
-    REQUIRED = [
-        # fields(yaml tag)
-        ('name', 'name'),
-        ('project', 'projectName'),
-    ]
-
-    OPTIONAL = [
-        # fields( yaml tag, xml tag, default value )
-        ('description', 'description', ''),
-        ('visible-item-count', 'visibleItemCount', 1),
-        ('reference', 'referencedParameters', ''),
-        ('filterable', 'filterable', False),
-        ('filter-length', 'filterLength', 1)
-    ]
-
-    element_name = 'org.biouno.unochoice.CascadeChoiceParameter'
-    logging.debug('active_choice_reactive data: data = %s' % data)
-    _common_steps(xml_parent, element_name, REQUIRED, OPTIONAL, CHOICE_TYPE, data)
+    logger.debug('active_choice_reactive data: data = %s', data)
+    _render(xml_parent, SPECS['active-choice-reactive'], _resolve_files(parser, data), _common_steps)
 
 
+@stats.instrumented('active-choice-reactive-reference')
 def active_choice_reactive_reference(parser, xml_parent, data):
     """yaml: active-choice-reactive-reference
     Creates an active choice reactive reference parameter
@@ -451,15 +800,35 @@ def active_choice_reactive_reference(parser, xml_parent, data):
     # REQUIRED: YOU MUST USE EITHER groovy or scripter, not both
     :arg hash-map groovy: the section to define the main groovy script to generate the values for this parameter
         :arg str script: the actual groovy script
+        :arg str script-file: a file with the groovy script, instead of script; looked up in
+            JJB_ACTIVE_CHOICE_INCLUDE_PATH, then in the jenkins-job-builder include path
+        :arg str choices-from: a JSON, YAML or CSV file with the choices, rendered into a script that returns
+            them, instead of script; looked up like script-file
+        :arg str choices-key: a referenced parameter whose value selects the choices in a choices-from file
+            holding a mapping (OPTIONAL)
         :arg str classpath: additional class paths for your groovy code (OPTIONAL; URLs of the form file:/...
             or http[s]://...)
         :arg str sandbox: run this script in a sandbox (OPTIONAL; default false)
+        :arg bool minify: strip comments and redundant whitespace from the script (OPTIONAL; default false,
+            or the JJB_ACTIVE_CHOICE_MINIFY environment variable)
+        :arg int cache-ttl: cache the results of the script for this many seconds, per value of the
+            referenced parameters; the script runs inside a generated wrapper, so it cannot declare
+            methods or classes, and cannot run in the sandbox (OPTIONAL)
+        :arg int cache-size: the number of results kept, the least recently used are dropped
+            (OPTIONAL; default 100, requires cache-ttl)
+        :arg float timeout: seconds the script is given before it is cancelled and the fallback script
+            runs in its place; the script runs on a thread pool shared by its job, inside a
+            generated wrapper, so it cannot declare methods or classes, and cannot run in the sandbox
+            (OPTIONAL)
     :arg hash-map fallback: the section to define the fallback groovy script to generate the values when the main
         groovy fails (OPTIONAL)
         :arg str script: the actual fallback groovy script (REQIRED, IF you define fallback)
+        :arg str script-file: a file with the fallback groovy script, instead of script
         :arg str classpath: additional class paths for your groovy code (OPTIONAL; URLs of the form file:/...
             or http[s]://...)
         :arg str sandbox: run this script in a sandbox (OPTIONAL; default false)
+        :arg bool minify: strip comments and redundant whitespace from the script (OPTIONAL; default false,
+            or the JJB_ACTIVE_CHOICE_MINIFY environment variable)
     :arg hash-map scriptler: the section to define the main groovy script to generate the values for this parameter
         :arg str script: simple file name of the scriptler script from the system library of scripts; not an
             absolute path (REQIRED, IF you define scriptler)
@@ -508,30 +877,14 @@ def active_choice_reactive_reference(parser, xml_parent, data):
 
     """
 
-    CHOICE_TYPE = {
-        'default': 'ET_TEXT_BOX',
-        'input-text': 'ET_TEXT_BOX',
-        'numbered-list': 'ET_ORDERED_LIST',
-        'bullet-list': 'ET_UNORDERED_LIST',
-        'formatted-html': 'ET_FORMATTED_HTML',
-        'formatted-hidden-html': 'ET_FORMATTED_HIDDEN_HTML'
-    }
-
-    REQUIRED = [
-        # fields(yaml tag)
-        ('name', 'name'),
-        ('project', 'projectName'),
-    ]
+    logger.debug('active_choice_reactive_reference data: data = %s', data)
+    _render(xml_parent, SPECS['active-choice-reactive-reference'], _resolve_files(parser, data), _common_steps)
 
-    OPTIONAL = [
-        # fields( yaml tag, xml tag, default value )
-        ('description', 'description', ''),
-        ('visible-item-count', 'visibleItemCount', 1),
-        ('reference', 'referencedParameters', ''),
-        ('filterable', 'filterable', False),
-        ('filter-length', 'filterLength', 1)
-    ]
 
-    element_name = 'org.biouno.unochoice.DynamicReferenceParameter'
-    logging.debug('active_choice_reactive_reference data: data = %s' % data)
-    _common_steps(xml_parent, element_name, REQUIRED, OPTIONAL, CHOICE_TYPE, data)
+# jenkins-job-builder entry point of every parameter type
+ENTRY_POINTS = {
+    'cascade-choice': cascade_choice_parameter,
+    'active-choice': active_choice,
+    'active-choice-reactive': active_choice_reactive,
+    'active-choice-reactive-reference': active_choice_reactive_reference,
+}
@@ -0,0 +1,226 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Static checks of groovy scripts for patterns that make the build with parameters page slow.
+
+Active choice scripts run while the page is rendered, and reactive ones again on every change of
+a referenced parameter. Scripts are tokenized, so strings and comments never match, and every
+call of a rule is reported with an estimated cost class of the script. With JJB_ACTIVE_CHOICE_ANALYZER
+set the check also runs when parameters are rendered; each rule is ignored, logged (info, warn) or
+fails the render (fail), one level stricter for parameters with a reference. Findings of every job
+are listed by:
+
+    python -m jenkins_jobs_active_choice.analyzer jobs/
+
+Code inside GString ${...} expressions is not analyzed.
+"""
+
+import argparse
+import collections
+import hashlib
+import logging
+import os
+import sys
+import threading
+
+from jenkins_jobs_active_choice import compat
+from jenkins_jobs_active_choice import groovy
+
+logger = logging.getLogger(__name__)
+
+# rule levels over the defaults of the rules, e.g. 'network=fail,file=warn'; 'all=...' sets every rule.
+# Unset, nothing is checked while rendering: tokenizing costs milliseconds per large distinct script
+LEVELS_ENV = 'JJB_ACTIVE_CHOICE_ANALYZER'
+
+LEVELS = ('ignore', 'info', 'warn', 'fail')
+COSTS = ('low', 'medium', 'high')
+
+# members: called or read after '.', types: instantiated after 'new'
+Rule = collections.namedtuple('Rule', ['name', 'cost', 'level', 'members', 'types', 'description'])
+
+RULES = collections.OrderedDict((rule.name, rule) for rule in [
+    Rule('all-items', 'high', 'info', frozenset(['getAllItems', 'allItems', 'getAllJobs', 'allJobs']), frozenset(),
+         'walks every item of the controller'),
+    Rule('network', 'high', 'info', frozenset(['toURL', 'openConnection', 'openStream']),
+         frozenset(['URL', 'Socket']), 'opens a network connection'),
+    Rule('process', 'high', 'info', frozenset(['execute', 'exec']), frozenset(['ProcessBuilder']),
+         'starts a process'),
+    Rule('file', 'medium', 'ignore', frozenset(['readLines', 'eachLine', 'readBytes', 'readAllLines', 'readAllBytes']),
+         frozenset(['File', 'FileReader', 'FileInputStream']), 'reads a file'),
+])
+
+Finding = collections.namedtuple('Finding', ['rule', 'line', 'token'])
+
+# findings of the most recently used distinct scripts, the same scripts are rendered for many jobs;
+# keyed by the sha1 of a script so that large scripts are not kept alive
+MEMO_SIZE = 4096
+_memo = collections.OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _significant(script):
+    line = 1
+    for kind, text in groovy.tokenize(script):
+        if kind in (groovy.WORD, groovy.OP):
+            yield kind, text, line
+        line += text.count('\n')
+
+
+def analyze(script):
+    """Returns the findings of a groovy script, in script order."""
+    key = hashlib.sha1(script.encode('utf-8')).hexdigest()
+    with _memo_lock:
+        found = _memo.pop(key, None)
+        if found is not None:
+            # re-insert to mark as the most recently used
+            _memo[key] = found
+            return found
+    found = []
+    try:
+        tokens = list(_significant(script))
+        for i in range(1, len(tokens)):
+            kind, text, line = tokens[i]
+            previous = tokens[i - 1][1]
+            if kind != groovy.WORD or previous not in ('.', 'new'):
+                continue
+            if previous == '.':
+                found.extend(Finding(rule.name, line, text) for rule in RULES.values() if text in rule.members)
+                continue
+            # the type may be qualified, e.g. new java.net.URL(...): its last segment names it
+            end = i
+            while end + 2 < len(tokens) and tokens[end + 1][1] == '.' and tokens[end + 2][0] == groovy.WORD:
+                end += 2
+            name = ''.join(x[1] for x in tokens[i:end + 1])
+            found.extend(Finding(rule.name, line, name) for rule in RULES.values() if tokens[end][1] in rule.types)
+    except Exception as e:
+        # malformed groovy is reported by Jenkins, not by this check
+        logger.debug('cannot analyze groovy script: %s', e)
+    found = tuple(found)
+    with _memo_lock:
+        _memo[key] = found
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return found
+
+
+def cost(findings):
+    """Returns the estimated cost class of a script with the given findings."""
+    return max([RULES[x.rule].cost for x in findings] or ['low'], key=COSTS.index)
+
+
+def level(rule_name, reactive):
+    """Returns the level of a rule; parameters with a reference get one level stricter."""
+    value = levels[rule_name]
+    if reactive and value != 'ignore':
+        value = LEVELS[min(LEVELS.index(value) + 1, len(LEVELS) - 1)]
+    return value
+
+
+def _section_script(section):
+    return section.get('script') if isinstance(section, dict) else None
+
+
+def scripts(data):
+    """Returns (role, script) for the groovy scripts of a parameter definition with files inlined."""
+    candidates = (
+        ('script', data.get('script') or _section_script(data.get('groovy'))),
+        ('fallback script', data.get('fallback-script') or _section_script(data.get('fallback'))),
+    )
+    return [(role, script) for role, script in candidates if script and isinstance(script, compat.STRING_TYPES)]
+
+
+def check(data):
+    """Returns (level, message) for every finding in a parameter definition that is not ignored."""
+    if not enabled:
+        return []
+    result = []
+    for role, script in scripts(data):
+        found = analyze(script)
+        if found:
+            result.extend(_messages(data, role, found))
+    return result
+
+
+def _messages(data, role, found):
+    reactive = bool(data.get('reference'))
+    for finding in found:
+        rule_level = level(finding.rule, reactive)
+        if rule_level != 'ignore':
+            yield rule_level, "%s of parameter %s %s with %s at line %d (rule %s, %s cost%s)" % (
+                role, data.get('name'), RULES[finding.rule].description, finding.token, finding.line,
+                finding.rule, cost(found), ', runs on every change of ' + str(data['reference']) if reactive else '')
+
+
+def enforce(data):
+    """Logs the findings of a parameter definition, raises on the first one at the fail level."""
+    for rule_level, message in check(data):
+        if rule_level == 'fail':
+            raise Exception(message)
+        logger.log(logging.WARNING if rule_level == 'warn' else logging.INFO, message)
+
+
+def errors(data):
+    """Returns the messages of the findings that fail rendering."""
+    return [message for rule_level, message in check(data) if rule_level == 'fail']
+
+
+def parse_levels(value):
+    """Returns {rule name: level} from 'rule=level,...' applied over the rule defaults."""
+    result = dict((name, rule.level) for name, rule in RULES.items())
+    for item in [x.strip() for x in (value or '').split(',') if x.strip()]:
+        name, _, rule_level = item.partition('=')
+        name, rule_level = name.strip(), rule_level.strip()
+        if (name != 'all' and name not in RULES) or rule_level not in LEVELS:
+            raise Exception("invalid analyzer setting '%s', expected RULE=LEVEL with RULE one of all, %s "
+                            "and LEVEL one of %s" % (item, ', '.join(RULES), ', '.join(LEVELS)))
+        for key in (RULES if name == 'all' else [name]):
+            result[key] = rule_level
+    return result
+
+
+def configure(value):
+    """Sets the levels of the rules, as LEVELS_ENV does at import."""
+    global levels, enabled
+    levels = parse_levels(value)
+    # ignored rules are never tokenized for, the check costs nothing when all of them are
+    enabled = any(x != 'ignore' for x in levels.values())
+
+
+levels = enabled = None
+configure(os.environ[LEVELS_ENV] if os.environ.get(LEVELS_ENV) else 'all=ignore')
+
+
+def main(argv=None):
+    from jenkins_jobs_active_choice import files
+    from jenkins_jobs_active_choice import jobs
+
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args = args.parse_args(argv)
+
+    if not enabled:
+        # listing findings is what the command is for, without settings the rules keep their defaults
+        configure('')
+    yaml_parser = jobs.load(args.paths)
+    failed = 0
+    for job in yaml_parser.jobs:
+        for kind, data in jobs.iter_parameters(yaml_parser, job):
+            for rule_level, message in check(files.resolve(data, yaml_parser.path)):
+                failed += rule_level == 'fail'
+                print('%s: [%s] %s' % (job['name'], rule_level, message))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Computes the script-security approvals needed by the groovy scripts of rendered jobs.
+
+Scripts rendered with sandbox=false only run once an administrator approves them. This collects
+every such script, computes the hash Jenkins stores for its approval and writes the
+approvedScriptHashes of a scriptApproval.xml, so a fleet rollout needs a single approval step:
+
+    python -m jenkins_jobs_active_choice.approval jobs/ > approvals.xml
+    python -m jenkins_jobs_active_choice.approval --current $JENKINS_HOME/scriptApproval.xml jobs/
+    python -m jenkins_jobs_active_choice.approval --current $JENKINS_HOME/scriptApproval.xml --merge jobs/
+
+With --current only the scripts that are not approved yet are reported; --merge writes them into
+that file. Classpath entries need their own approval, which depends on the jar content and is not
+covered here.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import hashlib
+import sys
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import references
+from jenkins_jobs_active_choice import scriptler
+
+LANGUAGE = 'groovy'
+HASHES_TAG = 'approvedScriptHashes'
+ROLES = ('secureScript', 'secureFallbackScript')
+
+
+def _hex_digest(algorithm, script):
+    digest = hashlib.new(algorithm)
+    digest.update(LANGUAGE.encode('utf-8') + b':' + script.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# script-security stores SHA-512 hashes with a prefix, older releases stored bare SHA-1 hashes
+HASHERS = {
+    'sha512': lambda script: 'SHA512:' + _hex_digest('sha512', script),
+    'sha1': lambda script: _hex_digest('sha1', script),
+}
+DEFAULT_HASHER = 'sha512'
+
+
+def approval_hash(script, hasher=DEFAULT_HASHER):
+    """Returns the hash script-security records when the groovy script is approved."""
+    return HASHERS[hasher](script)
+
+
+class Approval(object):
+    """One script that needs an approval and every place it runs from."""
+
+    def __init__(self, script, hashes):
+        self.script = script
+        # {hasher name: approval hash}, an approval under any of them is accepted
+        self.hashes = hashes
+        self.locations = []
+
+
+def collect(rendered, hasher=DEFAULT_HASHER):
+    """Returns {approval hash: Approval} for the non-sandboxed scripts of (job name, xml root) pairs.
+
+    Each distinct script is hashed once however many parameters inline it.
+    """
+    approvals = collections.OrderedDict()
+    memo = {}
+    for job_name, xml_root in rendered:
+        definitions = xml_root.find(references.PARAMETERS_PATH)
+        for parameter in definitions if definitions is not None else []:
+            if not parameter.tag.startswith(references.UNOCHOICE_PREFIX):
+                continue
+            for role in ROLES:
+                secure_script = parameter.find('script/' + role)
+                if secure_script is None or scriptler.is_sandboxed(secure_script.findtext('sandbox')):
+                    continue
+                # an empty script still has to be approved before the parameter renders
+                script = secure_script.findtext('script') or ''
+                approval = memo.get(script)
+                if approval is None:
+                    hashes = dict((name, approval_hash(script, name)) for name in HASHERS)
+                    approval = memo[script] = Approval(script, hashes)
+                    approvals[hashes[hasher]] = approval
+                approval.locations.append((job_name, parameter.findtext('name'), role))
+    return approvals
+
+
+def approved_hashes(path):
+    """Returns the set of approved script hashes of a scriptApproval.xml."""
+    root = Xml.parse(path).getroot()
+    return set(x.text.strip() for x in root.iterfind(HASHES_TAG + '/string') if x.text)
+
+
+def pending(approvals, approved):
+    """Returns the approvals not covered by any hash in approved, in the same order."""
+    return collections.OrderedDict(
+        (key, approval) for key, approval in approvals.items()
+        if not any(x in approved for x in approval.hashes.values()))
+
+
+def fragment(hashes):
+    """Returns an approvedScriptHashes element; Jenkins keeps them sorted."""
+    element = Xml.Element(HASHES_TAG)
+    for value in sorted(hashes):
+        Xml.SubElement(element, 'string').text = value
+    return element
+
+
+def merge(path, hashes):
+    """Adds hashes to the approvedScriptHashes of a scriptApproval.xml, returns how many were new.
+
+    The XML declaration and the indentation of the file are kept, Jenkins writes XML 1.1 files.
+    """
+    with open(path, 'rb') as stream:
+        content = stream.read()
+    root = Xml.fromstring(content)
+    element = root.find(HASHES_TAG)
+    if element is None:
+        element = Xml.SubElement(root, HASHES_TAG)
+    current = set(x.text for x in element)
+    added = set(hashes) - current
+    if not added:
+        return 0
+    merged = list(fragment(current | added))
+    if len(element) and element.text and not element.text.strip():
+        for child in merged:
+            child.tail = element.text
+        merged[-1].tail = element[-1].tail
+    element[:] = merged
+    declaration = content[:content.index(b'?>') + 2] + b'\n' if content.startswith(b'<?xml') else b''
+    with open(path, 'wb') as stream:
+        stream.write(declaration + Xml.tostring(root, encoding='utf-8'))
+    return len(added)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args.add_argument('--current', help='existing scriptApproval.xml, only scripts it does not approve are reported')
+    args.add_argument('--merge', action='store_true', help='add the missing approvals to the --current file')
+    args.add_argument('--hash', choices=sorted(HASHERS), default=DEFAULT_HASHER,
+                      help='hash algorithm of the script-security release (default %s)' % DEFAULT_HASHER)
+    args = args.parse_args(argv)
+    if args.merge and not args.current:
+        print('--merge needs --current', file=sys.stderr)
+        return 2
+
+    approvals = collect(jobs.iter_xml(jobs.load(args.paths)), args.hash)
+    if args.current:
+        approvals = pending(approvals, approved_hashes(args.current))
+        for key, approval in approvals.items():
+            job_name, name, role = approval.locations[0]
+            print('%s: %s of %s in %s (%d use(s)) needs approval' % (
+                key, role, name, job_name, len(approval.locations)), file=sys.stderr)
+    if args.merge:
+        print('%d approval(s) added to %s' % (merge(args.current, approvals), args.current))
+        return 0
+
+    stream = getattr(sys.stdout, 'buffer', sys.stdout)
+    stream.write(Xml.tostring(fragment(approvals), encoding='utf-8') + b'\n')
+    # like diff, a non-zero status tells that approvals are missing
+    return 1 if args.current and approvals else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
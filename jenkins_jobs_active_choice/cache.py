@@ -0,0 +1,313 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import collections
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import compat
+from jenkins_jobs_active_choice import stats
+
+logger = logging.getLogger(__name__)
+
+# number of prebuilt script subtrees kept in memory, 0 disables the cache
+SIZE_ENV = 'JJB_ACTIVE_CHOICE_SUBTREE_CACHE_SIZE'
+DEFAULT_SIZE = 1024
+
+# directory of the on-disk cache of rendered parameters, and its size cap in bytes
+DISK_CACHE_ENV = 'JJB_ACTIVE_CHOICE_RENDER_CACHE'
+DISK_CACHE_SIZE_ENV = 'JJB_ACTIVE_CHOICE_RENDER_CACHE_SIZE'
+DEFAULT_DISK_CACHE_SIZE = 256 * 1024 * 1024
+
+# bump when the layout of cache entries changes
+DISK_CACHE_FORMAT = 2
+
+
+def _freeze(value):
+    # strings are the common case and hash once per object; other scalars keep their type
+    # so that e.g. True and 1 (which render differently) never share an entry
+    if isinstance(value, compat.STRING_TYPES):
+        return value
+    if isinstance(value, dict):
+        return dict, tuple(sorted([(k, _freeze(v)) for k, v in value.items()]))
+    if isinstance(value, list):
+        return list, tuple([_freeze(v) for v in value])
+    return type(value), value
+
+
+def key(*parts):
+    """Returns a canonical hashable form of yaml input, or None if it has none."""
+    try:
+        frozen = tuple([_freeze(part) for part in parts])
+        hash(frozen)
+    except TypeError:
+        # e.g. mappings with keys of mixed types can not be sorted
+        return None
+    return frozen
+
+
+class SubtreeCache(object):
+    """Bounded LRU cache of already validated xml subtrees.
+
+    Elements are stored detached from any document, callers get a copy to graft into their own tree.
+    Safe to share between threads: stored elements are never modified, so they are copied outside the lock.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def graft(self, xml_parent, key):
+        """Appends a copy of the cached subtree to xml_parent, returns False on a miss."""
+        if key is None or not self.size:
+            return False
+        with self._lock:
+            try:
+                element = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return False
+            # re-insert to mark as the most recently used
+            self._entries[key] = element
+            self.hits += 1
+        xml_parent.append(copy.deepcopy(element))
+        return True
+
+    def put(self, key, element):
+        if key is None or not self.size:
+            return
+        element = copy.deepcopy(element)
+        with self._lock:
+            self._entries[key] = element
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def counters(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+subtree_cache = SubtreeCache(int(os.environ.get(SIZE_ENV, DEFAULT_SIZE)))
+stats.add_counters('subtree_cache', lambda: subtree_cache.counters())
+
+
+def _code_version():
+    """Identifies the code that renders parameters: the package version and a hash of its sources."""
+    try:
+        import pkg_resources
+        version = pkg_resources.get_distribution('jenkins-job-builder-active-choice').version
+    except Exception:
+        version = 'unknown'
+    digest = hashlib.sha1()
+    package = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package)):
+        if name.endswith('.py'):
+            with open(os.path.join(package, name), 'rb') as stream:
+                digest.update(stream.read())
+    return '%s-%s' % (version, digest.hexdigest())
+
+
+def _file_version(path):
+    # settings may name input files (e.g. a manifest), their content matters too
+    if not os.path.isfile(path):
+        return None
+    st = os.stat(path)
+    return st.st_mtime, st.st_size
+
+
+class DiskCache(object):
+    """On-disk cache of rendered parameters keyed by a fingerprint of their input.
+
+    Entries are the serialized parameter element prefixed by its sha1, written atomically, so a
+    truncated or corrupted entry is detected and dropped. The fingerprint covers the plugin version,
+    a hash of the plugin sources and the JJB_ACTIVE_CHOICE_* settings, so any of these changing
+    invalidates the whole cache. Hits refresh the entry mtime and the least recently used entries
+    are evicted once the directory grows over the size cap. Entries are written under a temporary name
+    and renamed, so threads and processes can share one directory; counters are kept per instance.
+    """
+
+    def __init__(self, directory, size=DEFAULT_DISK_CACHE_SIZE):
+        self.directory = directory
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._salt = None
+        self._total = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self, kind, data):
+        """Returns the cache key of a parameter definition, or None if it cannot be serialized."""
+        salt = self._salt
+        if salt is None:
+            with self._lock:
+                if self._salt is None:
+                    settings = sorted((k, v, _file_version(v)) for k, v in os.environ.items()
+                                      if k.startswith('JJB_ACTIVE_CHOICE_'))
+                    self._salt = json.dumps([DISK_CACHE_FORMAT, _code_version(), settings])
+                salt = self._salt
+        try:
+            payload = json.dumps([kind, data], sort_keys=True, separators=(',', ':'), default=repr)
+        except TypeError:
+            return None
+        return hashlib.sha1((salt + payload).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.xml')
+
+    def graft(self, xml_parent, key):
+        """Appends the cached parameter to xml_parent, returns False on a miss."""
+        if key is None:
+            return False
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as stream:
+                checksum = stream.readline().strip()
+                payload = stream.read()
+        except (IOError, OSError):
+            self._count_miss()
+            return False
+        if hashlib.sha1(payload).hexdigest().encode('ascii') != checksum:
+            logger.warning('dropping corrupted render cache entry %s', path)
+            self._remove(path)
+            self._count_miss()
+            return False
+        xml_parent.append(Xml.fromstring(payload))
+        with self._lock:
+            self.hits += 1
+        try:
+            # the mtime orders entries for eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key, element):
+        if key is None:
+            return
+        # xml parsers turn \r and \r\n into \n, a character reference keeps scripts byte-identical
+        payload = Xml.tostring(element, encoding='utf-8').replace(b'\r', b'&#13;')
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        temp = None
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as stream:
+                stream.write(hashlib.sha1(payload).hexdigest().encode('ascii') + b'\n')
+                stream.write(payload)
+            os.rename(temp, path)
+        except (IOError, OSError) as e:
+            # a concurrent writer or a full disk must not fail the render
+            logger.warning('cannot write render cache entry %s: %s', path, e)
+            if temp is not None:
+                self._remove(temp)
+            return
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for path, size, mtime in self._entries())
+            else:
+                self._total += len(payload) + 41
+            if self._total > self.size:
+                self._evict()
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is below 90% of its cap."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda x: x[2])
+        total = sum(size for path, size, mtime in entries)
+        for path, size, mtime in entries:
+            if total <= self.size * 0.9:
+                break
+            if self._remove(path):
+                self.evictions += 1
+            total -= size
+        self._total = total
+
+    def clear(self):
+        with self._lock:
+            for path, size, mtime in list(self._entries()):
+                self._remove(path)
+            self._total = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def counters(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+disk_cache = None
+if os.environ.get(DISK_CACHE_ENV):
+    disk_cache = DiskCache(os.environ[DISK_CACHE_ENV],
+                           int(os.environ.get(DISK_CACHE_SIZE_ENV, DEFAULT_DISK_CACHE_SIZE)))
+stats.add_counters('render_cache', lambda: disk_cache.counters() if disk_cache is not None else None)
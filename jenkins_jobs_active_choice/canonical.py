@@ -0,0 +1,166 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Compares the active choice parameters of rendered jobs with their current config.xml.
+
+Jenkins rewrites the xml it stores: it adds plugin versions, reorders fields, keeps its own
+randomName and drops or adds empty elements. Comparing canonical forms of the unochoice
+parameters, instead of the raw xml, reports only the jobs whose parameters really changed:
+
+    python -m jenkins_jobs_active_choice.canonical --current dev-files/ref-config.xml jobs/job.yaml
+    python -m jenkins_jobs_active_choice.canonical --current /var/lib/jenkins/jobs --names jobs/
+
+--current is a config.xml when a single job is rendered, otherwise a directory holding
+<job>/config.xml or <job>.xml files. Other job settings are not compared.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import groovy
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import references
+
+# generated differently by every writer, carries no meaning
+IGNORED_TAGS = frozenset(['randomName'])
+IGNORED_ATTRIBUTES = frozenset(['plugin'])
+# the order of children matters in these lists and in the key-value pairs of entries, everything
+# else is a set of fields
+ORDERED_TAGS = frozenset(['classpath', 'parameters', 'entry'])
+# fields Jenkins writes with their default value, which mean the same as no field at all
+DEFAULTS = {'omitValueField': 'false', 'filterLength': '1'}
+# a script section without script text is the same as no section
+SCRIPT_SECTIONS = frozenset(['secureScript', 'secureFallbackScript'])
+
+
+def _script_text(text, ignore_script_formatting):
+    text = text.replace('\r\n', '\n').rstrip()
+    if ignore_script_formatting:
+        try:
+            return groovy.minify(text)
+        except Exception:
+            pass
+    return text
+
+
+def canonical(element, ignore_script_formatting=False):
+    """Returns a canonical, comparable form of an xml element, or None when it carries nothing.
+
+    Surrounding whitespace, ignored tags and attributes, the order of fields, empty elements and
+    fields left at their default are not part of the canonical form.
+    """
+    if element.tag in IGNORED_TAGS:
+        return None
+    attributes = tuple(sorted((k, v) for k, v in element.attrib.items() if k not in IGNORED_ATTRIBUTES))
+    text = element.text or ''
+    if element.tag == 'script':
+        text = _script_text(text, ignore_script_formatting)
+    else:
+        text = text.strip()
+    children = [x for x in (canonical(child, ignore_script_formatting) for child in element) if x is not None]
+    if element.tag not in ORDERED_TAGS:
+        children.sort()
+    if not text and not children and not [k for k, v in attributes if k != 'class']:
+        return None
+    if DEFAULTS.get(element.tag) == text and not children:
+        return None
+    if element.tag in SCRIPT_SECTIONS and not [x for x in children if x[0] == 'script']:
+        return None
+    return element.tag, attributes, text, tuple(children)
+
+
+def digest(element, ignore_script_formatting=False):
+    form = canonical(element, ignore_script_formatting)
+    return hashlib.sha1(json.dumps(form, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def parameter_digests(xml_root, ignore_script_formatting=False):
+    """Returns [(name, digest)] of the active choice parameters of a job, in job order."""
+    definitions = xml_root.find(references.PARAMETERS_PATH)
+    return [(element.findtext('name'), digest(element, ignore_script_formatting))
+            for element in (definitions if definitions is not None else [])
+            if element.tag.startswith(references.UNOCHOICE_PREFIX)]
+
+
+def compare(rendered, current, ignore_script_formatting=False):
+    """Returns the changes of the active choice parameters between two job xml roots.
+
+    The result maps 'added', 'removed' and 'modified' to parameter names, and 'reordered' to
+    whether the parameters are in a different order; it is empty when nothing changed.
+    """
+    new = parameter_digests(rendered, ignore_script_formatting)
+    old = parameter_digests(current, ignore_script_formatting)
+    new_map, old_map = dict(new), dict(old)
+    changes = {}
+    for key, names in (('added', [x for x, _ in new if x not in old_map]),
+                       ('removed', [x for x, _ in old if x not in new_map]),
+                       ('modified', [x for x, d in new if x in old_map and old_map[x] != d])):
+        if names:
+            changes[key] = names
+    if not changes and [x for x, _ in new] != [x for x, _ in old]:
+        changes['reordered'] = True
+    return changes
+
+
+def current_config(path, job_name, single):
+    """Returns the path of the current config.xml of a job, or None when there is none."""
+    if os.path.isfile(path):
+        return path if single else None
+    for candidate in (os.path.join(path, job_name, 'config.xml'), os.path.join(path, job_name + '.xml')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def format_changes(changes):
+    parts = ['%s %s' % (key, ', '.join(changes[key])) for key in ('added', 'removed', 'modified') if key in changes]
+    if changes.get('reordered'):
+        parts.append('reordered')
+    return '; '.join(parts)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args.add_argument('--current', required=True, help='current config.xml, or a directory of them')
+    args.add_argument('--ignore-script-formatting', action='store_true',
+                      help='also ignore comments and whitespace changes in groovy scripts')
+    args.add_argument('--names', action='store_true',
+                      help='only print the names of the jobs whose active choice parameters changed')
+    args = args.parse_args(argv)
+
+    rendered = list(jobs.iter_xml(jobs.load(args.paths)))
+    changed = 0
+    for job_name, xml_root in rendered:
+        path = current_config(args.current, job_name, len(rendered) == 1)
+        if path is None:
+            changes, message = True, 'new job'
+        else:
+            changes = compare(xml_root, Xml.parse(path).getroot(), args.ignore_script_formatting)
+            message = format_changes(changes) if changes else 'unchanged'
+        changed += bool(changes)
+        if args.names:
+            if changes:
+                print(job_name)
+        else:
+            print('%s: %s' % (job_name, message))
+    return 1 if changed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Finds groovy scripts inlined into many rendered jobs and optionally moves them to Scriptler.
+
+Reports identical scripts, and scripts that only differ in whitespace, with the bytes saved by
+keeping a single copy. With --externalize the repeated scripts that can safely run from Scriptler
+are written to a directory together with a manifest:
+
+    python -m jenkins_jobs_active_choice.dedup jobs/
+    python -m jenkins_jobs_active_choice.dedup --externalize scriptler-out/ --min-count 3 jobs/
+
+Import the written scripts into Scriptler, then render with
+JJB_ACTIVE_CHOICE_SCRIPTLER_MANIFEST=scriptler-out/manifest.json to reference them instead of
+inlining them.
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import references
+from jenkins_jobs_active_choice import scriptler
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize(script):
+    """Returns the script with whitespace differences removed, used to spot near-identical scripts."""
+    return _WHITESPACE_RE.sub(' ', script).strip()
+
+
+class ScriptGroup(object):
+    """One distinct script and every place it is inlined."""
+
+    def __init__(self, script):
+        self.script = script
+        self.size = len(script.encode('utf-8'))
+        self.locations = []
+        # locations that could reference the script from Scriptler instead
+        self.eligible = 0
+
+    @property
+    def saved_bytes(self):
+        return (len(self.locations) - 1) * self.size
+
+
+def _eligible(parameter, role, secure_script):
+    # mirrors scriptler.externalized(), which decides on the yaml input at render time
+    return (role == 'secureScript' and
+            parameter.find('script/secureFallbackScript') is None and
+            not (parameter.findtext('referencedParameters') or '').strip() and
+            secure_script.find('classpath') is None and
+            not scriptler.is_sandboxed(secure_script.findtext('sandbox')))
+
+
+def collect(rendered):
+    """Groups the scripts of rendered jobs, given as (job name, xml root) pairs, by exact content."""
+    groups = {}
+    for job_name, xml_root in rendered:
+        definitions = xml_root.find(references.PARAMETERS_PATH)
+        for parameter in definitions if definitions is not None else []:
+            if not parameter.tag.startswith(references.UNOCHOICE_PREFIX):
+                continue
+            for role in ('secureScript', 'secureFallbackScript'):
+                secure_script = parameter.find('script/' + role)
+                script = secure_script.findtext('script') if secure_script is not None else None
+                if not script:
+                    continue
+                key = scriptler.script_hash(script)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = ScriptGroup(script)
+                group.locations.append((job_name, parameter.findtext('name'), role))
+                group.eligible += _eligible(parameter, role, secure_script)
+    return groups
+
+
+def near_identical(groups):
+    """Returns lists of distinct scripts that only differ in whitespace."""
+    by_normalized = {}
+    for key, group in groups.items():
+        by_normalized.setdefault(normalize(group.script), []).append(key)
+    return [sorted(keys) for keys in by_normalized.values() if len(keys) > 1]
+
+
+def script_id(key):
+    return 'jjb-%s.groovy' % key[:12]
+
+
+def externalize(groups, directory, min_count=2):
+    """Writes every script used by at least min_count eligible parameters, with a manifest and a
+    Scriptler catalog fragment, and returns the manifest path."""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    scripts = {}
+    catalog = Xml.Element('scriptSet')
+    for key, group in sorted(groups.items()):
+        if group.eligible < min_count:
+            continue
+        scripts[key] = script_id(key)
+        with io.open(os.path.join(directory, scripts[key]), 'w', encoding='utf-8') as stream:
+            stream.write(group.script)
+        entry = Xml.SubElement(catalog, scriptler.CATALOG_SCRIPT_TAG)
+        Xml.SubElement(entry, 'id').text = scripts[key]
+        Xml.SubElement(entry, 'name').text = scripts[key]
+        Xml.SubElement(entry, 'comment').text = 'shared by %d active choice parameters' % len(group.locations)
+        Xml.SubElement(entry, 'available').text = 'true'
+        Xml.SubElement(entry, 'nonAdministerUsing').text = 'false'
+        Xml.SubElement(entry, 'onlyMaster').text = 'true'
+        Xml.SubElement(entry, 'parameters')
+    Xml.ElementTree(catalog).write(os.path.join(directory, 'scriptler.xml'), encoding='utf-8')
+    path = os.path.join(directory, 'manifest.json')
+    with open(path, 'w') as stream:
+        json.dump({'format': scriptler.MANIFEST_FORMAT, 'scripts': scripts}, stream, indent=2, sort_keys=True)
+    return path
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args.add_argument('--top', type=int, default=20, help='number of scripts to report (default 20)')
+    args.add_argument('--json', action='store_true', help='print the report as json')
+    args.add_argument('--externalize', metavar='DIR', help='write repeated scripts and a manifest to DIR')
+    args.add_argument('--min-count', type=int, default=2, help='minimum uses of a script to externalize it')
+    args = args.parse_args(argv)
+
+    groups = collect(jobs.iter_xml(jobs.load(args.paths)))
+    repeated = sorted((g for g in groups.values() if len(g.locations) > 1), key=lambda g: -g.saved_bytes)
+    report = [{
+        'hash': scriptler.script_hash(g.script),
+        'bytes': g.size,
+        'uses': len(g.locations),
+        'externalizable_uses': g.eligible,
+        'saved_bytes': g.saved_bytes,
+        'first_use': list(g.locations[0]),
+    } for g in repeated[:args.top]]
+
+    if args.json:
+        print(json.dumps({'scripts': report, 'near_identical': near_identical(groups)}, indent=2, sort_keys=True))
+    else:
+        for entry in report:
+            print('%(hash).12s: %(bytes)d bytes used %(uses)d times (%(externalizable_uses)d externalizable), '
+                  'saves %(saved_bytes)d bytes' % entry)
+        for keys in near_identical(groups):
+            print('near-identical (whitespace only): %s' % ', '.join(k[:12] for k in keys))
+        print('%d bytes saved by deduplicating %d scripts' % (sum(g.saved_bytes for g in repeated), len(repeated)))
+
+    if args.externalize:
+        print('manifest written to %s' % externalize(groups, args.externalize, args.min_count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
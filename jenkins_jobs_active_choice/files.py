@@ -0,0 +1,250 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# scripts referenced with script-file keys instead of being inlined in yaml, and choices-from data files
+import codecs
+import collections
+import csv
+import io
+import json
+import logging
+import mmap
+import os
+import threading
+
+import yaml
+
+from jenkins_jobs_active_choice import compat
+from jenkins_jobs_active_choice import templates
+
+logger = logging.getLogger(__name__)
+
+# extra directories searched for script files, separated by os.pathsep
+INCLUDE_PATH_ENV = 'JJB_ACTIVE_CHOICE_INCLUDE_PATH'
+
+# files of at least this size are memory-mapped instead of read into a buffer first
+MMAP_THRESHOLD = 1024 * 1024
+
+# yaml key of a script file, and the key it provides, at the top level and in groovy/fallback sections
+TOP_LEVEL_FILE_KEYS = (('script-file', 'script'), ('fallback-script-file', 'fallback-script'))
+SECTION_FILE_KEYS = (('script-file', 'script'),)
+SECTIONS = ('groovy', 'fallback')
+
+# data files rendered into a lookup script, by extension
+CHOICES_FORMATS = ('.json', '.yaml', '.yml', '.csv')
+
+
+class ScriptFileCache(object):
+    """Process-wide cache of decoded script files keyed by path and modification time.
+
+    A file shared by many jobs is read and decoded once per run; it is read again only when
+    its modification time or size changes. Lookups only take the lock to store their result, so
+    threads may occasionally read the same file twice but always see a complete entry.
+    """
+
+    def __init__(self):
+        self._resolved = {}
+        self._scripts = {}
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def find(self, name, search_path=()):
+        """Returns the absolute path of a script file, looked up in the include paths first."""
+        key = (name, tuple(search_path))
+        path = self._resolved.get(key)
+        if path is None:
+            for directory in include_path + list(search_path):
+                candidate = os.path.join(directory, name)
+                if os.path.isfile(candidate):
+                    path = candidate
+                    break
+            else:
+                if not os.path.isfile(name):
+                    raise Exception("script file not found: %s (include path: %s)" % (
+                        name, os.pathsep.join(include_path + list(search_path))))
+                path = name
+            path = os.path.abspath(path)
+            with self._lock:
+                self._resolved[key] = path
+        return path
+
+    def read(self, name, search_path=()):
+        """Returns the content of a script file as text."""
+        path = self.find(name, search_path)
+        st = os.stat(path)
+        version = (st.st_mtime, st.st_size)
+        cached = self._scripts.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        logger.debug('reading script file %s', path)
+        with io.open(path, 'rb') as stream:
+            if st.st_size >= MMAP_THRESHOLD:
+                mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    # decoded straight from the mapping, without an intermediate copy of the bytes
+                    script = codecs.utf_8_decode(mapped, 'strict', True)[0]
+                finally:
+                    mapped.close()
+            else:
+                script = stream.read().decode('utf-8')
+        with self._lock:
+            self.reads += 1
+            self._scripts[path] = (version, script)
+        return script
+
+    def clear(self):
+        with self._lock:
+            self._resolved.clear()
+            self._scripts.clear()
+
+
+def _choice(value, path):
+    if isinstance(value, (dict, list)):
+        raise Exception("choices must be strings or numbers, not this: '%s' in %s" % (value, path))
+    if isinstance(value, bool):
+        return str(value).lower()
+    return value if isinstance(value, compat.STRING_TYPES) else str(value)
+
+
+def parse_choices(path, text, keyed):
+    """Returns the choices of a data file: a list, or when keyed an {value: list} mapping.
+
+    CSV files have no header; their first column holds the choices, or when keyed the value of the
+    key parameter followed by a choice on every row.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        rows = [row for row in csv.reader(text.splitlines()) if row]
+        if not keyed:
+            return [_choice(row[0], path) for row in rows]
+        if any(len(row) < 2 for row in rows):
+            raise Exception("choices file %s must have two columns, the key value and a choice" % path)
+        data = collections.OrderedDict()
+        for row in rows:
+            data.setdefault(row[0], []).append(row[1])
+    elif extension == '.json':
+        data = json.loads(text, object_pairs_hook=collections.OrderedDict)
+    elif extension in ('.yaml', '.yml'):
+        data = yaml.safe_load(text)
+    else:
+        raise Exception("unsupported choices file %s, expected one of: %s" % (path, ', '.join(CHOICES_FORMATS)))
+
+    if not keyed:
+        if not isinstance(data, list):
+            raise Exception("choices file %s must hold a list, or set choices-key for a mapping" % path)
+        return [_choice(x, path) for x in data]
+    if not isinstance(data, dict):
+        raise Exception("choices file %s must hold a mapping when choices-key is set" % path)
+    return collections.OrderedDict(
+        (_choice(k, path), [_choice(x, path) for x in (v if isinstance(v, list) else [v])]) for k, v in data.items())
+
+
+class ChoicesFileCache(object):
+    """Lookup scripts generated from choices-from files, keyed by path, version and key parameter.
+
+    A data file shared by many jobs is parsed and rendered once per run.
+    """
+
+    def __init__(self):
+        self._scripts = {}
+        self.parses = 0
+        self._lock = threading.Lock()
+
+    def script(self, name, key=None, search_path=()):
+        path = script_files.find(name, search_path)
+        st = os.stat(path)
+        memo_key = (path, st.st_mtime, st.st_size, key)
+        script = self._scripts.get(memo_key)
+        if script is None:
+            choices = parse_choices(path, script_files.read(path), key is not None)
+            script = templates.lookup(choices, os.path.basename(name), key)
+            with self._lock:
+                self.parses += 1
+                self._scripts[memo_key] = script
+        return script
+
+    def clear(self):
+        with self._lock:
+            self._scripts.clear()
+
+
+def _resolve_choices(section, search_path, param_name, reference):
+    if 'choices-from' not in section:
+        if 'choices-key' in section:
+            raise Exception("choices-key needs choices-from in %s" % param_name)
+        return None
+    if 'script' in section or 'script-file' in section:
+        raise Exception("use either script, script-file or choices-from, not both in %s" % param_name)
+    resolved = dict(section)
+    key = resolved.pop('choices-key', None)
+    if key is not None:
+        key = str(key)
+        if not templates.is_identifier(key) or key not in templates.reference_names(reference):
+            raise Exception("choices-key must be a referenced parameter with a groovy identifier for a name, "
+                            "not this: '%s' in %s" % (key, param_name))
+    resolved['script'] = choices_files.script(str(resolved.pop('choices-from')), key, search_path)
+    return resolved
+
+
+def _resolve_keys(data, file_keys, search_path, param_name):
+    resolved = None
+    for file_key, key in file_keys:
+        if file_key not in data:
+            continue
+        if key in data:
+            raise Exception("use either %s or %s, not both in %s" % (key, file_key, param_name))
+        if resolved is None:
+            resolved = dict(data)
+        resolved[key] = script_files.read(resolved.pop(file_key), search_path)
+    return resolved
+
+
+def _references_files(data):
+    # checked for every rendered parameter, most of which inline their scripts
+    if 'script-file' in data or 'fallback-script-file' in data:
+        return True
+    for section in SECTIONS:
+        section_data = data.get(section)
+        if isinstance(section_data, dict) and ('script-file' in section_data or 'choices-from' in section_data or
+                                               'choices-key' in section_data):
+            return True
+    return False
+
+
+def resolve(data, search_path=()):
+    """Returns the parameter definition with the content of its script files inlined, and the lookup
+    scripts generated from its choices-from files.
+
+    The definition is returned as is when it references no files, otherwise a copy is returned.
+    """
+    if not isinstance(data, dict) or not _references_files(data):
+        return data
+    param_name = data.get('name')
+    resolved = _resolve_keys(data, TOP_LEVEL_FILE_KEYS, search_path, param_name)
+    for section in SECTIONS:
+        section_data = data.get(section)
+        if isinstance(section_data, dict):
+            section_data = (_resolve_choices(section_data, search_path, param_name, data.get('reference')) or
+                            _resolve_keys(section_data, SECTION_FILE_KEYS, search_path, param_name))
+            if section_data is not None:
+                if resolved is None:
+                    resolved = dict(data)
+                resolved[section] = section_data
+    return data if resolved is None else resolved
+
+
+include_path = [x for x in os.environ.get(INCLUDE_PATH_ENV, '').split(os.pathsep) if x]
+script_files = ScriptFileCache()
+choices_files = ChoicesFileCache()
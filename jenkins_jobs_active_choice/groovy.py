@@ -0,0 +1,412 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Groovy script tokenizer and minifier.
+
+Minification drops comments, indentation, blank lines and redundant spaces but never touches
+string literals, GStrings (including their ${...} expressions), slashy or dollar-slashy strings.
+Line breaks are kept because they terminate groovy statements, and a line where a slash after a
+bare word may start a slashy string (`println /a  b/`) is kept as it is. The report below shows what it
+would save on rendered jobs:
+
+    python -m jenkins_jobs_active_choice.groovy jobs/
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# 'true' minifies every groovy and fallback script unless its section sets minify: false
+MINIFY_ENV = 'JJB_ACTIVE_CHOICE_MINIFY'
+
+# token kinds
+NEWLINE = 'newline'
+SPACE = 'space'
+COMMENT = 'comment'
+STRING = 'string'
+WORD = 'word'
+OP = 'op'
+
+# a slash after these words starts a slashy string instead of a division
+_REGEX_KEYWORDS = frozenset(['return', 'case', 'in', 'assert', 'throw', 'else', 'instanceof', 'new'])
+# statements starting with these words are not method declarations
+_CONTROL_WORDS = _REGEX_KEYWORDS | frozenset(['if', 'while', 'for', 'switch', 'catch', 'do', 'try'])
+_TYPE_KEYWORDS = frozenset(['class', 'interface', 'enum', 'trait'])
+# no space is needed after/before these characters
+_NO_SPACE_AFTER = frozenset('([{},;')
+_NO_SPACE_BEFORE = frozenset(')]{},;')
+
+
+def _is_word_char(c):
+    return c.isalnum() or c in '_$'
+
+
+def _line(script, pos):
+    return script.count('\n', 0, pos) + 1
+
+
+def _error(script, start, what):
+    raise Exception("unterminated %s at line %d of groovy script" % (what, _line(script, start)))
+
+
+def _skip_interpolation(script, pos):
+    # pos is just after '${', returns the position after the matching '}'
+    end = _scan(script, pos, None, nested=True)
+    if end >= len(script):
+        _error(script, pos, 'GString expression')
+    return end + 1
+
+
+def _skip_quoted(script, start, quote):
+    # '...', "...", '''...''' and """..."""; only double quotes interpolate
+    pos = start + len(quote)
+    interpolate = quote[0] == '"'
+    multiline = len(quote) == 3
+    while pos < len(script):
+        c = script[pos]
+        if c == '\\':
+            pos += 2
+        elif script.startswith(quote, pos):
+            return pos + len(quote)
+        elif interpolate and script.startswith('${', pos):
+            pos = _skip_interpolation(script, pos + 2)
+        elif c == '\n' and not multiline:
+            break
+        else:
+            pos += 1
+    _error(script, start, 'string')
+
+
+def _skip_slashy(script, start):
+    pos = start + 1
+    while pos < len(script):
+        if script.startswith('\\/', pos):
+            pos += 2
+        elif script[pos] == '/':
+            return pos + 1
+        elif script.startswith('${', pos):
+            pos = _skip_interpolation(script, pos + 2)
+        else:
+            pos += 1
+    _error(script, start, 'slashy string')
+
+
+def _skip_dollar_slashy(script, start):
+    pos = start + 2
+    while pos < len(script):
+        if script.startswith('/$', pos):
+            return pos + 2
+        elif script.startswith(('$$', '$/'), pos):
+            pos += 2
+        elif script.startswith('${', pos):
+            pos = _skip_interpolation(script, pos + 2)
+        else:
+            pos += 1
+    _error(script, start, 'dollar-slashy string')
+
+
+def _regex_allowed(previous):
+    # decides whether a slash starts a slashy string, from the previous significant token
+    if previous is None:
+        return True
+    kind, text = previous
+    if kind == WORD:
+        return text in _REGEX_KEYWORDS
+    if kind == OP:
+        return text not in ')]}'
+    return kind == NEWLINE
+
+
+def _scan(script, pos, tokens, nested=False):
+    """Appends (kind, text) tokens from pos to tokens and returns the end position.
+
+    Nested scans cover a ${...} expression and stop at its unmatched closing brace.
+    """
+    length = len(script)
+    previous = None
+    depth = 0
+    while pos < length:
+        c = script[pos]
+        start = pos
+        if c == '\n':
+            kind, pos = NEWLINE, pos + 1
+        elif c in ' \t\r\f' or script.startswith('\\\n', pos):
+            pos += 1
+            while pos < length and (script[pos] in ' \t\r\f' or script.startswith('\\\n', pos)):
+                pos += 1
+            kind = SPACE
+        elif script.startswith('//', pos) or (pos == 0 and script.startswith('#!')):
+            end = script.find('\n', pos)
+            kind, pos = COMMENT, length if end < 0 else end
+        elif script.startswith('/*', pos):
+            end = script.find('*/', pos + 2)
+            if end < 0:
+                _error(script, start, 'comment')
+            kind, pos = COMMENT, end + 2
+        elif c in '\'"':
+            quote = c * 3 if script.startswith(c * 3, pos) else c
+            kind, pos = STRING, _skip_quoted(script, pos, quote)
+        elif script.startswith('$/', pos) and _regex_allowed(previous):
+            kind, pos = STRING, _skip_dollar_slashy(script, pos)
+        elif c == '/' and _regex_allowed(previous):
+            kind, pos = STRING, _skip_slashy(script, pos)
+        elif _is_word_char(c):
+            pos += 1
+            while pos < length and _is_word_char(script[pos]):
+                pos += 1
+            kind = WORD
+        else:
+            if nested:
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    if not depth:
+                        return pos
+                    depth -= 1
+            kind, pos = OP, pos + 1
+        token = (kind, script[start:pos])
+        if kind not in (SPACE, COMMENT):
+            previous = token
+        if tokens is not None:
+            tokens.append(token)
+    return pos
+
+
+def tokenize(script):
+    """Returns the (kind, text) tokens of a groovy script; joining their texts gives the script back."""
+    tokens = []
+    _scan(script, 0, tokens)
+    return tokens
+
+
+def _skip_parens(tokens, i):
+    # tokens[i] opens a parenthesis, returns the index after the matching one
+    depth = 0
+    while i < len(tokens):
+        if tokens[i] == (OP, '('):
+            depth += 1
+        elif tokens[i] == (OP, ')'):
+            depth -= 1
+            if not depth:
+                return i + 1
+        i += 1
+    return i
+
+
+def _skip_annotations(tokens, i):
+    # returns the index of the first token after the annotations starting at tokens[i] and the blanks after them
+    while i < len(tokens):
+        if tokens[i] == (OP, '@'):
+            i += 1
+            while i < len(tokens) and (tokens[i][0] == WORD or tokens[i] == (OP, '.')):
+                i += 1
+            while i < len(tokens) and tokens[i][0] == SPACE:
+                i += 1
+            if i < len(tokens) and tokens[i] == (OP, '('):
+                i = _skip_parens(tokens, i)
+        elif tokens[i][0] in (SPACE, COMMENT, NEWLINE):
+            i += 1
+        else:
+            break
+    return i
+
+
+def split_imports(script):
+    """Returns (header, body): the shebang and import statements of a script, and the rest of it.
+
+    Generated code placed around a script must come after its imports, which groovy only accepts
+    at the top of a script. An import keeps its annotations, e.g. @Grab, on its header line.
+    """
+    header, body = [], []
+    tokens = tokenize(script)
+    statement_start = True
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if statement_start and tokens[i] == (OP, '@'):
+            end = _skip_annotations(tokens, i)
+            if end < len(tokens) and tokens[end] == (WORD, 'import'):
+                # one line per import: comments and line breaks between its annotations become spaces
+                header.extend(x[1] if x[0] not in (COMMENT, NEWLINE) else ' ' for x in tokens[i:end])
+                i = end
+                kind, text = tokens[i]
+        if statement_start and ((kind == WORD and text == 'import') or (kind == COMMENT and text.startswith('#!'))):
+            while i < len(tokens) and tokens[i][0] != NEWLINE and tokens[i] != (OP, ';'):
+                header.append(tokens[i][1])
+                i += 1
+            header.append('\n')
+            # the newline or semicolon ending the statement
+            i += 1
+            continue
+        body.append(text)
+        if kind == NEWLINE or (kind == OP and text == ';'):
+            statement_start = True
+        elif kind not in (SPACE, COMMENT):
+            statement_start = False
+        i += 1
+    return ''.join(header), ''.join(body)
+
+
+def _declared(tokens, i):
+    # the name declared by the top level statement starting at tokens[i], if it is a method or a class
+    i = _skip_annotations(tokens, i)
+    start = i
+    words = []
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if kind == WORD:
+            if text in _TYPE_KEYWORDS and (i == start or tokens[i - 1][0] == WORD):
+                return tokens[i + 1][1] if i + 1 < len(tokens) and tokens[i + 1][0] == WORD else None
+            words.append(text)
+        elif not (kind == OP and text in '.<>[],?'):
+            break
+        i += 1
+    # a return type or def, then the method name: a method call has no word before its name
+    if (i >= len(tokens) or tokens[i] != (OP, '(') or len(words) < 2 or tokens[i - 1][0] != WORD or
+            tokens[i - 2][0] == OP and tokens[i - 2][1] in '.,?' or _CONTROL_WORDS.intersection(words)):
+        return None
+    i = _skip_parens(tokens, i)
+    while i < len(tokens) and (tokens[i][0] == NEWLINE or tokens[i] == (WORD, 'throws') or
+                               tokens[i - 1] == (WORD, 'throws') and tokens[i][0] == WORD):
+        i += 1
+    return words[-1] if i < len(tokens) and tokens[i] == (OP, '{') else None
+
+
+def declarations(script):
+    """Returns the names of the methods and classes a script declares at its top level.
+
+    Groovy only accepts these in a script body, not inside the closure of a generated wrapper.
+    """
+    tokens = [x for x in tokenize(script) if x[0] not in (SPACE, COMMENT)]
+    names = []
+    depth = 0
+    statement_start = True
+    for i, (kind, text) in enumerate(tokens):
+        if statement_start and not depth:
+            name = _declared(tokens, i)
+            # an annotation on a line of its own starts the same declaration again on the next line
+            if name and name not in names:
+                names.append(name)
+        if kind == OP and text == '{':
+            depth += 1
+        elif kind == OP and text == '}':
+            depth = max(depth - 1, 0)
+        statement_start = kind == NEWLINE or (kind == OP and text in ';{}')
+    return names
+
+
+def _lines(tokens):
+    # the tokens of each line, without the newlines; comments and strings may span lines
+    line = []
+    for token in tokens:
+        if token[0] == NEWLINE:
+            yield line
+            line = []
+        else:
+            line.append(token)
+    yield line
+
+
+def _command_slashy(line):
+    """Returns whether a slash follows a bare word the way a command call's slashy argument does.
+
+    The tokenizer reads `foo /a  b/` as a division, groovy may read a slashy string: lines like this
+    are left as they are.
+    """
+    previous = None
+    for i, (kind, text) in enumerate(line):
+        if (kind == OP and text == '/' and previous is not None and previous[0] == WORD and
+                previous[1] not in _REGEX_KEYWORDS and line[i - 1][0] == SPACE and
+                i + 1 < len(line) and line[i + 1][0] != SPACE and not line[i + 1][1].startswith('=')):
+            return True
+        if kind not in (SPACE, COMMENT):
+            previous = (kind, text)
+    return False
+
+
+def _minify_line(line):
+    out = []
+    space = False
+    for kind, text in line:
+        if kind in (SPACE, COMMENT):
+            # comments are whitespace to groovy, even the ones spanning lines
+            space = True
+        else:
+            if space and out and out[-1][-1] not in _NO_SPACE_AFTER and text[0] not in _NO_SPACE_BEFORE:
+                out.append(' ')
+            out.append(text)
+            space = False
+    return ''.join(out)
+
+
+def minify(script):
+    """Returns the script without comments, indentation, blank lines and redundant spaces."""
+    out = []
+    for line in _lines(tokenize(script)):
+        if _command_slashy(line):
+            text = ''.join(text for kind, text in line).strip()
+        else:
+            text = _minify_line(line)
+        if text:
+            out.append(text)
+    return '\n'.join(out)
+
+
+def minify_enabled(section):
+    """Returns whether the script of a groovy or fallback section is minified."""
+    if 'minify' not in section:
+        return _default
+    value = str(section['minify']).lower()
+    if value not in ('true', 'false'):
+        raise Exception("minify must be true or false, not this: '%s'" % value)
+    return value == 'true'
+
+
+def script_text(section, script):
+    """Returns the script of a groovy or fallback section as it is written to the job."""
+    if not minify_enabled(section):
+        return script
+    minified = minify(script)
+    logger.debug('minified groovy script from %d to %d characters', len(script), len(minified))
+    return minified
+
+
+_default = os.environ.get(MINIFY_ENV, 'false').lower() == 'true'
+
+
+def main(argv=None):
+    from jenkins_jobs_active_choice import jobs
+
+    args = argparse.ArgumentParser(description='Reports the script bytes minification removes from every job.')
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args = args.parse_args(argv)
+
+    total = minified_total = 0
+    for job_name, xml_root in jobs.iter_xml(jobs.load(args.paths)):
+        scripts = [x.text for x in xml_root.iter('script') if x.text]
+        size = sum(len(x.encode('utf-8')) for x in scripts)
+        minified = sum(len(minify(x).encode('utf-8')) for x in scripts)
+        if size:
+            print('%s: %d -> %d script bytes (-%.1f%%)' % (job_name, size, minified, 100.0 * (size - minified) / size))
+        total += size
+        minified_total += minified
+    print('total: %d -> %d script bytes, %d saved' % (total, minified_total, total - minified_total))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
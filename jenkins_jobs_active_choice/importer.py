@@ -0,0 +1,301 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Imports active choice parameters of existing jobs into jenkins-job-builder yaml.
+
+Reads config.xml files, a directory tree of them such as $JENKINS_HOME/jobs included, converts
+every ChoiceParameter, CascadeChoiceParameter and DynamicReferenceParameter into the matching
+active-choice yaml and renders it again to verify that the result is equivalent:
+
+    python -m jenkins_jobs_active_choice.importer --output imported/ $JENKINS_HOME/jobs
+
+Each job gets a yaml file with its active choice parameters, to be merged into the job
+definition. Files are parsed incrementally and converted in a pool of worker processes, so
+memory stays bounded by the largest parameter rather than the largest file. Parameters that do
+not round-trip are reported and the command exits with 1.
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import sys
+import xml.etree.ElementTree as Xml
+
+import yaml
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import canonical
+
+# xml element of each parameter type, and the yaml entry point rendering it back
+KINDS = {
+    'org.biouno.unochoice.ChoiceParameter': 'active-choice',
+    'org.biouno.unochoice.CascadeChoiceParameter': 'active-choice-reactive',
+    'org.biouno.unochoice.DynamicReferenceParameter': 'active-choice-reactive-reference',
+}
+
+GROOVY_SCRIPT = 'org.biouno.unochoice.model.GroovyScript'
+SCRIPTLER_SCRIPT = 'org.biouno.unochoice.model.ScriptlerScript'
+
+# directories of a job that hold other jobs
+JOB_CONTAINERS = frozenset(['jobs', 'branches'])
+
+# handled on their own, or carrying nothing to import
+_SPECIAL_TAGS = frozenset(['script', 'choiceType', 'randomName', 'parameters'])
+
+# keys written first, the others follow in the order of the xml
+_FIRST_KEYS = ('name', 'project')
+
+
+def _reverse(table):
+    # several yaml choice types map to the same xml value, prefer the explicit name over 'default'
+    return dict((v, k) for k, v in sorted(table.items(), reverse=True) if k != 'default')
+
+
+_REVERSE_CHOICE_TYPES = dict((kind, _reverse(spec.choice_type)) for kind, spec in active_choice.SPECS.items())
+
+
+def _scalar(text):
+    # typed like hand written yaml, rendering gives the same text back
+    if text in ('true', 'false'):
+        return text == 'true'
+    if text.isdigit() and str(int(text)) == text:
+        return int(text)
+    return text
+
+
+def _groovy_section(element):
+    section = {'script': element.findtext('script') or ''}
+    sandbox = (element.findtext('sandbox') or 'false').strip()
+    if sandbox != 'false':
+        section['sandbox'] = _scalar(sandbox)
+    entries = [(x.findtext('url') if len(x) else x.text) or '' for x in element.findall('classpath/entry')]
+    if entries:
+        section['classpath'] = ', '.join(x.strip() for x in entries)
+    return section
+
+
+def _script(element, data, problems):
+    script_class = element.get('class')
+    if script_class == GROOVY_SCRIPT:
+        secure_script = element.find('secureScript')
+        if secure_script is None:
+            problems.append('only secure groovy scripts are supported')
+            return
+        data['groovy'] = _groovy_section(secure_script)
+        fallback = element.find('secureFallbackScript')
+        if fallback is not None and fallback.findtext('script'):
+            data['fallback'] = _groovy_section(fallback)
+    elif script_class == SCRIPTLER_SCRIPT:
+        scriptler = {'script': element.findtext('scriptlerScriptId') or ''}
+        parameters = [dict([[x.text or '' for x in entry.findall('string')]])
+                      for entry in element.findall('parameters/entry') if len(entry.findall('string')) == 2]
+        if parameters:
+            scriptler['parameters'] = parameters
+        data['scriptler'] = scriptler
+    else:
+        problems.append("unsupported script class '%s'" % script_class)
+
+
+def convert(element):
+    """Returns (kind, data, problems) for an unochoice parameter element.
+
+    data is the yaml definition of the parameter, problems lists what could not be converted.
+    """
+    kind = KINDS[element.tag]
+    spec = active_choice.SPECS[kind]
+    problems = []
+    data = {}
+    fields = dict((tag, name) for name, tag in spec.required)
+    defaults = dict((tag, (name, default)) for name, tag, default in spec.optional)
+
+    for child in element:
+        text = (child.text or '').strip()
+        if child.tag in fields:
+            data[fields[child.tag]] = child.text or ''
+        elif child.tag in defaults:
+            name, default = defaults[child.tag]
+            if text != default:
+                data[name] = _scalar(text) if child.tag != 'description' else child.text
+        elif child.tag == 'script':
+            _script(child, data, problems)
+        elif child.tag == 'choiceType':
+            choice_type = _REVERSE_CHOICE_TYPES[kind].get(text)
+            if choice_type is None:
+                problems.append("unsupported choice type '%s'" % text)
+            elif spec.choice_type[choice_type] != spec.choice_type['default']:
+                data['choice-type'] = choice_type
+        elif child.tag not in _SPECIAL_TAGS and canonical.canonical(child) is not None:
+            problems.append("unsupported field '%s'" % child.tag)
+    return kind, data, problems
+
+
+def verify(kind, data, element):
+    """Returns why data does not render to a parameter equivalent to element, or None when it does."""
+    parent = Xml.Element('parameterDefinitions')
+    try:
+        active_choice.ENTRY_POINTS[kind](None, parent, data)
+    except Exception as e:
+        return 'cannot be rendered: %s' % e
+    if canonical.digest(parent[0]) != canonical.digest(element):
+        return 'does not render back to the same xml'
+    return None
+
+
+def iter_parameters(path):
+    """Yields the unochoice parameter elements of a config.xml, each cleared once the caller moves on.
+
+    Everything else is cleared as soon as it is parsed, so memory is bounded by the largest parameter.
+    """
+    depth = 0
+    for event, element in Xml.iterparse(path, events=('start', 'end')):
+        if element.tag in KINDS:
+            depth += 1 if event == 'start' else -1
+            if event == 'end':
+                yield element
+                element.clear()
+        elif event == 'end' and not depth:
+            element.clear()
+
+
+class _Dumper(yaml.SafeDumper):
+    pass
+
+
+def _represent_str(dumper, value):
+    style = '|' if '\n' in value else None
+    return dumper.represent_scalar('tag:yaml.org,2002:str', value, style=style)
+
+
+def _represent_dict(dumper, value):
+    items = sorted(value.items(), key=lambda x: _FIRST_KEYS.index(x[0]) if x[0] in _FIRST_KEYS else len(_FIRST_KEYS))
+    return dumper.represent_mapping('tag:yaml.org,2002:map', items)
+
+
+_Dumper.add_representer(str, _represent_str)
+_Dumper.add_representer(dict, _represent_dict)
+if sys.version_info < (3, 0):
+    _Dumper.add_representer(unicode, _represent_str)  # noqa: F821
+
+
+def to_yaml(job_name, parameters):
+    """Returns the yaml of a job with the given [(kind, data)] parameters."""
+    job = {'job': {'name': job_name, 'parameters': [{kind: data} for kind, data in parameters]}}
+    return yaml.dump([job], Dumper=_Dumper, default_flow_style=False, allow_unicode=True)
+
+
+def import_file(path, job_name):
+    """Returns (job name, yaml or None, problems) for one config.xml.
+
+    problems are (parameter name, message) pairs; the yaml holds only the parameters that
+    converted without problems and rendered back to the same xml.
+    """
+    parameters = []
+    problems = []
+    try:
+        for element in iter_parameters(path):
+            kind, data, errors = convert(element)
+            name = element.findtext('name')
+            # rendered from the yaml as it will be read back, so that dumping is verified too
+            if not errors:
+                data = yaml.safe_load(to_yaml(job_name, [(kind, data)]))[0]['job']['parameters'][0][kind]
+                error = verify(kind, data, element)
+                if error:
+                    errors = [error]
+            if errors:
+                problems.extend((name, x) for x in errors)
+            else:
+                parameters.append((kind, data))
+    except Xml.ParseError as e:
+        problems.append((None, 'cannot parse %s: %s' % (path, e)))
+    return job_name, to_yaml(job_name, parameters) if parameters else None, problems
+
+
+def _import_file(args):
+    return import_file(*args)
+
+
+def config_files(paths):
+    """Returns (config.xml path, job name) for files and directory trees, in a stable order.
+
+    Job names follow Jenkins folders: jobs/folder/jobs/name/config.xml is imported as folder/name.
+    """
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            directory, filename = os.path.split(os.path.abspath(path))
+            found.append((path, os.path.basename(directory) if filename == 'config.xml'
+                          else os.path.splitext(filename)[0]))
+            continue
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            if directory == path:
+                continue
+            parts = os.path.relpath(directory, path).split(os.sep)
+            if len(parts) % 2:
+                # a job: only folders and multibranch projects hold more jobs, builds/ and
+                # workspace/ can be huge and are never entered
+                dirnames[:] = [x for x in dirnames if x in JOB_CONTAINERS]
+                if 'config.xml' in filenames:
+                    found.append((os.path.join(directory, 'config.xml'), '/'.join(parts[::2])))
+    return found
+
+
+def run(paths, processes=None):
+    """Imports every config file, in parallel when there is more than one, yielding results in input order."""
+    tasks = config_files(paths)
+    if len(tasks) < 2 or processes == 1:
+        for task in tasks:
+            yield _import_file(task)
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap(_import_file, tasks, chunksize=16):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='config.xml files or directories of jobs')
+    args.add_argument('--output', help='directory receiving one yaml file per job (default: print them)')
+    args.add_argument('--processes', type=int, help='number of worker processes (default: cpu count)')
+    args = args.parse_args(argv)
+
+    failed = imported = 0
+    for job_name, text, problems in run(args.paths, args.processes):
+        for name, message in problems:
+            print("%s: parameter '%s' %s" % (job_name, name, message) if name else '%s: %s' % (job_name, message),
+                  file=sys.stderr)
+        failed += bool(problems)
+        if text is None:
+            continue
+        imported += 1
+        if args.output:
+            path = os.path.join(args.output, job_name.replace('/', '_') + '.yaml')
+            if not os.path.isdir(args.output):
+                os.makedirs(args.output)
+            with open(path, 'w') as stream:
+                stream.write(text)
+        else:
+            sys.stdout.write(text)
+    print('%d job(s) imported, %d with problems' % (imported, failed), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
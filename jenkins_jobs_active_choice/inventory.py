@@ -0,0 +1,255 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Indexes the active choice parameters of a fleet into a SQLite database.
+
+Scans job xml in parallel, either a $JENKINS_HOME/jobs tree or the output directory of
+`jenkins-jobs test -o`, and records every parameter with its scripts, sandbox flags, classpath
+entries, referenced parameters and Scriptler script. Script bodies are stored once by hash.
+Files whose modification time and size did not change since the previous scan are skipped:
+
+    python -m jenkins_jobs_active_choice.inventory --db fleet.sqlite $JENKINS_HOME/jobs
+
+Then, for example:
+
+    -- jobs running a given script
+    SELECT DISTINCT p.job FROM parameters p JOIN script_uses u ON u.parameter_id = p.id WHERE u.hash = ?;
+    -- unsandboxed scripts by number of uses
+    SELECT hash, COUNT(*) FROM script_uses WHERE sandbox = 0 GROUP BY hash ORDER BY 2 DESC;
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+
+from jenkins_jobs_active_choice import importer
+from jenkins_jobs_active_choice import scriptler
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, job TEXT NOT NULL, mtime REAL, size INTEGER);
+CREATE TABLE IF NOT EXISTS parameters (
+    id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL REFERENCES files(id), job TEXT NOT NULL, position INTEGER,
+    name TEXT, kind TEXT, choice_type TEXT, script_class TEXT, scriptler_id TEXT);
+CREATE TABLE IF NOT EXISTS scripts (hash TEXT PRIMARY KEY, bytes INTEGER, body TEXT);
+CREATE TABLE IF NOT EXISTS script_uses (
+    parameter_id INTEGER NOT NULL REFERENCES parameters(id), role TEXT, hash TEXT REFERENCES scripts(hash),
+    sandbox INTEGER);
+CREATE TABLE IF NOT EXISTS classpath (
+    parameter_id INTEGER NOT NULL REFERENCES parameters(id), role TEXT, position INTEGER, entry TEXT);
+CREATE TABLE IF NOT EXISTS parameter_references (
+    parameter_id INTEGER NOT NULL REFERENCES parameters(id), referenced TEXT);
+CREATE TABLE IF NOT EXISTS scriptler_parameters (
+    parameter_id INTEGER NOT NULL REFERENCES parameters(id), position INTEGER, key TEXT, value TEXT);
+CREATE INDEX IF NOT EXISTS parameters_file ON parameters(file_id);
+CREATE INDEX IF NOT EXISTS parameters_job ON parameters(job);
+CREATE INDEX IF NOT EXISTS parameters_name ON parameters(name);
+CREATE INDEX IF NOT EXISTS parameters_scriptler_id ON parameters(scriptler_id);
+CREATE INDEX IF NOT EXISTS script_uses_parameter ON script_uses(parameter_id);
+CREATE INDEX IF NOT EXISTS script_uses_hash ON script_uses(hash);
+CREATE INDEX IF NOT EXISTS classpath_parameter ON classpath(parameter_id);
+CREATE INDEX IF NOT EXISTS classpath_entry ON classpath(entry);
+CREATE INDEX IF NOT EXISTS parameter_references_parameter ON parameter_references(parameter_id);
+CREATE INDEX IF NOT EXISTS parameter_references_referenced ON parameter_references(referenced);
+CREATE INDEX IF NOT EXISTS scriptler_parameters_parameter ON scriptler_parameters(parameter_id);
+'''
+
+_CHILD_TABLES = ('script_uses', 'classpath', 'parameter_references', 'scriptler_parameters')
+
+
+def _is_xml(path):
+    # skips the inventory database, notes and other files kept next to the jobs
+    with open(path, 'rb') as stream:
+        head = stream.read(256)
+    return head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<')
+
+
+def job_files(paths):
+    """Returns (path, job name) of every job xml: config.xml trees and flat `jenkins-jobs test -o` output.
+
+    A directory file is a job when its content starts like xml, it is named after the file without a
+    .xml extension: job names may contain dots, so the extension cannot tell job files apart.
+    """
+    found = importer.config_files(paths)
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend((os.path.join(path, x), x[:-4] if x.endswith('.xml') else x)
+                         for x in sorted(os.listdir(path))
+                         if os.path.isfile(os.path.join(path, x)) and _is_xml(os.path.join(path, x)))
+    return found
+
+
+def _record(element):
+    # plain data, cheap to send back from a worker process
+    script = element.find('script')
+    record = {
+        'name': element.findtext('name'),
+        'kind': importer.KINDS[element.tag],
+        'choice_type': element.findtext('choiceType'),
+        'script_class': script.get('class') if script is not None else None,
+        'scriptler_id': element.findtext('script/scriptlerScriptId'),
+        'scripts': [],
+        'references': [x.strip() for x in (element.findtext('referencedParameters') or '').split(',') if x.strip()],
+        'scriptler_parameters': [tuple(x.text or '' for x in entry.findall('string'))
+                                 for entry in element.findall('script/parameters/entry')],
+    }
+    for role in ('secureScript', 'secureFallbackScript'):
+        section = element.find('script/' + role)
+        if section is None or not section.findtext('script'):
+            continue
+        body = section.findtext('script')
+        entries = [(x.findtext('url') if len(x) else x.text) or '' for x in section.findall('classpath/entry')]
+        record['scripts'].append((role, scriptler.script_hash(body), body,
+                                  scriptler.is_sandboxed((section.findtext('sandbox') or '').strip()),
+                                  [x.strip() for x in entries]))
+    return record
+
+
+def scan_file(path, job_name):
+    """Returns (path, job name, [parameter record], error) for one job xml."""
+    try:
+        return path, job_name, [_record(x) for x in importer.iter_parameters(path)], None
+    except Exception as e:
+        return path, job_name, [], str(e)
+
+
+def _scan_file(args):
+    return scan_file(*args)
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def _forget(db, file_id):
+    ids = 'SELECT id FROM parameters WHERE file_id = ?'
+    for table in _CHILD_TABLES:
+        db.execute('DELETE FROM %s WHERE parameter_id IN (%s)' % (table, ids), (file_id,))
+    db.execute('DELETE FROM parameters WHERE file_id = ?', (file_id,))
+
+
+def _store(db, file_id, job_name, records):
+    for position, record in enumerate(records):
+        cursor = db.execute(
+            'INSERT INTO parameters (file_id, job, position, name, kind, choice_type, script_class, scriptler_id)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (file_id, job_name, position, record['name'], record['kind'], record['choice_type'],
+             record['script_class'], record['scriptler_id']))
+        parameter_id = cursor.lastrowid
+        for role, digest, body, sandbox, entries in record['scripts']:
+            db.execute('INSERT OR IGNORE INTO scripts (hash, bytes, body) VALUES (?, ?, ?)',
+                       (digest, len(body.encode('utf-8')), body))
+            db.execute('INSERT INTO script_uses (parameter_id, role, hash, sandbox) VALUES (?, ?, ?, ?)',
+                       (parameter_id, role, digest, int(sandbox)))
+            db.executemany('INSERT INTO classpath (parameter_id, role, position, entry) VALUES (?, ?, ?, ?)',
+                           [(parameter_id, role, i, x) for i, x in enumerate(entries)])
+        db.executemany('INSERT INTO parameter_references (parameter_id, referenced) VALUES (?, ?)',
+                       [(parameter_id, x) for x in record['references']])
+        db.executemany('INSERT INTO scriptler_parameters (parameter_id, position, key, value) VALUES (?, ?, ?, ?)',
+                       [(parameter_id, i) + tuple(x) for i, x in enumerate(record['scriptler_parameters'])
+                        if len(x) == 2])
+
+
+def _under(path, roots):
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+def scan(db, paths, processes=None):
+    """Brings the inventory up to date with the job xml under paths and returns scan statistics."""
+    found = dict((os.path.abspath(path), job_name) for path, job_name in job_files(paths))
+    known = dict((row[0], row[1:]) for row in db.execute('SELECT path, id, mtime, size FROM files'))
+    roots = [os.path.abspath(x) for x in paths]
+
+    tasks = []
+    versions = {}
+    for path, job_name in sorted(found.items()):
+        st = os.stat(path)
+        # taken before parsing: a file written meanwhile keeps an older version and is scanned again next time
+        versions[path] = (st.st_mtime, st.st_size)
+        if path in known and known[path][1:] == versions[path]:
+            continue
+        tasks.append((path, job_name))
+
+    removed = [path for path in known if path not in found and _under(path, roots)]
+    for path in removed:
+        _forget(db, known[path][0])
+        db.execute('DELETE FROM files WHERE id = ?', (known[path][0],))
+
+    if len(tasks) < 2 or processes == 1:
+        results = (_scan_file(task) for task in tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_scan_file, tasks, chunksize=16)
+    errors = []
+    try:
+        for path, job_name, records, error in results:
+            if error:
+                errors.append((path, error))
+                continue
+            mtime, size = versions[path]
+            if path in known:
+                file_id = known[path][0]
+                _forget(db, file_id)
+                db.execute('UPDATE files SET job = ?, mtime = ?, size = ? WHERE id = ?',
+                           (job_name, mtime, size, file_id))
+            else:
+                file_id = db.execute('INSERT INTO files (path, job, mtime, size) VALUES (?, ?, ?, ?)',
+                                     (path, job_name, mtime, size)).lastrowid
+            _store(db, file_id, job_name, records)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    db.execute('DELETE FROM scripts WHERE hash NOT IN (SELECT hash FROM script_uses)')
+    db.commit()
+    return {
+        'files': len(found),
+        'scanned': len(tasks) - len(errors),
+        'skipped': len(found) - len(tasks),
+        'removed': len(removed),
+        'errors': errors,
+    }
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='job xml files or directories')
+    args.add_argument('--db', required=True, help='sqlite database, created or updated')
+    args.add_argument('--processes', type=int, help='number of worker processes (default: cpu count)')
+    args = args.parse_args(argv)
+
+    db = connect(args.db)
+    try:
+        result = scan(db, args.paths, args.processes)
+        for path, error in result['errors']:
+            print('%s: %s' % (path, error), file=sys.stderr)
+        parameters, scripts = db.execute(
+            'SELECT (SELECT COUNT(*) FROM parameters), (SELECT COUNT(*) FROM scripts)').fetchone()
+    finally:
+        db.close()
+    print('%(files)d files: %(scanned)d scanned, %(skipped)d unchanged, %(removed)d removed' % result)
+    print('%d parameters, %d distinct scripts' % (parameters, scripts))
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# helpers for the command line tools that work on expanded jenkins-job-builder jobs
+import os
+
+from jenkins_jobs import parser
+from jenkins_jobs.formatter import deep_format
+
+from jenkins_jobs_active_choice import active_choice
+
+
+def yaml_files(paths):
+    """Expands directories to the yaml files they contain, in a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, x) for x in os.listdir(path)
+                                if x.endswith(('.yaml', '.yml'))))
+        else:
+            files.append(path)
+    return files
+
+
+def load(paths):
+    """Parses yaml files or directories together and returns the parser with expanded jobs."""
+    yaml_parser = parser.YamlParser()
+    for path in yaml_files(paths):
+        yaml_parser.parse(path)
+    yaml_parser.expandYaml()
+    return yaml_parser
+
+
+def iter_xml(yaml_parser):
+    """Yields (job name, xml root) for every expanded job, rendered by the registered modules."""
+    for job in yaml_parser.jobs:
+        yield job['name'], yaml_parser.getXMLForJob(job).xml
+
+
+def _expand(yaml_parser, component, template_data):
+    if isinstance(component, dict):
+        name, data = next(iter(component.items()))
+        if template_data:
+            data = deep_format(data, template_data)
+    else:
+        name, data = component, {}
+
+    # parameter macros are expanded the same way jenkins-job-builder dispatches them
+    macro = yaml_parser.data.get('parameter', {}).get(name)
+    if macro:
+        for item in macro.get('parameters', []):
+            for expanded in _expand(yaml_parser, item, data):
+                yield expanded
+    elif name in active_choice.SPECS:
+        yield name, data
+
+
+def iter_parameters(yaml_parser, job):
+    """Yields (kind, data) for every active choice parameter of an expanded job."""
+    for component in job.get('parameters') or []:
+        for expanded in _expand(yaml_parser, component, {}):
+            yield expanded
@@ -0,0 +1,95 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Validates active choice parameters without generating any xml.
+
+Every input path (a yaml file or a directory) is expanded on its own, in a pool of worker
+processes, together with the --include files (defaults, macros, templates shared by all of
+them). All problems are collected into one report:
+
+    python -m jenkins_jobs_active_choice.lint [--include common.yaml] jobs/a.yaml jobs/b.yaml
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import jobs
+
+
+def lint_path(path, include=()):
+    """Returns the problems of every active choice parameter defined in path."""
+    try:
+        yaml_parser = jobs.load(list(include) + [path])
+    except Exception as e:
+        return [{'file': path, 'job': None, 'parameter': None, 'message': str(e)}]
+
+    errors = []
+    for job in yaml_parser.jobs:
+        for kind, data in jobs.iter_parameters(yaml_parser, job):
+            name = data.get('name') if isinstance(data, dict) else None
+            for message in active_choice.validate(kind, data, yaml_parser.path):
+                errors.append({'file': path, 'job': job['name'], 'parameter': name, 'message': message})
+    return errors
+
+
+def _lint_path(args):
+    return lint_path(*args)
+
+
+def lint(paths, include=(), processes=None):
+    """Lints every path, in parallel when there is more than one, and returns all problems in input order."""
+    tasks = [(path, tuple(include)) for path in paths]
+    if len(tasks) < 2 or processes == 1:
+        results = [_lint_path(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_lint_path, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    return [error for errors in results for error in errors]
+
+
+def format_error(error):
+    location = error['file']
+    if error['job']:
+        location += ": job '%s'" % error['job']
+    if error['parameter']:
+        location += " parameter '%s'" % error['parameter']
+    return '%s: %s' % (location, error['message'])
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories, each linted on its own')
+    args.add_argument('--include', action='append', default=[], help='yaml shared by every path')
+    args.add_argument('--processes', type=int, help='number of worker processes (default: cpu count)')
+    args.add_argument('--json', action='store_true', help='print the report as json')
+    args = args.parse_args(argv)
+
+    errors = lint(args.paths, args.include, args.processes)
+    if args.json:
+        print(json.dumps(errors, indent=2, sort_keys=True))
+    else:
+        for error in errors:
+            print(format_error(error))
+        print('%d problem(s) found' % len(errors))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Renders expanded jobs in a pool of worker processes, with the same output as rendering them in turn.
+
+Jobs are expanded once in the parent, split into chunks and rendered by workers that each hold a
+parser built from the same yaml data. Results are merged in job order, so the XML of every job is
+byte-identical to the serial path whatever the number of processes:
+
+    python -m jenkins_jobs_active_choice.parallel --output out/ jobs/
+    python -m jenkins_jobs_active_choice.parallel --processes 8 jobs/ > all-jobs.xml
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+
+from jenkins_jobs import parser
+
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import stats
+
+# chunks per worker process: small enough to balance uneven jobs, large enough to amortize the transfer
+CHUNKS_PER_PROCESS = 4
+
+# the parser of a worker process, built once by _init_worker
+_worker_parser = None
+
+
+def _init_worker(data, path):
+    global _worker_parser
+    _worker_parser = parser.YamlParser()
+    _worker_parser.data = data
+    _worker_parser.path = path
+    if stats.recorder is not None:
+        # forget what was copied from the parent, it reports that itself
+        stats.recorder.drain()
+
+
+def _render_jobs(yaml_parser, chunk):
+    return [(job['name'], yaml_parser.getXMLForJob(job).output()) for job in chunk]
+
+
+def _render_chunk(chunk):
+    # workers exit without running atexit handlers, their stats go back to the parent with the chunk
+    rendered = _render_jobs(_worker_parser, chunk)
+    return rendered, stats.recorder.drain() if stats.recorder is not None else None
+
+
+def chunks(items, count):
+    """Splits items into at most count contiguous chunks of nearly equal size."""
+    size, extra = divmod(len(items), count)
+    result = []
+    start = 0
+    for i in range(count):
+        end = start + size + (i < extra)
+        if end > start:
+            result.append(items[start:end])
+        start = end
+    return result
+
+
+def render_serial(yaml_parser):
+    """Returns (job name, xml bytes) for every expanded job, rendered in this process."""
+    return _render_jobs(yaml_parser, yaml_parser.jobs)
+
+
+def render(yaml_parser, processes=None):
+    """Returns (job name, xml bytes) for every expanded job in job order, rendered by a process pool."""
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1 or len(yaml_parser.jobs) < 2:
+        return render_serial(yaml_parser)
+    pool = multiprocessing.Pool(processes, _init_worker, (yaml_parser.data, yaml_parser.path))
+    try:
+        result = []
+        # imap keeps the order of the chunks, which are contiguous slices of the job list
+        for rendered, drained in pool.imap(_render_chunk, chunks(yaml_parser.jobs, processes * CHUNKS_PER_PROCESS)):
+            result.extend(rendered)
+            if drained is not None and stats.recorder is not None:
+                stats.recorder.merge(*drained)
+        return result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def write(rendered, output):
+    """Writes every job to a file named after it in output, like `jenkins-jobs test -o`.
+
+    Jobs in folders (`folder/job`) are written below a directory for each folder.
+    """
+    for name, xml in rendered:
+        path = os.path.join(output, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(path, 'wb') as stream:
+            stream.write(xml)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args.add_argument('--output', help='directory receiving one xml file per job (default: print them)')
+    args.add_argument('--processes', type=int, help='number of worker processes (default: cpu count)')
+    args = args.parse_args(argv)
+
+    rendered = render(jobs.load(args.paths), args.processes)
+    if args.output:
+        write(rendered, args.output)
+    else:
+        stream = getattr(sys.stdout, 'buffer', sys.stdout)
+        for name, xml in rendered:
+            stream.write(xml)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Checks how active choice parameters of rendered jobs reference each other.
+
+When a parameter changes, the Jenkins UI re-runs the script of every parameter that references
+it, then of every parameter referencing those, and so on. This reports dangling references,
+reference cycles and the transitive fan-out of each parameter:
+
+    python -m jenkins_jobs_active_choice.references --max-fanout 5 --fail jobs/
+"""
+
+import argparse
+import sys
+
+from jenkins_jobs_active_choice import jobs
+
+PARAMETERS_PATH = 'properties/hudson.model.ParametersDefinitionProperty/parameterDefinitions'
+UNOCHOICE_PREFIX = 'org.biouno.unochoice.'
+
+DEFAULT_MAX_FANOUT = 10
+
+
+def _script_bytes(element):
+    return sum(len(x.text.encode('utf-8')) for x in element.iter('script') if x.text)
+
+
+class ReferenceGraph(object):
+    """Reference graph of the parameters of one rendered job."""
+
+    def __init__(self, xml_root):
+        # names of all parameters in job order, and of the ones each active choice parameter references
+        self.parameters = []
+        self.references = {}
+        # script bytes re-run when the parameter is re-evaluated
+        self.cost = {}
+        definitions = xml_root.find(PARAMETERS_PATH)
+        for element in definitions if definitions is not None else []:
+            name = element.findtext('name')
+            self.parameters.append(name)
+            if element.tag.startswith(UNOCHOICE_PREFIX):
+                referenced = element.findtext('referencedParameters') or ''
+                self.references[name] = [x.strip() for x in referenced.split(',') if x.strip()]
+                self.cost[name] = _script_bytes(element)
+
+        self.dependents = dict((name, []) for name in self.parameters)
+        for name, referenced in self.references.items():
+            for ref in referenced:
+                if ref in self.dependents:
+                    self.dependents[ref].append(name)
+
+    def dangling(self):
+        """Returns (parameter, reference) pairs naming parameters the job does not have."""
+        return [(name, ref) for name in self.parameters for ref in self.references.get(name, [])
+                if ref not in self.dependents]
+
+    def cycles(self):
+        """Returns the groups of parameters that reference each other in a cycle, in job order."""
+        # tarjan's strongly connected components
+        index = {}
+        lowlink = {}
+        stack = []
+        components = []
+
+        def visit(name):
+            index[name] = lowlink[name] = len(index)
+            stack.append(name)
+            for ref in self.references.get(name, []):
+                if ref not in self.dependents:
+                    continue
+                if ref not in index:
+                    visit(ref)
+                    lowlink[name] = min(lowlink[name], lowlink[ref])
+                elif ref in stack:
+                    lowlink[name] = min(lowlink[name], index[ref])
+            if lowlink[name] == index[name]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    component.append(member)
+                    if member == name:
+                        break
+                if len(component) > 1 or name in self.references.get(name, []):
+                    components.append(component)
+
+        for name in self.parameters:
+            if name not in index:
+                visit(name)
+        order = dict((name, i) for i, name in enumerate(self.parameters))
+        return sorted((sorted(x, key=order.get) for x in components), key=lambda x: order[x[0]])
+
+    def affected(self, name):
+        """Returns the parameters whose scripts re-run, directly or transitively, when name changes."""
+        affected = []
+        seen = set([name])
+        queue = [name]
+        while queue:
+            for dependent in self.dependents.get(queue.pop(0), []):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    affected.append(dependent)
+                    queue.append(dependent)
+        return affected
+
+    def fanout(self):
+        """Returns {parameter: (number of scripts re-run, script bytes re-run)} for every parameter."""
+        result = {}
+        for name in self.parameters:
+            affected = self.affected(name)
+            result[name] = (len(affected), sum(self.cost.get(x, 0) for x in affected))
+        return result
+
+
+def check(job_name, graph, max_fanout=DEFAULT_MAX_FANOUT, fail=False, strict=False):
+    """Returns problems as (level, job, parameter, message); level is 'error' or 'warning'."""
+    problems = []
+    for cycle in graph.cycles():
+        problems.append(('error', job_name, cycle[0],
+                         'is in a reference cycle with %s' % ', '.join(cycle[1:] or cycle)))
+    for name, ref in graph.dangling():
+        problems.append(('error' if strict else 'warning', job_name, name,
+                         "references unknown parameter '%s'" % ref))
+    for name, (count, cost) in sorted(graph.fanout().items()):
+        if count > max_fanout:
+            problems.append(('error' if fail else 'warning', job_name, name,
+                             're-runs %d scripts (%d bytes) on every change, limit is %d' % (count, cost, max_fanout)))
+    return problems
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args.add_argument('--max-fanout', type=int, default=DEFAULT_MAX_FANOUT,
+                      help='scripts a single change may re-run (default %d)' % DEFAULT_MAX_FANOUT)
+    args.add_argument('--fail', action='store_true', help='treat fan-out above the limit as an error')
+    args.add_argument('--strict', action='store_true', help='treat dangling references as errors')
+    args.add_argument('--verbose', action='store_true', help='print the fan-out of every reactive parameter')
+    args = args.parse_args(argv)
+
+    yaml_parser = jobs.load(args.paths)
+    errors = 0
+    for job_name, xml_root in jobs.iter_xml(yaml_parser):
+        graph = ReferenceGraph(xml_root)
+        if args.verbose:
+            for name, (count, cost) in sorted(graph.fanout().items()):
+                if count:
+                    print("%s: parameter '%s' re-runs %d scripts (%d bytes)" % (job_name, name, count, cost))
+        for level, job, name, message in check(job_name, graph, args.max_fanout, args.fail, args.strict):
+            print("%s: %s: parameter '%s' %s" % (level, job, name, message))
+            errors += level == 'error'
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Reports how many bytes the active choice parameters of every job add to its config.xml.
+
+Every job is rendered with a stats hook that measures each parameter as the entry points build
+it, split into the main script, the fallback script, classpath entries, the Scriptler section and
+the rest of the parameter. Jobs over a budget are flagged and the command exits with 1:
+
+    python -m jenkins_jobs_active_choice.report --budget script=65536 --budget total=262144 jobs/
+    python -m jenkins_jobs_active_choice.report --json report.json --prometheus /var/lib/node_exporter/jjb.prom jobs/
+
+Parameter sizes are those of the elements serialized without indentation; the job size is the
+size of the config.xml as jenkins-job-builder writes it.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import stats
+
+PARTS = ('script', 'fallback', 'classpath', 'scriptler', 'other')
+# budgets can be set on every part, on all active choice bytes of a job and on the whole job
+BUDGETS = PARTS + ('total', 'job')
+
+SCRIPTLER_CLASS = 'org.biouno.unochoice.model.ScriptlerScript'
+PROMETHEUS_PREFIX = 'jjb_active_choice_'
+
+
+def _size(element):
+    return len(Xml.tostring(element, encoding='utf-8'))
+
+
+def breakdown(element):
+    """Returns {part: bytes} of a rendered parameter element."""
+    parts = dict.fromkeys(PARTS, 0)
+    total = _size(element)
+    script = element.find('script')
+    if script is not None and script.get('class') == SCRIPTLER_CLASS:
+        parts['scriptler'] = _size(script)
+    elif script is not None:
+        for role, part in (('secureScript', 'script'), ('secureFallbackScript', 'fallback')):
+            secure_script = script.find(role)
+            if secure_script is None:
+                continue
+            classpath = secure_script.find('classpath')
+            classpath = _size(classpath) if classpath is not None else 0
+            parts['classpath'] += classpath
+            parts[part] += _size(secure_script) - classpath
+    parts['other'] = total - sum(parts.values())
+    return parts
+
+
+class JobReport(object):
+    """Bytes of the active choice parameters of one job, per parameter type and part."""
+
+    def __init__(self, name):
+        self.name = name
+        self.size = 0
+        # {kind: {'parameters': count, part: bytes}}
+        self.kinds = collections.OrderedDict()
+
+    def __call__(self, kind, element, elapsed):
+        entry = self.kinds.get(kind)
+        if entry is None:
+            entry = self.kinds[kind] = dict.fromkeys(('parameters',) + PARTS, 0)
+        entry['parameters'] += 1
+        for part, size in breakdown(element).items():
+            entry[part] += size
+
+    def totals(self):
+        """Returns {part: bytes} over all parameter types, with the 'total' and 'job' sizes."""
+        totals = dict((part, sum(entry[part] for entry in self.kinds.values())) for part in PARTS)
+        totals['total'] = sum(totals.values())
+        totals['job'] = self.size
+        return totals
+
+    def over_budget(self, budgets):
+        """Returns {part: bytes} of the parts over their budget."""
+        totals = self.totals()
+        return dict((part, totals[part]) for part, budget in budgets.items() if totals[part] > budget)
+
+    def as_dict(self, budgets):
+        return {
+            'name': self.name,
+            'bytes': self.size,
+            'totals': self.totals(),
+            'kinds': self.kinds,
+            'over_budget': self.over_budget(budgets),
+        }
+
+
+def collect(yaml_parser):
+    """Renders every expanded job and returns its JobReport, in job order."""
+    reports = []
+    for job in yaml_parser.jobs:
+        report = JobReport(job['name'])
+        stats.add_hook(report)
+        try:
+            report.size = len(yaml_parser.getXMLForJob(job).output())
+        finally:
+            stats.remove_hook(report)
+        reports.append(report)
+    return reports
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(reports, budgets):
+    """Returns the reports in the Prometheus text exposition format."""
+    lines = [
+        '# HELP %sbytes Bytes of active choice parameters in a generated job config.' % PROMETHEUS_PREFIX,
+        '# TYPE %sbytes gauge' % PROMETHEUS_PREFIX,
+    ]
+    for report in reports:
+        for kind, entry in report.kinds.items():
+            for part in PARTS:
+                lines.append('%sbytes{job="%s",kind="%s",part="%s"} %d' % (
+                    PROMETHEUS_PREFIX, _label(report.name), kind, part, entry[part]))
+    lines.extend([
+        '# HELP %sparameters Number of active choice parameters in a generated job config.' % PROMETHEUS_PREFIX,
+        '# TYPE %sparameters gauge' % PROMETHEUS_PREFIX,
+    ])
+    for report in reports:
+        for kind, entry in report.kinds.items():
+            lines.append('%sparameters{job="%s",kind="%s"} %d' % (
+                PROMETHEUS_PREFIX, _label(report.name), kind, entry['parameters']))
+    lines.extend([
+        '# HELP %sjob_bytes Bytes of a generated job config.' % PROMETHEUS_PREFIX,
+        '# TYPE %sjob_bytes gauge' % PROMETHEUS_PREFIX,
+    ])
+    for report in reports:
+        lines.append('%sjob_bytes{job="%s"} %d' % (PROMETHEUS_PREFIX, _label(report.name), report.size))
+    lines.extend([
+        '# HELP %sover_budget Whether a part of a generated job config is over its budget.' % PROMETHEUS_PREFIX,
+        '# TYPE %sover_budget gauge' % PROMETHEUS_PREFIX,
+    ])
+    for report in reports:
+        over = report.over_budget(budgets)
+        for part in sorted(budgets):
+            lines.append('%sover_budget{job="%s",part="%s"} %d' % (
+                PROMETHEUS_PREFIX, _label(report.name), part, part in over))
+    return '\n'.join(lines) + '\n'
+
+
+def write_atomically(path, text):
+    """Writes a file under a temporary name first, so a collector never reads it half written."""
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as stream:
+        stream.write(text)
+    # mkstemp creates the file readable by its owner only, collectors often run as another user
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(temp, 0o666 & ~umask)
+    os.rename(temp, path)
+
+
+def summary(report, budgets):
+    totals = report.totals()
+    over_budget = report.over_budget(budgets)
+    return '%s: %d of %d bytes (%.0f%%) in %d active choice parameter(s): %s%s' % (
+        report.name, totals['total'], report.size, 100.0 * totals['total'] / max(report.size, 1),
+        sum(entry['parameters'] for entry in report.kinds.values()),
+        ', '.join('%s %d' % (part, totals[part]) for part in PARTS),
+        ''.join('; %s over budget (%d > %d)' % (part, totals[part], budgets[part]) for part in sorted(over_budget)))
+
+
+def _budget(value):
+    try:
+        part, size = value.split('=', 1)
+        if part not in BUDGETS:
+            raise ValueError(part)
+        return part, int(size)
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected PART=BYTES with PART one of %s' % ', '.join(BUDGETS))
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('paths', nargs='+', help='yaml files or directories')
+    args.add_argument('--budget', type=_budget, action='append', default=[], metavar='PART=BYTES',
+                      help='flag jobs whose PART (%s) is over BYTES' % ', '.join(BUDGETS))
+    args.add_argument('--top', type=int, default=20, help='number of jobs to print, largest first (default 20)')
+    args.add_argument('--json', metavar='PATH', help='write the report as json, - for stdout')
+    args.add_argument('--prometheus', metavar='PATH', help='write the report as a Prometheus textfile')
+    args = args.parse_args(argv)
+    budgets = dict(args.budget)
+
+    reports = collect(jobs.load(args.paths))
+    if args.json:
+        text = json.dumps({'budgets': budgets, 'jobs': [r.as_dict(budgets) for r in reports]},
+                          indent=2, sort_keys=True)
+        if args.json == '-':
+            print(text)
+        else:
+            write_atomically(args.json, text + '\n')
+    if args.prometheus:
+        write_atomically(args.prometheus, prometheus(reports, budgets))
+
+    ranked = sorted(reports, key=lambda r: -r.totals()['total'])
+    over = [r for r in ranked if r.over_budget(budgets)]
+    if args.json != '-':
+        # the largest jobs, then every other job over budget
+        for report in ranked[:args.top] + [r for r in over if r not in ranked[:args.top]]:
+            print(summary(report, budgets))
+    if over:
+        print('%d job(s) over budget' % len(over), file=sys.stderr)
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
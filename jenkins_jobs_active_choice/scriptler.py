@@ -0,0 +1,169 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import groovy as groovy_library
+
+logger = logging.getLogger(__name__)
+
+# manifest written by `python -m jenkins_jobs_active_choice.dedup --externalize`
+MANIFEST_ENV = 'JJB_ACTIVE_CHOICE_SCRIPTLER_MANIFEST'
+MANIFEST_FORMAT = 1
+
+# scriptler.xml of a local copy of $JENKINS_HOME/scriptler, enables checking scriptler sections
+CATALOG_ENV = 'JJB_ACTIVE_CHOICE_SCRIPTLER_CATALOG'
+CATALOG_SCRIPT_TAG = 'org.jenkinsci.plugins.scriptler.config.Script'
+
+
+def script_hash(script):
+    return hashlib.sha1(script.encode('utf-8')).hexdigest()
+
+
+def load_manifest(path):
+    """Returns {script hash: scriptler script id} from a manifest file."""
+    with open(path) as stream:
+        manifest = json.load(stream)
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise Exception("unsupported scriptler manifest format in %s" % path)
+    return manifest['scripts']
+
+
+def is_sandboxed(value):
+    return bool(value) and str(value).lower() != 'false'
+
+
+def externalized(data):
+    """Returns the scriptler section replacing the groovy section of a parameter, or None.
+
+    Only scripts listed in the manifest are replaced, and only when the move cannot change how
+    they run: no fallback, no classpath, no sandbox, no result cache or timeout and no referenced parameters to bind.
+    """
+    if manifest is None:
+        return None
+    groovy = data.get('groovy')
+    if not isinstance(groovy, dict) or data.get('fallback') or data.get('reference'):
+        return None
+    if groovy.get('classpath') or is_sandboxed(groovy.get('sandbox')) or groovy.get('cache-ttl') or \
+            groovy.get('timeout'):
+        return None
+    script = groovy.get('script')
+    if not script:
+        return None
+    # the manifest is keyed by scripts as they are written to jobs
+    script_id = manifest.get(script_hash(groovy_library.script_text(groovy, script)))
+    if script_id is None:
+        return None
+    return {'script': script_id}
+
+
+class Catalog(object):
+    """Index of the Scriptler scripts, {script id: declared parameter names}, checked by every scriptler section.
+
+    A script id that is not in the catalog, or whose file is missing, is an error. Parameters passed but
+    not declared by the script, and declared but never passed, are counted per script and parameter and
+    reported once, when the run ends.
+    """
+
+    def __init__(self, scripts, missing=()):
+        self.scripts = scripts
+        self.missing = frozenset(missing)
+        # (script id, passed names) -> (unknown names, unused names), computed once per combination
+        self._problems = {}
+        self.unknown = {}
+        self.unused = {}
+        self._lock = threading.Lock()
+
+    def error(self, script_id):
+        if script_id in self.missing:
+            return "the file of scriptler script '%s' is missing" % script_id
+        if script_id not in self.scripts:
+            return "unknown scriptler script '%s'" % script_id
+        return None
+
+    def problems(self, script_id, parameters):
+        """Returns the names passed but not declared and the names declared but not passed."""
+        names = tuple(str(k) for d in parameters or () for k in d)
+        key = (script_id, names)
+        problems = self._problems.get(key)
+        if problems is None:
+            declared = self.scripts.get(script_id, frozenset())
+            problems = self._problems[key] = (sorted(set(names) - declared), sorted(declared.difference(names)))
+        return problems
+
+    def errors(self, param_name, data):
+        """Returns the problems of a scriptler section, without recording them."""
+        script_id = str(data['script'])
+        error = self.error(script_id)
+        if error:
+            return ['%s in %s' % (error, param_name)]
+        unknown, _ = self.problems(script_id, data.get('parameters'))
+        return ["scriptler script '%s' has no parameter '%s' in %s" % (script_id, x, param_name) for x in unknown]
+
+    def check(self, param_name, data):
+        """Raises on an unknown script and records the parameter problems of a rendered scriptler section."""
+        script_id = str(data['script'])
+        error = self.error(script_id)
+        if error:
+            raise Exception('%s in %s' % (error, param_name))
+        unknown, unused = self.problems(script_id, data.get('parameters'))
+        if unknown or unused:
+            with self._lock:
+                for found, names in ((self.unknown, unknown), (self.unused, unused)):
+                    for name in names:
+                        found.setdefault((script_id, name), []).append(param_name)
+
+    def summary(self):
+        lines = []
+        for found, text in ((self.unknown, 'passed to scriptler script %s but not declared'),
+                            (self.unused, 'declared by scriptler script %s but never passed')):
+            for (script_id, name), params in sorted(found.items()):
+                where = params[0] if len(params) == 1 else '%s and %d more' % (params[0], len(params) - 1)
+                lines.append('parameter %s %s, in %s' % (name, text % script_id, where))
+        return lines
+
+
+def load_catalog(path):
+    """Reads scriptler.xml and the script files next to it, in scripts/ as on the controller or in the
+    same directory as written by the dedup tool, into a Catalog."""
+    directory = os.path.dirname(os.path.abspath(path))
+    scripts, missing = {}, []
+    for entry in Xml.parse(path).getroot().iter(CATALOG_SCRIPT_TAG):
+        script_id = entry.findtext('id')
+        if not script_id:
+            raise Exception("scriptler script without an id in %s" % path)
+        scripts[script_id] = frozenset(x.findtext('name') for x in entry.findall('parameters/*'))
+        if not any(os.path.isfile(os.path.join(d, script_id)) for d in (os.path.join(directory, 'scripts'), directory)):
+            missing.append(script_id)
+    return Catalog(scripts, missing)
+
+
+def _report_at_exit(catalog):
+    for line in catalog.summary():
+        logger.warning(line)
+
+
+manifest = None
+if os.environ.get(MANIFEST_ENV):
+    manifest = load_manifest(os.environ[MANIFEST_ENV])
+
+catalog = None
+if os.environ.get(CATALOG_ENV):
+    catalog = load_catalog(os.environ[CATALOG_ENV])
+    atexit.register(_report_at_exit, catalog)
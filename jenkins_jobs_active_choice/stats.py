@@ -0,0 +1,174 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# path of the json file written at process exit, enables the built-in recorder
+STATS_ENV = 'JJB_ACTIVE_CHOICE_STATS'
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# callables invoked as hook(kind, element, elapsed) after every rendered parameter; the tuple is
+# replaced rather than modified, so threads that render while hooks change see a consistent set
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    global _hooks
+    with _hooks_lock:
+        hooks = list(_hooks)
+        hooks.remove(hook)
+        _hooks = tuple(hooks)
+
+
+# callables returning {counter: value}, e.g. the hits of a cache, written to the stats file under their name
+_counters = {}
+
+
+def add_counters(name, source):
+    _counters[name] = source
+
+
+def counters():
+    """Returns the current values of every counter source that is enabled."""
+    values = {}
+    for name, source in list(_counters.items()):
+        value = source()
+        if value is not None:
+            values[name] = value
+    return values
+
+
+def has_hooks():
+    return bool(_hooks)
+
+
+def instrumented(kind):
+    """Decorates an entry point so that installed hooks see every parameter it renders.
+
+    Without hooks the only cost is one tuple check per call.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(parser, xml_parent, data):
+            hooks = _hooks
+            if not hooks:
+                return func(parser, xml_parent, data)
+            start = _clock()
+            func(parser, xml_parent, data)
+            elapsed = _clock() - start
+            element = xml_parent[-1]
+            for hook in hooks:
+                hook(kind, element, elapsed)
+        return wrapper
+    return decorator
+
+
+def script_bytes(element):
+    """Returns the number of utf-8 bytes of groovy scripts under the rendered parameter."""
+    total = 0
+    for script in element.iter('script'):
+        if script.text:
+            total += len(script.text.encode('utf-8'))
+    return total
+
+
+class Recorder(object):
+    """Aggregates call count, cumulative time and emitted script bytes per entry point."""
+
+    def __init__(self):
+        self.entries = {}
+        # counters of other processes, and the counters of this one when it last drained
+        self._merged = {}
+        self._drained = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, kind, element, elapsed):
+        size = script_bytes(element)
+        with self._lock:
+            entry = self.entries.get(kind)
+            if entry is None:
+                entry = self.entries[kind] = {'calls': 0, 'seconds': 0.0, 'script_bytes': 0}
+            entry['calls'] += 1
+            entry['seconds'] += elapsed
+            entry['script_bytes'] += size
+
+    def drain(self):
+        """Returns the entries and the counter increments recorded since the last drain, and resets them.
+
+        Worker processes never dump, they send what they drained to the parent which merges it.
+        """
+        current = counters()
+        with self._lock:
+            entries, self.entries = self.entries, {}
+            drained, self._drained = self._drained, current
+        increments = {}
+        for name, values in current.items():
+            before = drained.get(name, {})
+            increments[name] = dict((k, v - before.get(k, 0)) for k, v in values.items())
+        return entries, increments
+
+    def merge(self, entries, increments):
+        """Adds what another process drained."""
+        with self._lock:
+            for kind, other in entries.items():
+                entry = self.entries.setdefault(kind, {'calls': 0, 'seconds': 0.0, 'script_bytes': 0})
+                for k, v in other.items():
+                    entry[k] += v
+            for name, values in increments.items():
+                merged = self._merged.setdefault(name, {})
+                for k, v in values.items():
+                    merged[k] = merged.get(k, 0) + v
+
+    def dump(self, path):
+        values = counters()
+        with self._lock:
+            for name, merged in self._merged.items():
+                own = values.setdefault(name, {})
+                for k, v in merged.items():
+                    own[k] = own.get(k, 0) + v
+            entries = dict(self.entries, counters=values)
+            entries = json.dumps(entries, indent=2, sort_keys=True)
+        with open(path, 'w') as stream:
+            stream.write(entries)
+        logger.debug('active choice stats written to %s', path)
+
+
+def _dump_at_exit(recorder, path):
+    try:
+        recorder.dump(path)
+    except (IOError, OSError) as e:
+        logger.warning('cannot write active choice stats to %s: %s', path, e)
+
+
+recorder = None
+if os.environ.get(STATS_ENV):
+    recorder = Recorder()
+    add_hook(recorder)
+    atexit.register(_dump_at_exit, recorder, os.environ[STATS_ENV])
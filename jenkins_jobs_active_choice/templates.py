@@ -0,0 +1,270 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Groovy code generated for active choice parameters.
+
+Wrappers keep the user script as written, inside a closure of the generated code, so that its
+return value can be used by the wrapper. Its import statements, with their annotations, are moved
+before the wrapper; the script therefore cannot declare methods or classes of its own, which
+validation rejects. Generated names start with _jjb.
+"""
+
+import collections
+import hashlib
+import re
+
+from jenkins_jobs_active_choice import groovy
+
+DEFAULT_CACHE_SIZE = 100
+
+# controller system property holding the result caches, one per job and parameter; at most
+# CACHE_STORES of them are kept, the least recently used are dropped
+CACHE_STORES_PROPERTY = 'jjb.active-choice.cache'
+CACHE_STORES = 1000
+
+# the full name of the job the script runs for, bound by the plugin; the store name of the parameter
+# stands in for it when the binding is missing
+_JOB = "(binding.variables.get('jenkinsProject')?.fullName ?: %s)"
+
+# an access-ordered map kept in a system property, holding at most %(limit)d values created by
+# %(create)s; the value for %(key)s ends up in %(variable)s
+_REGISTRY = '''def %(variable)s
+def %(variable)sRegistry = System.getProperties().computeIfAbsent(%(property)s, { new LinkedHashMap(16, 0.75f, true) })
+synchronized (%(variable)sRegistry) {
+    %(variable)s = %(variable)sRegistry.computeIfAbsent(%(key)s, %(create)s)
+    while (%(variable)sRegistry.size() > %(limit)d) {
+        def %(variable)sEldest = %(variable)sRegistry.keySet().iterator().next()
+        %(evict)s%(variable)sRegistry.remove(%(variable)sEldest)
+    }
+}'''
+
+_MEMOIZE = '''%(header)s// generated by jenkins-job-builder: results are cached per job and value of the referenced
+// parameters for %(ttl)d seconds, at most %(size)d of them
+%(registry)s
+def _jjbKey = %(version)s + [%(values)s].toString()
+def _jjbNow = System.currentTimeMillis()
+synchronized (_jjbCache) {
+    def _jjbCached = _jjbCache.get(_jjbKey)
+    if (_jjbCached != null && _jjbNow - _jjbCached[0] < %(ttl)d000L) {
+        return _jjbCached[1]
+    }
+}
+def _jjbResult = {
+%(body)s
+}.call()
+synchronized (_jjbCache) {
+    _jjbCache.put(_jjbKey, [_jjbNow, _jjbResult])
+    def _jjbEntries = _jjbCache.values().iterator()
+    while (_jjbEntries.hasNext()) {
+        def _jjbEntry = _jjbEntries.next()
+        if (_jjbCache.size() > %(size)d || _jjbNow - _jjbEntry[0] >= %(ttl)d000L) {
+            _jjbEntries.remove()
+        }
+    }
+}
+return _jjbResult
+'''
+
+
+def groovy_string(value):
+    """Returns value as a single-quoted groovy string literal."""
+    return "'%s'" % value.replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n')
+
+
+def reference_names(reference):
+    """Returns the parameter names of a comma-separated reference."""
+    return [x.strip() for x in (reference or '').split(',') if x.strip()]
+
+
+def _registry(variable, property_name, key, create, limit, evict=''):
+    return _REGISTRY % {'variable': variable, 'property': groovy_string(property_name), 'key': key,
+                        'create': create, 'limit': limit, 'evict': evict}
+
+
+def _job(store):
+    return _JOB % groovy_string(store)
+
+
+def memoize(script, name, store, reference, ttl, size=DEFAULT_CACHE_SIZE):
+    """Returns the script wrapped in a result cache keyed by the values of the referenced parameters.
+
+    Entries expire after ttl seconds and the least recently used ones are evicted beyond size.
+    Every job and parameter has its own cache, kept in the system properties of the controller
+    under CACHE_STORES_PROPERTY; store, the randomName of the parameter, names the job when the
+    plugin does not bind it. Keys start with a hash of the script, so a changed script never gets
+    stale results.
+    """
+    header, body = groovy.split_imports(script)
+    return _MEMOIZE % {
+        'header': header,
+        'ttl': ttl,
+        'size': size,
+        'registry': _registry('_jjbCache', CACHE_STORES_PROPERTY, "%s + '/' + %s" % (_job(store), groovy_string(name)),
+                              '{ new LinkedHashMap(16, 0.75f, true) }', CACHE_STORES),
+        'version': groovy_string(hashlib.sha1(script.encode('utf-8')).hexdigest()[:12]),
+        'values': ', '.join('binding.variables.get(%s)' % groovy_string(x) for x in reference_names(reference)),
+        'body': body.rstrip('\n'),
+    }
+
+
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_$][A-Za-z0-9_$]*$')
+
+
+def is_identifier(name):
+    return bool(_IDENTIFIER_RE.match(name))
+
+
+def _list(choices):
+    return '[%s]' % ','.join(groovy_string(x) for x in choices)
+
+
+# the code of a groovy method is limited to 64KB: choices of more than LOOKUP_CHUNK strings are added
+# by closures of at most that many strings each, every closure being a method of its own
+LOOKUP_CHUNK = 1000
+
+
+def _chunked(variable, method, literals):
+    # literals is a list of (groovy literal, number of strings in it)
+    lines, chunk, strings = [], [], 0
+    for literal, count in literals:
+        if chunk and strings + count > LOOKUP_CHUNK:
+            lines.append('{%s.%s([%s])}.call()' % (variable, method, ',\n'.join(chunk)))
+            chunk, strings = [], 0
+        chunk.append(literal)
+        strings += count
+    if chunk:
+        lines.append('{%s.%s([%s])}.call()' % (variable, method, ',\n'.join(chunk)))
+    return lines
+
+
+def lookup(choices, source, key=None):
+    """Returns a script returning constant choices, or the choices of the value of the key parameter.
+
+    choices is a list of strings, or with a key an {value: list of strings} mapping. Lists shared by
+    several values are emitted once, so that large mappings stay small.
+    """
+    header = '// generated by jenkins-job-builder from %s' % source.replace('\n', ' ')
+    if key is None:
+        if len(choices) <= LOOKUP_CHUNK:
+            return '%s\nreturn %s\n' % (header, _list(choices))
+        lines = [header, 'def _jjbChoices=[]']
+        lines.extend(_chunked('_jjbChoices', 'addAll', [(groovy_string(x), 1) for x in choices]))
+        lines.append('return _jjbChoices')
+        return '\n'.join(lines) + '\n'
+
+    lines = ['%s, by the value of %s' % (header, key)]
+    chunked = sum(len(x) + 1 for x in choices.values()) > LOOKUP_CHUNK
+    shared = collections.OrderedDict()
+    uses = collections.Counter(tuple(x) for x in choices.values())
+    entries = []
+    for value, values in choices.items():
+        literal = _list(values)
+        count = len(values) + 1
+        # a variable costs its definition, only lists longer than its name are worth sharing
+        if uses[tuple(values)] > 1 and len(literal) > 8:
+            if literal not in shared:
+                shared[literal] = ('_jjbShared[%d]' if chunked else '_jjb%d') % len(shared), len(values)
+                if not chunked:
+                    lines.append('def %s=%s' % (shared[literal][0], literal))
+            literal = shared[literal][0]
+            count = 2
+        entries.append(('%s:%s' % (groovy_string(value), literal), count))
+    if chunked:
+        if shared:
+            lines.append('def _jjbShared=[]')
+            lines.extend(_chunked('_jjbShared', 'addAll', [(x, count) for x, (_, count) in shared.items()]))
+        lines.append('def _jjbChoices=[:]')
+        lines.extend(_chunked('_jjbChoices', 'putAll', entries))
+    else:
+        lines.append('def _jjbChoices=[%s]' % (',\n'.join(x for x, _ in entries) or ':'))
+    lines.append('return _jjbChoices.get(%s)?:[]' % key)
+    return '\n'.join(lines) + '\n'
+
+
+# one bounded executor per job, shared by its scripts with a timeout: busy threads make further scripts
+# fall back instead of piling up behind them. At most TIMEOUT_EXECUTORS are kept, idle threads exit
+TIMEOUT_EXECUTORS_PROPERTY = 'jjb.active-choice.executors'
+TIMEOUT_EXECUTORS = 100
+TIMEOUT_THREADS = 4
+TIMEOUT_QUEUE = 16
+
+_TIMEOUT = '''%(header)s// generated by jenkins-job-builder: the script is given %(seconds)s seconds, then %(instead)s
+def _jjbStart = System.nanoTime()
+def _jjbLog = java.util.logging.Logger.getLogger('jenkins-job-builder.active-choice')
+def _jjbContext = org.springframework.security.core.context.SecurityContextHolder.getContext()
+%(registry)s
+def _jjbFuture = null
+try {
+    _jjbFuture = _jjbExecutor.submit({
+        // the script sees the permissions of the user rendering the form
+        org.springframework.security.core.context.SecurityContextHolder.setContext(_jjbContext)
+        try {
+%(body)s
+        } finally {
+            org.springframework.security.core.context.SecurityContextHolder.clearContext()
+        }
+    } as java.util.concurrent.Callable)
+    return _jjbFuture.get(%(millis)dL, java.util.concurrent.TimeUnit.MILLISECONDS)
+} catch (java.util.concurrent.ExecutionException _jjbError) {
+    throw _jjbError.cause
+} catch (java.util.concurrent.TimeoutException | java.util.concurrent.RejectedExecutionException _jjbError) {
+    _jjbFuture?.cancel(true)
+    _jjbLog.warning(%(name)s + %(timed_out)s)
+    return {
+%(fallback)s
+    }.call()
+} finally {
+    _jjbLog.fine(%(name)s + ': script took ' + (System.nanoTime() - _jjbStart).intdiv(1000000) + ' ms')
+}
+'''
+
+
+_NEW_EXECUTOR = '''{
+        def _jjbPool = new java.util.concurrent.ThreadPoolExecutor(%(threads)d, %(threads)d, 60L,
+            java.util.concurrent.TimeUnit.SECONDS, new java.util.concurrent.ArrayBlockingQueue(%(queue)d))
+        _jjbPool.allowCoreThreadTimeOut(true)
+        return _jjbPool
+    }'''
+
+
+def timeout(script, name, store, seconds, fallback=None):
+    """Returns the script wrapped to run on the bounded executor of its job for at most seconds.
+
+    When the deadline passes, or every thread of the executor is busy, the script is cancelled and
+    the fallback script runs in its place, or an empty list is returned without one. Errors of the
+    script are thrown again, so the fallback of the parameter still handles them.
+    """
+    header, body = groovy.split_imports(script)
+    if fallback:
+        fallback_header, fallback = groovy.split_imports(fallback)
+        lines = header.splitlines()
+        header += ''.join(x + '\n' for x in fallback_header.splitlines() if x not in lines and not x.startswith('#!'))
+        instead = 'the fallback script runs'
+    else:
+        fallback = 'return []'
+        instead = 'no choices are returned'
+    return _TIMEOUT % {
+        'header': header,
+        'seconds': seconds,
+        'instead': instead,
+        'timed_out': groovy_string(': no result within %s seconds, %s' % (seconds, instead)),
+        'registry': _registry('_jjbExecutor', TIMEOUT_EXECUTORS_PROPERTY, _job(store),
+                              _NEW_EXECUTOR % {'threads': TIMEOUT_THREADS, 'queue': TIMEOUT_QUEUE},
+                              TIMEOUT_EXECUTORS,
+                              '_jjbExecutorRegistry.get(_jjbExecutorEldest).shutdown()\n        '),
+        'body': body.rstrip('\n'),
+        'millis': int(seconds * 1000),
+        'name': groovy_string(name),
+        'fallback': fallback.rstrip('\n'),
+    }
@@ -0,0 +1,3 @@
+// shared by every job that selects hosts
+def hosts = ['foo', 'bar']
+return hosts.collect { "${it}-${STR_PARAM}" }
@@ -13,11 +13,16 @@
 
 import glob
 import os
+import xml.etree.ElementTree as Xml
 
 from jenkins_jobs import parser
 
 import pytest
 
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import cache
+from jenkins_jobs_active_choice import stats
+
 
 class Scenario(object):
     def __init__(self, name, test_input, expected):
@@ -45,7 +50,7 @@ def generate_xml(fn):
 
 def load_xml(fn):
     with open(fn, "rb") as stream:
-        return stream.read().encode("utf-8")
+        return stream.read()
 
 
 scenarios = get_scenarios()
@@ -56,3 +61,55 @@ def test_scenario(scenario):
     actual = generate_xml(scenario.test_input)
     expected = load_xml(scenario.expected)
     assert actual == expected, "check result xml"
+
+
+@pytest.mark.parametrize('size', [0, 8])
+@pytest.mark.parametrize("scenario", scenarios, ids=[x.name for x in scenarios])
+def test_scenario_leaves_and_subtree_cache(scenario, size, monkeypatch):
+    # leaves are built with SubElement directly and cache keys only when the cache is on: both
+    # ways, cold and warm, the output must stay byte-identical to the fixture
+    monkeypatch.setattr(cache, 'subtree_cache', cache.SubtreeCache(size))
+    expected = load_xml(scenario.expected)
+    assert generate_xml(scenario.test_input) == expected
+    assert generate_xml(scenario.test_input) == expected
+    if not size:
+        assert cache.subtree_cache.hits == cache.subtree_cache.misses == 0
+
+
+BATCH = [
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': "return ['a']"}, 'choice-type': 'radio'}),
+    ('active-choice-reactive', {'name': 'B', 'project': 'p', 'groovy': {'script': "return ['b']", 'sandbox': True},
+                                'fallback': {'script': 'return []'}, 'reference': 'A'}),
+    ('active-choice-reactive-reference', {'name': 'C', 'project': 'p', 'reference': 'A,B',
+                                          'scriptler': {'script': 'c.groovy', 'parameters': [{'P': 'v'}]}}),
+    ('cascade-choice', {'name': 'D', 'project': 'p', 'script': "return ['d']", 'reference': 'C'}),
+]
+
+
+@pytest.mark.parametrize('hooks', [False, True])
+def test_render_parameters(hooks):
+    expected = Xml.Element('parameterDefinitions')
+    for kind, data in BATCH:
+        active_choice.ENTRY_POINTS[kind](None, expected, data)
+
+    seen = []
+
+    def hook(kind, element, elapsed):
+        seen.append(kind)
+
+    if hooks:
+        stats.add_hook(hook)
+    try:
+        actual = Xml.Element('parameterDefinitions')
+        active_choice.render_parameters(actual, iter(BATCH))
+    finally:
+        if hooks:
+            stats.remove_hook(hook)
+    assert Xml.tostring(actual) == Xml.tostring(expected)
+    assert seen == ([kind for kind, data in BATCH] if hooks else [])
+
+
+def test_render_parameters_unknown_kind():
+    with pytest.raises(Exception) as e:
+        active_choice.render_parameters(Xml.Element('parameterDefinitions'), [('choice', {})])
+    assert str(e.value).startswith("unknown active choice parameter type 'choice'")
@@ -0,0 +1,149 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import analyzer
+
+
+SCRIPT = '''// getAllItems() in a comment is fine
+def jobs = Jenkins.instance.getAllItems(Job)
+def text = new URL("http://host/x.toURL()").text
+def out = 'ls /'.execute().text
+return new File('/etc/hosts').readLines()
+'''
+
+
+@pytest.fixture
+def levels(monkeypatch):
+    def configure(value):
+        monkeypatch.setattr(analyzer, 'levels', analyzer.parse_levels(value))
+        monkeypatch.setattr(analyzer, 'enabled', True)
+    return configure
+
+
+def test_analyze_skips_strings_and_comments():
+    assert analyzer.analyze(SCRIPT) == (
+        analyzer.Finding('all-items', 2, 'getAllItems'),
+        analyzer.Finding('network', 3, 'URL'),
+        analyzer.Finding('process', 4, 'execute'),
+        analyzer.Finding('file', 5, 'File'),
+        analyzer.Finding('file', 5, 'readLines'),
+    )
+    assert analyzer.analyze('return "${x}.execute()" // new URL(x)') == ()
+    assert analyzer.analyze('return "unterminated') == ()
+
+
+def test_analyze_qualified_types():
+    script = 'new java.net.URL(u).text\nnew java.io.File(f)\nnew java.lang.ProcessBuilder("ls")\nnew a.b.Other()'
+    assert analyzer.analyze(script) == (
+        analyzer.Finding('network', 1, 'java.net.URL'),
+        analyzer.Finding('file', 2, 'java.io.File'),
+        analyzer.Finding('process', 3, 'java.lang.ProcessBuilder'),
+    )
+
+
+def test_cost():
+    assert analyzer.cost(analyzer.analyze("return ['a']")) == 'low'
+    assert analyzer.cost(analyzer.analyze("new File('x').text")) == 'medium'
+    assert analyzer.cost(analyzer.analyze(SCRIPT)) == 'high'
+
+
+def test_levels_are_stricter_for_reactive_parameters(levels):
+    levels('network=warn,file=ignore')
+    assert analyzer.level('network', False) == 'warn'
+    assert analyzer.level('network', True) == 'fail'
+    assert analyzer.level('file', True) == 'ignore'
+    assert analyzer.level('process', False) == 'info'
+    assert analyzer.level('process', True) == 'warn'
+
+
+def test_parse_levels():
+    assert set(analyzer.parse_levels('all=fail, file=ignore').items()) == {
+        ('all-items', 'fail'), ('network', 'fail'), ('process', 'fail'), ('file', 'ignore')}
+    for value in ('network', 'network=error', 'nope=warn'):
+        with pytest.raises(Exception) as e:
+            analyzer.parse_levels(value)
+        assert "invalid analyzer setting" in str(e.value)
+
+
+def test_check(levels):
+    levels('all=warn')
+    data = {'name': 'P', 'script': "'ls'.execute()", 'fallback-script': 'return []', 'reference': 'A'}
+    assert analyzer.check(data) == [(
+        'fail', "script of parameter P starts a process with execute at line 1 (rule process, high cost, "
+                "runs on every change of A)")]
+    data = {'name': 'P', 'groovy': {'script': 'return []'}, 'fallback': {'script': "new File('x')"}}
+    assert analyzer.check(data) == [
+        ('warn', "fallback script of parameter P reads a file with File at line 1 (rule file, medium cost)")]
+
+
+def test_render_time(levels, caplog):
+    levels('')
+    data = {'name': 'P', 'project': 'p', 'groovy': {'script': 'Jenkins.instance.allItems'}}
+    with caplog.at_level(logging.INFO, logger=analyzer.__name__):
+        active_choice.active_choice(None, Xml.Element('parent'), data)
+    assert 'walks every item of the controller' in caplog.text
+    assert active_choice.validate('active-choice', data) == []
+
+    levels('all-items=warn')
+    reactive = dict(data, reference='A')
+    with pytest.raises(Exception) as e:
+        active_choice.active_choice_reactive(None, Xml.Element('parent'), reactive)
+    assert 'rule all-items' in str(e.value)
+    assert active_choice.validate('active-choice-reactive', reactive) == [str(e.value)]
+
+
+def test_disabled_by_default(monkeypatch):
+    env = dict((k, v) for k, v in os.environ.items() if k != analyzer.LEVELS_ENV)
+    code = 'from jenkins_jobs_active_choice import analyzer; print(analyzer.enabled)'
+    assert subprocess.check_output([sys.executable, '-c', code], env=env).strip() == b'False'
+
+    # disabled, rendering never tokenizes
+    monkeypatch.setattr(analyzer, 'enabled', False)
+    monkeypatch.setattr(analyzer, 'analyze', None)
+    data = {'name': 'P', 'project': 'p', 'groovy': {'script': 'Jenkins.instance.allItems'}}
+    active_choice.active_choice(None, Xml.Element('parent'), data)
+
+
+def test_memo_is_least_recently_used(monkeypatch):
+    monkeypatch.setattr(analyzer, 'MEMO_SIZE', 2)
+    monkeypatch.setattr(analyzer, '_memo', analyzer.collections.OrderedDict())
+    for script in ('a', 'b', 'a', 'c'):
+        analyzer.analyze(script)
+    assert list(analyzer._memo) == [analyzer.hashlib.sha1(x).hexdigest() for x in (b'a', b'c')]
+
+
+def test_main(tmpdir, capsys, levels):
+    levels('process=fail')
+    path = tmpdir.join('jobs.yaml')
+    path.write('''
+- job:
+    name: j
+    parameters:
+      - cascade-choice:
+          name: C
+          project: p
+          script: "'hostname'.execute().text"
+''')
+    assert analyzer.main([str(path)]) == 1
+    assert capsys.readouterr()[0] == (
+        "j: [fail] script of parameter C starts a process with execute at line 1 (rule process, high cost)\n")
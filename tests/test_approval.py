@@ -0,0 +1,126 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import hashlib
+
+from jenkins_jobs_active_choice import approval
+from jenkins_jobs_active_choice import jobs
+
+
+UNSANDBOXED = "return ['a']"
+
+JOBS = '''
+- job-template:
+    name: 'job-{n}'
+    parameters:
+      - active-choice-reactive:
+          name: TRUSTED
+          project: p
+          reference: X
+          groovy:
+            script: "%s"
+          fallback:
+            script: "return []"
+            sandbox: true
+      - active-choice:
+          name: SANDBOXED
+          project: p
+          groovy:
+            script: "return ['b']"
+            sandbox: true
+      - cascade-choice:
+          name: CASCADE
+          project: p
+          script: "%s"
+
+- project:
+    name: fleet
+    n: [1, 2]
+    jobs:
+      - 'job-{n}'
+''' % (UNSANDBOXED, UNSANDBOXED)
+
+CURRENT = b"""<?xml version='1.1' encoding='UTF-8'?>
+<scriptApproval plugin="script-security@1.78">
+  <approvedScriptHashes>
+    <string>%s</string>
+  </approvedScriptHashes>
+  <approvedSignatures/>
+</scriptApproval>
+"""
+
+
+def rendered(tmpdir):
+    path = tmpdir.join('jobs.yaml')
+    path.write(JOBS)
+    return list(jobs.iter_xml(jobs.load([str(path)])))
+
+
+def test_approval_hash():
+    script = u"return ['\u00e9']"
+    hashed = u"groovy:return ['\u00e9']".encode('utf-8')
+    assert approval.approval_hash(script) == 'SHA512:' + hashlib.sha512(hashed).hexdigest()
+    assert approval.approval_hash(script, 'sha1') == hashlib.sha1(hashed).hexdigest()
+
+
+def test_collect_skips_sandboxed_scripts(tmpdir):
+    approvals = approval.collect(rendered(tmpdir))
+    # cascade-choice always renders a fallback, its empty script still needs an approval
+    assert list(approvals) == [approval.approval_hash(UNSANDBOXED), approval.approval_hash('')]
+    assert len(approvals[approval.approval_hash('')].locations) == 2
+    assert approvals[approval.approval_hash(UNSANDBOXED)].locations == [
+        ('job-1', 'TRUSTED', 'secureScript'),
+        ('job-1', 'CASCADE', 'secureScript'),
+        ('job-2', 'TRUSTED', 'secureScript'),
+        ('job-2', 'CASCADE', 'secureScript'),
+    ]
+
+
+def test_collect_hashes_each_script_once(tmpdir, monkeypatch):
+    calls = []
+    hashers = dict((name, lambda script, hasher=hasher: calls.append(script) or hasher(script))
+                   for name, hasher in approval.HASHERS.items())
+    monkeypatch.setattr(approval, 'HASHERS', hashers)
+    approval.collect(rendered(tmpdir))
+    assert sorted(calls) == sorted([UNSANDBOXED, ''] * len(hashers))
+
+
+def test_pending_accepts_legacy_hashes(tmpdir):
+    approvals = approval.collect(rendered(tmpdir))
+    assert list(approval.pending(approvals, set())) == list(approvals)
+    approved = {approval.approval_hash(UNSANDBOXED, 'sha1'), approval.approval_hash('')}
+    assert not approval.pending(approvals, approved)
+
+
+def test_main_diff_and_merge(tmpdir, capsys):
+    path = tmpdir.join('jobs.yaml')
+    path.write(JOBS)
+    current = tmpdir.join('scriptApproval.xml')
+    current.write_binary(CURRENT % b'SHA512:0000')
+
+    assert approval.main(['--current', str(current), str(path)]) == 1
+    out, err = capsys.readouterr()
+    assert approval.approval_hash(UNSANDBOXED) in out
+    assert 'secureScript of TRUSTED in job-1 (4 use(s)) needs approval' in err
+
+    assert approval.main(['--current', str(current), '--merge', str(path)]) == 0
+    assert capsys.readouterr()[0].startswith('2 approval(s) added to ')
+    merged = current.read_binary()
+    assert merged.startswith(b"<?xml version='1.1' encoding='UTF-8'?>\n<scriptApproval")
+    assert approval.approved_hashes(str(current)) == set(['SHA512:0000'] + list(approval.collect(rendered(tmpdir))))
+    assert b'<string>SHA512:0000</string>\n    <string>SHA512:' in merged
+    assert b'</string>\n  </approvedScriptHashes>\n  <approvedSignatures />' in merged
+
+    assert approval.main(['--current', str(current), str(path)]) == 0
+    assert capsys.readouterr()[0] == '<approvedScriptHashes />\n'
@@ -0,0 +1,122 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import cache
+
+
+GROOVY = {'script': "return ['foo']", 'sandbox': True, 'classpath': 'file:/tmp/a.jar, http://host/b.jar'}
+
+
+def test_key_is_canonical():
+    assert cache.key({'a': 1, 'b': [1, 2]}) == cache.key({'b': [1, 2], 'a': 1})
+    assert cache.key({'sandbox': True}) != cache.key({'sandbox': 1})
+    assert cache.key({'a': [1]}) != cache.key({'a': {1: None}})
+
+
+def test_graft_copy():
+    subtree_cache = cache.SubtreeCache(size=2)
+    element = Xml.Element('script')
+    subtree_cache.put('k', element)
+    element.text = 'changed'
+
+    parent = Xml.Element('parent')
+    assert not subtree_cache.graft(parent, 'other')
+    assert subtree_cache.graft(parent, 'k')
+    assert parent[0].text is None
+    assert subtree_cache.stats() == {'size': 2, 'entries': 1, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_lru_eviction():
+    subtree_cache = cache.SubtreeCache(size=2)
+    for k in ('a', 'b'):
+        subtree_cache.put(k, Xml.Element(k))
+    assert subtree_cache.graft(Xml.Element('parent'), 'a')
+    subtree_cache.put('c', Xml.Element('c'))
+    assert subtree_cache.evictions == 1
+    assert not subtree_cache.graft(Xml.Element('parent'), 'b')
+    assert subtree_cache.graft(Xml.Element('parent'), 'a')
+
+
+def test_cached_groovy_is_identical():
+    cache.subtree_cache.clear()
+    first, second = Xml.Element('parent'), Xml.Element('parent')
+    active_choice._add_groovy(first, 'P', GROOVY, None)
+    active_choice._add_groovy(second, 'P', GROOVY, None)
+    assert cache.subtree_cache.hits == 1
+    assert Xml.tostring(first) == Xml.tostring(second)
+
+
+def test_disk_cache_roundtrip(tmpdir):
+    disk_cache = cache.DiskCache(str(tmpdir))
+    data = {'name': 'P', 'project': 'p', 'groovy': GROOVY}
+    key = disk_cache.fingerprint('active-choice', data)
+    assert key == disk_cache.fingerprint('active-choice', dict(reversed(list(data.items()))))
+    assert key != disk_cache.fingerprint('active-choice-reactive', data)
+
+    rendered = Xml.Element('parent')
+    active_choice.active_choice(None, rendered, data)
+    assert not disk_cache.graft(Xml.Element('parent'), key)
+    disk_cache.put(key, rendered[0])
+
+    cached = Xml.Element('parent')
+    assert disk_cache.graft(cached, key)
+    assert Xml.tostring(cached) == Xml.tostring(rendered)
+    assert disk_cache.stats() == {'size': cache.DEFAULT_DISK_CACHE_SIZE, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_disk_cache_drops_corrupted_entries(tmpdir):
+    disk_cache = cache.DiskCache(str(tmpdir))
+    disk_cache.put('abcd', Xml.Element('parameter'))
+    path = tmpdir.join('ab', 'abcd.xml')
+    path.write(path.read().replace('parameter', 'changed'))
+    assert not disk_cache.graft(Xml.Element('parent'), 'abcd')
+    assert not path.exists()
+
+
+def test_disk_cache_evicts_least_recently_used(tmpdir):
+    disk_cache = cache.DiskCache(str(tmpdir), size=500)
+    element = Xml.Element('parameter')
+    element.text = 'x' * 80
+    for i, key in enumerate(('aa01', 'aa02', 'aa03')):
+        disk_cache.put(key, element)
+        os.utime(str(tmpdir.join('aa', key + '.xml')), (i, i))
+    assert disk_cache.graft(Xml.Element('parent'), 'aa01')
+    disk_cache.put('aa04', element)
+    assert disk_cache.evictions == 1
+    assert sorted(x.basename for x in tmpdir.join('aa').listdir()) == ['aa01.xml', 'aa03.xml', 'aa04.xml']
+
+
+def test_rendering_through_disk_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(cache, 'disk_cache', cache.DiskCache(str(tmpdir)))
+    data = {'name': 'C', 'project': 'p', 'script': 'return []', 'fallback-script': 'return []'}
+    first, second = Xml.Element('parent'), Xml.Element('parent')
+    active_choice.cascade_choice_parameter(None, first, data)
+    active_choice.cascade_choice_parameter(None, second, data)
+    assert cache.disk_cache.hits == 1
+    assert Xml.tostring(first) == Xml.tostring(second)
+
+
+def test_disk_cache_keeps_carriage_returns(tmpdir, monkeypatch):
+    monkeypatch.setattr(cache, 'disk_cache', cache.DiskCache(str(tmpdir)))
+    data = {'name': 'P', 'project': 'p', 'groovy': {'script': "def a = 1\r\nreturn ['\r']\r\n"},
+            'description': 'line\r\nline'}
+    cold, warm = Xml.Element('parent'), Xml.Element('parent')
+    active_choice.active_choice(None, cold, data)
+    active_choice.active_choice(None, warm, data)
+    assert cache.disk_cache.hits == 1
+    assert warm.find('.//secureScript/script').text == "def a = 1\r\nreturn ['\r']\r\n"
+    assert Xml.tostring(cold) == Xml.tostring(warm)
@@ -0,0 +1,108 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import canonical
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import references
+
+
+JOBS = '''
+- job:
+    name: job-a
+    parameters:
+      - active-choice:
+          name: A
+          project: p
+          groovy:
+            script: return ['a']
+            classpath: file:/a.jar, file:/b.jar
+      - active-choice-reactive-reference:
+          name: B
+          project: p
+          reference: A
+          scriptler:
+            script: b.groovy
+            parameters:
+              - P1: v1
+              - P2: v2
+
+- job:
+    name: job-b
+    parameters:
+      - string:
+          name: S
+'''
+
+
+def render(tmpdir, text=JOBS):
+    path = tmpdir.join('jobs.yaml')
+    path.write(text)
+    return dict(jobs.iter_xml(jobs.load([str(path)])))
+
+
+def as_saved_by_jenkins(xml_root):
+    # what Jenkins writes back: plugin versions, its own randomName, fields reordered, empty elements dropped
+    saved = Xml.fromstring(Xml.tostring(xml_root))
+    for parameter in saved.find(references.PARAMETERS_PATH):
+        if not parameter.tag.startswith(references.UNOCHOICE_PREFIX):
+            continue
+        parameter.set('plugin', 'uno-choice@2.1')
+        parameter.find('randomName').text = 'choice-parameter-8211497161494630'
+        for empty in [x for x in parameter if x.tag == 'parameters' and not len(x)]:
+            parameter.remove(empty)
+        parameter[:] = list(reversed(parameter))
+        for secure_script in parameter.iter('secureScript'):
+            secure_script.set('plugin', 'script-security@1.48')
+            secure_script.find('script').text += '\r\n'
+    return saved
+
+
+def test_unchanged_when_only_jenkins_formatting_differs(tmpdir):
+    rendered = render(tmpdir)['job-a']
+    assert canonical.compare(rendered, as_saved_by_jenkins(rendered)) == {}
+    assert canonical.compare(rendered, render(tmpdir)['job-b']) == {'added': ['A', 'B']}
+
+
+def test_semantic_changes(tmpdir):
+    current = as_saved_by_jenkins(render(tmpdir)['job-a'])
+    for old, new, expected in (
+            ("return ['a']", "return ['c']", {'modified': ['A']}),
+            ('file:/a.jar, file:/b.jar', 'file:/b.jar, file:/a.jar', {'modified': ['A']}),
+            ('- P1: v1\n              - P2: v2', '- P2: v2\n              - P1: v1', {'modified': ['B']}),
+            ('- P1: v1', '- v1: P1', {'modified': ['B']}),
+            ('name: B', 'name: C', {'added': ['C'], 'removed': ['B']})):
+        assert canonical.compare(render(tmpdir, JOBS.replace(old, new))['job-a'], current) == expected
+
+
+def test_ignore_script_formatting(tmpdir):
+    current = render(tmpdir)['job-a']
+    rendered = render(tmpdir, JOBS.replace("return ['a']", "return [ 'a' ]  // same"))['job-a']
+    assert canonical.compare(rendered, current) == {'modified': ['A']}
+    assert canonical.compare(rendered, current, ignore_script_formatting=True) == {}
+
+
+def test_main(tmpdir, capsys):
+    tmpdir.join('jobs.yaml').write(JOBS)
+    current = tmpdir.mkdir('current')
+    rendered = render(tmpdir)
+    current.mkdir('job-a').join('config.xml').write(Xml.tostring(as_saved_by_jenkins(rendered['job-a'])), 'wb')
+    current.join('job-b.xml').write(Xml.tostring(rendered['job-b']), 'wb')
+    assert canonical.main(['--current', str(current), str(tmpdir.join('jobs.yaml'))]) == 0
+    assert capsys.readouterr()[0] == 'job-a: unchanged\njob-b: unchanged\n'
+
+    current.join('job-b.xml').remove()
+    assert canonical.main(['--current', str(current), '--names', str(tmpdir.join('jobs.yaml'))]) == 1
+    assert capsys.readouterr()[0] == 'job-b\n'
@@ -0,0 +1,105 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import dedup
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import scriptler
+
+
+SHARED = "return ['a', 'b']"
+
+JOBS = '''
+- job-template:
+    name: 'job-{n}'
+    parameters:
+      - active-choice:
+          name: SHARED
+          project: p
+          groovy:
+            script: %s
+      - active-choice:
+          name: SPACED
+          project: p
+          groovy:
+            script: "return  [ 'c' ]"
+            sandbox: true
+      - active-choice:
+          name: SANDBOXED
+          project: p
+          groovy:
+            script: %s
+            sandbox: true
+
+- project:
+    name: fleet
+    n: [1, 2, 3]
+    jobs:
+      - 'job-{n}'
+
+- job:
+    name: other
+    parameters:
+      - active-choice:
+          name: SPACED
+          project: p
+          groovy:
+            script: "return [ 'c' ]"
+''' % (SHARED, SHARED)
+
+
+def collect(tmpdir):
+    path = tmpdir.join('jobs.yaml')
+    path.write(JOBS)
+    return dedup.collect(jobs.iter_xml(jobs.load([str(path)])))
+
+
+def test_collect(tmpdir):
+    groups = collect(tmpdir)
+    shared = groups[scriptler.script_hash(SHARED)]
+    assert len(shared.locations) == 6
+    assert shared.eligible == 3
+    assert shared.saved_bytes == 5 * len(SHARED)
+    spaced = sorted(scriptler.script_hash(x) for x in ("return  [ 'c' ]", "return [ 'c' ]"))
+    assert dedup.near_identical(groups) == [spaced]
+
+
+def test_externalize(tmpdir, monkeypatch):
+    groups = collect(tmpdir)
+    manifest = dedup.externalize(groups, str(tmpdir.join('out')), min_count=3)
+    script_id = dedup.script_id(scriptler.script_hash(SHARED))
+    assert tmpdir.join('out', script_id).read() == SHARED
+    assert json.load(open(manifest))['scripts'] == {scriptler.script_hash(SHARED): script_id}
+    assert Xml.parse(str(tmpdir.join('out', 'scriptler.xml'))).findtext('*/id') == script_id
+
+    monkeypatch.setattr(scriptler, 'manifest', scriptler.load_manifest(manifest))
+    for groovy, script_class in (({'script': SHARED}, 'ScriptlerScript'),
+                                 ({'script': SHARED, 'sandbox': True}, 'GroovyScript')):
+        parent = Xml.Element('parent')
+        active_choice.active_choice(None, parent, {'name': 'P', 'project': 'p', 'groovy': groovy})
+        assert parent.find('*/script').get('class') == 'org.biouno.unochoice.model.' + script_class
+
+
+def test_externalized_parameter_keeps_illegal_combination_error(monkeypatch):
+    monkeypatch.setattr(scriptler, 'manifest', {scriptler.script_hash(SHARED): 'jjb-shared.groovy'})
+    data = {'name': 'P', 'project': 'p', 'groovy': {'script': SHARED}, 'scriptler': {'script': 'own.groovy'}}
+    with pytest.raises(Exception) as e:
+        active_choice.active_choice(None, Xml.Element('parent'), data)
+    assert str(e.value).startswith('illegal use of both groovy/fallback and scriptler')
+    assert str(e.value) in active_choice.validate('active-choice', data)
@@ -0,0 +1,137 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import files
+
+
+@pytest.fixture
+def script_files(monkeypatch):
+    monkeypatch.setattr(files, 'script_files', files.ScriptFileCache())
+    return files.script_files
+
+
+def test_read_once_per_version(tmpdir, script_files):
+    path = tmpdir.join('a.groovy')
+    path.write(u"return ['é']".encode('utf-8'), mode='wb')
+    assert script_files.read('a.groovy', [str(tmpdir)]) == u"return ['é']"
+    assert script_files.read(str(path)) == u"return ['é']"
+    assert script_files.reads == 1
+
+    path.write('return []')
+    os.utime(str(path), (0, 0))
+    assert script_files.read('a.groovy', [str(tmpdir)]) == 'return []'
+    assert script_files.reads == 2
+
+
+def test_large_files_are_mapped(tmpdir, script_files, monkeypatch):
+    monkeypatch.setattr(files, 'MMAP_THRESHOLD', 10)
+    tmpdir.join('big.groovy').write('return ["%s"]' % ('x' * 100))
+    assert script_files.read(str(tmpdir.join('big.groovy'))) == 'return ["%s"]' % ('x' * 100)
+
+
+def test_include_path_first(tmpdir, script_files, monkeypatch):
+    for directory in ('include', 'search'):
+        tmpdir.mkdir(directory).join('a.groovy').write(directory)
+    monkeypatch.setattr(files, 'include_path', [str(tmpdir.join('include'))])
+    assert script_files.read('a.groovy', [str(tmpdir.join('search'))]) == 'include'
+    with pytest.raises(Exception) as e:
+        script_files.read('missing.groovy')
+    assert 'script file not found: missing.groovy' in str(e.value)
+
+
+def test_resolve(tmpdir, script_files):
+    tmpdir.join('a.groovy').write('return []')
+    search_path = [str(tmpdir)]
+    data = {'name': 'A', 'groovy': {'script': 'x'}}
+    assert files.resolve(data, search_path) is data
+
+    data = {'name': 'A', 'groovy': {'script-file': 'a.groovy'}, 'fallback': {'script-file': 'a.groovy'}}
+    assert files.resolve(data, search_path) == {'name': 'A', 'groovy': {'script': 'return []'},
+                                                'fallback': {'script': 'return []'}}
+    assert data['groovy'] == {'script-file': 'a.groovy'}
+    assert files.resolve({'script-file': 'a.groovy', 'fallback-script-file': 'a.groovy'}, search_path) == {
+        'script': 'return []', 'fallback-script': 'return []'}
+
+    with pytest.raises(Exception) as e:
+        files.resolve({'name': 'A', 'groovy': {'script': 'x', 'script-file': 'a.groovy'}}, search_path)
+    assert str(e.value) == 'use either script or script-file, not both in A'
+
+
+def test_render_and_validate(tmpdir, script_files):
+    tmpdir.join('a.groovy').write('return []')
+    data = {'name': 'A', 'project': 'p', 'groovy': {'script-file': str(tmpdir.join('a.groovy'))}}
+    assert active_choice.validate('active-choice', data) == []
+    parent = Xml.Element('parent')
+    active_choice.active_choice(None, parent, data)
+    assert parent.findtext('*/script/secureScript/script') == 'return []'
+
+    errors = active_choice.validate('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script-file': 'no'}})
+    assert errors[0].startswith('script file not found: no')
+
+
+@pytest.mark.parametrize('name,text', [
+    ('c.json', '{"dev": ["a", "b"], "prod": "c", "1": [2, true]}'),
+    ('c.yaml', 'dev: [a, b]\nprod: c\n1: [2, true]\n'),
+    ('c.csv', 'dev,a\ndev,b\n\nprod,c\n1,2\n1,true\n'),
+])
+def test_parse_keyed_choices(name, text):
+    assert list(files.parse_choices(name, text, True).items()) == [
+        ('dev', ['a', 'b']), ('prod', ['c']), ('1', ['2', 'true'])]
+
+
+def test_parse_choices_errors():
+    assert files.parse_choices('c.csv', 'a,x\nb\n', False) == ['a', 'b']
+    for name, text, keyed, message in [
+            ('c.json', '{"a": 1}', False, 'must hold a list, or set choices-key'),
+            ('c.yaml', '[a]', True, 'must hold a mapping when choices-key is set'),
+            ('c.csv', 'a,x\nb\n', True, 'must have two columns'),
+            ('c.yaml', '[[a]]', False, "choices must be strings or numbers, not this: '['a']'"),
+            ('c.txt', 'a', False, 'unsupported choices file c.txt')]:
+        with pytest.raises(Exception) as e:
+            files.parse_choices(name, text, keyed)
+        assert message in str(e.value)
+
+
+def test_choices_from(tmpdir, script_files, monkeypatch):
+    monkeypatch.setattr(files, 'choices_files', files.ChoicesFileCache())
+    tmpdir.join('hosts.yaml').write('eu: [a, b]\nus: [a, b]\n')
+    data = {'name': 'H', 'project': 'p', 'reference': 'REGION',
+            'groovy': {'choices-from': 'hosts.yaml', 'choices-key': 'REGION', 'sandbox': True}}
+    parent = Xml.Element('parent')
+    for _ in range(3):
+        active_choice.render_parameters(parent, [('active-choice-reactive', data)], _Parser([str(tmpdir)]))
+    assert files.choices_files.parses == 1
+    assert parent.find('.//secureScript/script').text == (
+        "// generated by jenkins-job-builder from hosts.yaml, by the value of REGION\n"
+        "def _jjb0=['a','b']\n"
+        "def _jjbChoices=['eu':_jjb0,\n'us':_jjb0]\n"
+        "return _jjbChoices.get(REGION)?:[]\n")
+
+    for groovy, message in [
+            ({'choices-from': 'hosts.yaml', 'script': 'x'}, 'use either script, script-file or choices-from'),
+            ({'choices-key': 'REGION', 'script': 'x'}, 'choices-key needs choices-from'),
+            ({'choices-from': 'hosts.yaml', 'choices-key': 'OTHER'}, "choices-key must be a referenced parameter")]:
+        errors = active_choice.validate('active-choice-reactive', dict(data, groovy=groovy), [str(tmpdir)])
+        assert message in errors[0]
+
+
+class _Parser(object):
+    def __init__(self, path):
+        self.path = path
@@ -0,0 +1,124 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import glob
+import os
+
+import pytest
+import yaml
+
+from jenkins_jobs_active_choice import groovy
+
+
+SCRIPTS = [
+    "return ['foo', 'bar']",
+    "#!/usr/bin/env groovy\n// comment\n\n\n   def x = 1 /* inline */ + 2\n   return x\n",
+    'def s = "a  ${ [1, 2].collect { "${it}  }" }.join(\' \') }  // kept"\nreturn [s]',
+    "def p = 'it''s'\ndef q = '''  a\n  // kept\n'''\nreturn [p, q]",
+    'def r = x  /  2\ndef m = s ==~ /a  \\/ b  \\d/\ndef n = (s =~ / b /)\nreturn [ r, m, n ]',
+    'def d = $/ a $$ b $/ c /* kept */ ${ x  } /$\nreturn d',
+    'def t = """\n  ${ x.collect { "  }  " } }\n"""\nif ( t ) {\n    return [ t ]\n} else {\n    return [ ]\n}',
+    'def l = a +\\\n    b\nreturn [ l ]',
+    'def x = a /b\nprintln /a  b  \\/ \'c\' // d/  // e\nx /= 2\nreturn [ x ]',
+]
+
+
+def fixture_scripts():
+    scripts = []
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', '*.yaml'))):
+        with open(path) as stream:
+            for job in yaml.safe_load(stream):
+                for parameter in job.get('job', {}).get('parameters', []):
+                    for data in parameter.values() if isinstance(parameter, dict) else []:
+                        for section in ('groovy', 'fallback'):
+                            if isinstance(data.get(section), dict) and data[section].get('script'):
+                                scripts.append(data[section]['script'])
+    return scripts
+
+
+def significant(script):
+    # what groovy sees: comments are whitespace, blank lines do not matter
+    tokens = []
+    for kind, text in groovy.tokenize(script):
+        if kind == groovy.NEWLINE and (not tokens or tokens[-1][0] == groovy.NEWLINE):
+            continue
+        if kind not in (groovy.SPACE, groovy.COMMENT):
+            tokens.append((kind, text))
+    while tokens and tokens[-1][0] == groovy.NEWLINE:
+        tokens.pop()
+    return tokens
+
+
+@pytest.mark.parametrize('script', SCRIPTS + fixture_scripts())
+def test_minify_keeps_token_stream(script):
+    assert ''.join(text for kind, text in groovy.tokenize(script)) == script
+    minified = groovy.minify(script)
+    assert significant(minified) == significant(script)
+    assert len(minified) <= len(script)
+    assert groovy.minify(minified) == minified
+
+
+def test_minify():
+    assert groovy.minify(SCRIPTS[1]) == 'def x = 1 + 2\nreturn x'
+    assert groovy.minify(SCRIPTS[6]).endswith('if (t){\nreturn [t]\n}else{\nreturn []\n}')
+
+
+def test_command_slashy_lines_are_kept():
+    assert groovy.minify(SCRIPTS[8]) == "def x = a /b\nprintln /a  b  \\/ 'c' // d/  // e\nx /= 2\nreturn [x]"
+    assert groovy.minify('def y = a / b\nreturn  y/2') == 'def y = a / b\nreturn y/2'
+
+
+def test_strings_are_kept():
+    strings = [text for kind, text in groovy.tokenize(SCRIPTS[2] + '\n' + SCRIPTS[4]) if kind == groovy.STRING]
+    assert strings == ['"a  ${ [1, 2].collect { "${it}  }" }.join(\' \') }  // kept"', r'/a  \/ b  \d/', '/ b /']
+
+
+@pytest.mark.parametrize('script', ['return "a', "return '''a", 'return /a', 'return "${ x "', '/* a'])
+def test_unterminated(script):
+    with pytest.raises(Exception) as e:
+        groovy.minify(script)
+    assert 'unterminated' in str(e.value)
+
+
+def test_minify_enabled(monkeypatch):
+    assert not groovy.minify_enabled({})
+    assert groovy.minify_enabled({'minify': True})
+    monkeypatch.setattr(groovy, '_default', True)
+    assert groovy.minify_enabled({})
+    assert not groovy.minify_enabled({'minify': 'false'})
+
+
+def test_split_imports():
+    script = '#!groovy\nimport a.B\n  import static c.D.*; def x = "import y"\n// import z\nreturn x\n'
+    assert groovy.split_imports(script) == (
+        '#!groovy\nimport a.B\nimport static c.D.*\n', '   def x = "import y"\n// import z\nreturn x\n')
+    assert groovy.split_imports('x.import\nreturn x') == ('', 'x.import\nreturn x')
+
+
+def test_split_imports_keeps_annotations():
+    script = "@Grab('a:b:1') // c\n@GrabExclude(\n  'x:y')\nimport a.B\n@Field def x = 1\nreturn x\n"
+    assert groovy.split_imports(script) == (
+        "@Grab('a:b:1')   @GrabExclude(   'x:y') import a.B\n", '@Field def x = 1\nreturn x\n')
+
+
+@pytest.mark.parametrize('script,names', [
+    ('def f(a) {\n  a\n}\nreturn [f(1)]', ['f']),
+    ('static List<String> g(String[] a)\n  throws IOException\n{\n}', ['g']),
+    ('@Memoized\nprivate String[] h() { [] }\nclass C {\n  def m() {}\n}\nenum E { X }', ['h', 'C', 'E']),
+    ('if (a) {\n} else if (b) {\n}\nsynchronized (l) {\n}\nreturn x.class', []),
+    ('def r = f(1)\nx.collect(2) { it }\nx.each { def y() {} }\nreturn f(x) {}', []),
+    ('def s = "def f() {}"\n// class C {}\nreturn [s]', []),
+])
+def test_declarations(script, names):
+    assert groovy.declarations(script) == names
@@ -0,0 +1,66 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import glob
+import os
+
+import yaml
+
+from jenkins_jobs_active_choice import importer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+REF_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'dev-files', 'ref-config.xml')
+
+
+def test_fixtures_round_trip():
+    for path in glob.glob(os.path.join(FIXTURES, '*.xml')):
+        job_name, text, problems = importer.import_file(path, 'job')
+        assert problems == [], path
+        with open(path.replace('.xml', '.yaml')) as stream:
+            expected = sum(1 for x in stream if x.strip().startswith(('- active-choice', '- cascade-choice')))
+        assert len(yaml.safe_load(text)[0]['job']['parameters']) == expected, path
+
+
+def test_jenkins_config():
+    job_name, text, problems = importer.import_file(REF_CONFIG, 'dev')
+    assert problems == [
+        ('ACTIVE_CHOICE_02', 'cannot be rendered: missing Scriptler script argument in ACTIVE_CHOICE_02'),
+        ('ACTIVE_CHOICES_REACTIVE_REF', "unsupported field 'omitValueField'"),
+    ]
+    parameters = yaml.safe_load(text)[0]['job']['parameters']
+    assert [list(x)[0] for x in parameters] == ['active-choice'] + ['active-choice-reactive'] * 3
+    assert parameters[0]['active-choice'] == {
+        'name': 'ACTIVE_CHOICE_01', 'project': '_WIP_allen_dev', 'description': 'asdfsdfj lkajsfdlk',
+        'groovy': {'script': "return [\n'choice1',\n'choice2'\n]"}, 'fallback': {'script': "return ['error']"},
+        'filterable': True}
+    assert parameters[1]['active-choice-reactive']['choice-type'] == 'multi'
+    assert parameters[2]['active-choice-reactive']['scriptler'] == {
+        'script': 'print-path.groovy', 'parameters': [{'HELPME': 'lkajklsf'}, {'P2': 'aklsfdjlksd'}]}
+
+
+def test_jenkins_home(tmpdir):
+    jobs = tmpdir.mkdir('jobs')
+    for name in ('b', os.path.join('folder', 'jobs', 'a')):
+        jobs.join(name).ensure(dir=True).join('config.xml').write(open(os.path.join(FIXTURES, 'case-001.xml')).read())
+    jobs.ensure('folder', 'config.xml').write('<com.cloudbees.hudson.plugins.folder.Folder/>')
+    for name in ('builds', 'workspace'):
+        jobs.ensure('b', name, 'x', 'config.xml').write('<project/>')
+
+    results = list(importer.run([str(jobs)], processes=2))
+    assert [(name, problems) for name, text, problems in results] == [('b', []), ('folder', []), ('folder/a', [])]
+    assert results[1][1] is None
+    assert yaml.safe_load(results[2][1])[0]['job']['name'] == 'folder/a'
+
+    assert importer.main(['--output', str(tmpdir.join('out')), str(jobs)]) == 0
+    assert sorted(x.basename for x in tmpdir.join('out').listdir()) == ['b.yaml', 'folder_a.yaml']
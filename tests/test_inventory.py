@@ -0,0 +1,78 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import shutil
+
+from jenkins_jobs_active_choice import inventory
+from jenkins_jobs_active_choice import scriptler
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def make_home(tmpdir, cases):
+    jobs = tmpdir.ensure('jobs', dir=True)
+    for name, case in cases.items():
+        shutil.copy(os.path.join(FIXTURES, case + '.xml'), str(jobs.ensure(name, dir=True).join('config.xml')))
+    return jobs
+
+
+def query(db, sql, *args):
+    return db.execute(sql, args).fetchall()
+
+
+def test_scan(tmpdir):
+    jobs = make_home(tmpdir, {'a': 'case-001', 'b': 'case-001', 'c': 'case-0016'})
+    db = inventory.connect(str(tmpdir.join('fleet.sqlite')))
+    result = inventory.scan(db, [str(jobs)], processes=2)
+    assert (result['files'], result['scanned'], result['skipped'], result['errors']) == (3, 3, 0, [])
+
+    # the same scripts in two jobs are stored once
+    used = query(db, 'SELECT COUNT(*), COUNT(DISTINCT hash) FROM script_uses')[0]
+    assert used[0] > used[1] == query(db, 'SELECT COUNT(*) FROM scripts')[0][0]
+    script = "return ['foo:selected', 'bar']\n"
+    assert query(db, 'SELECT DISTINCT p.job FROM parameters p JOIN script_uses u ON u.parameter_id = p.id '
+                     'WHERE u.hash = ? ORDER BY 1', scriptler.script_hash(script)) == [('a',), ('b',), ('c',)]
+    references = query(db, "SELECT referenced FROM parameters p JOIN parameter_references r "
+                           "ON r.parameter_id = p.id WHERE job = 'c'")
+    assert references == [('STR_PARAM',)]
+
+
+def test_incremental(tmpdir):
+    jobs = make_home(tmpdir, {'a': 'case-001', 'b': 'case-0016'})
+    db = inventory.connect(str(tmpdir.join('fleet.sqlite')))
+    inventory.scan(db, [str(jobs)])
+    parameters = query(db, 'SELECT COUNT(*) FROM parameters')
+
+    assert inventory.scan(db, [str(jobs)])['scanned'] == 0
+    assert query(db, 'SELECT COUNT(*) FROM parameters') == parameters
+
+    shutil.copy(os.path.join(FIXTURES, 'case-0016.xml'), str(jobs.join('a', 'config.xml')))
+    os.utime(str(jobs.join('a', 'config.xml')), (1, 1))
+    jobs.join('b').remove()
+    result = inventory.scan(db, [str(jobs)])
+    assert (result['scanned'], result['skipped'], result['removed']) == (1, 0, 1)
+    assert query(db, 'SELECT DISTINCT job, name FROM parameters') == [('a', 'ACTIVE_CHOICE_REACTIVE_REF_01')]
+    assert query(db, 'SELECT COUNT(*) FROM scripts WHERE hash NOT IN (SELECT hash FROM script_uses)') == [(0,)]
+
+
+def test_flat_output_with_dotted_job_names(tmpdir):
+    output = tmpdir.mkdir('out')
+    for name in ('app.deploy', 'plain', 'fixture.xml'):
+        shutil.copy(os.path.join(FIXTURES, 'case-001.xml'), str(output.join(name)))
+    output.join('README').write('not a job\n')
+    db = inventory.connect(str(output.join('fleet.sqlite')))
+    assert [x[1] for x in inventory.job_files([str(output)])] == ['app.deploy', 'fixture', 'plain']
+    assert inventory.scan(db, [str(output)])['scanned'] == 3
+    assert query(db, 'SELECT DISTINCT job FROM parameters ORDER BY 1') == [('app.deploy',), ('fixture',), ('plain',)]
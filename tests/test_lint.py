@@ -0,0 +1,120 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import glob
+import os
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import lint
+
+
+BROKEN = '''
+- parameter:
+    name: shared-choice
+    parameters:
+      - active-choice:
+          name: '{name}'
+          project: p
+          groovy:
+            sandbox: maybe
+
+- job:
+    name: broken
+    parameters:
+      - active-choice:
+          name: A
+          groovy:
+            script: return []
+            classpath: /tmp/a.jar, file:/tmp/b.jar, ftp://c.jar
+      - active-choice-reactive-reference:
+          name: B
+          project: p
+          scriptler:
+            script: s.groovy
+            parameters: P1
+          choice-type: single
+      - shared-choice:
+          name: C
+'''
+
+ENTRY_POINTS = {
+    'active-choice': active_choice.active_choice,
+    'active-choice-reactive': active_choice.active_choice_reactive,
+    'active-choice-reactive-reference': active_choice.active_choice_reactive_reference,
+    'cascade-choice': active_choice.cascade_choice_parameter,
+}
+
+INVALID = [
+    ('active-choice', {'project': 'p', 'groovy': {'script': 'x'}}),
+    ('active-choice', {'name': 'A', 'project': 'p'}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x'}, 'scriptler': {'script': 'y'}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'sandbox': 'yes'}}),
+    ('active-choice-reactive', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x'},
+                                'fallback': {'script': 'y', 'classpath': 'file:/a.jar,c.jar'}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'minify': 'yes'}}),
+    ('active-choice-reactive', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x'},
+                                'fallback': {'script': 'return "y', 'minify': True}}),
+    ('active-choice-reactive-reference', {'name': 'A', 'project': 'p', 'scriptler': {'script': ''}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'cache-ttl': '5m'}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'cache-size': 10}}),
+    ('active-choice-reactive', {'name': 'A', 'project': 'p',
+                                'groovy': {'script': 'x', 'cache-ttl': 60, 'sandbox': True}}),
+    ('active-choice-reactive', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x'},
+                                'fallback': {'script': 'y', 'cache-ttl': 60}}),
+    ('active-choice-reactive', {'name': 'A', 'project': 'p', 'reference': 'B',
+                                'groovy': {'script': 'def f(x) {\n  x\n}\nreturn [f(1)]', 'cache-ttl': 60}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'timeout': '2s'}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'timeout': 0}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'timeout': 0.0005}}),
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'timeout': float('inf')}}),
+    ('active-choice-reactive', {'name': 'A', 'project': 'p', 'groovy': {'script': 'x', 'timeout': 2},
+                                'fallback': {'script': 'class None {}\nreturn []'}}),
+    ('active-choice-reactive-reference', {'name': 'A', 'project': 'p',
+                                          'groovy': {'script': 'x', 'timeout': 2, 'sandbox': True}}),
+    ('cascade-choice', {'name': 'A', 'project': 'p'}),
+]
+
+
+def test_fixtures_are_valid():
+    fixtures = glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', '*.yaml'))
+    assert lint.lint(fixtures) == []
+
+
+@pytest.mark.parametrize('kind,data', INVALID)
+def test_validate_reports_what_rendering_raises(kind, data):
+    errors = active_choice.validate(kind, data)
+    with pytest.raises(Exception) as e:
+        ENTRY_POINTS[kind](None, Xml.Element('parent'), data)
+    assert str(e.value) in errors
+
+
+def test_all_errors_in_one_pass(tmpdir):
+    broken = tmpdir.join('broken.yaml')
+    broken.write(BROKEN)
+    valid = os.path.join(os.path.dirname(__file__), 'fixtures', 'case-001.yaml')
+
+    errors = lint.lint([valid, str(broken)], processes=2)
+    assert [(e['job'], e['parameter'], e['message']) for e in errors] == [
+        ('broken', 'A', 'missing mandatory argument project'),
+        ('broken', 'A', 'classpath entries must start with file:/... or http[s]://... : /tmp/a.jar'),
+        ('broken', 'A', 'classpath entries must start with file:/... or http[s]://... : ftp://c.jar'),
+        ('broken', 'B', 'scriptler parameters must be a list of key-value pairs in B'),
+        ('broken', 'B', "unknown choice-type 'single' in B, expected one of: bullet-list, formatted-hidden-html, "
+                        "formatted-html, input-text, numbered-list"),
+        ('broken', 'C', 'missing groovy script argument in C'),
+        ('broken', 'C', "sandbox must be true or false, not this: 'maybe'"),
+    ]
@@ -0,0 +1,198 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import multiprocessing
+import threading
+import time
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import cache
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import parallel
+from jenkins_jobs_active_choice import stats
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+FLEET = '''
+- parameter:
+    name: shared-choice
+    parameters:
+      - active-choice:
+          name: SHARED
+          project: '{project}'
+          groovy:
+            script: "return ['shared']"
+
+- job-template:
+    name: 'job-{n}'
+    parameters:
+      - shared-choice:
+          project: 'fleet-{n}'
+%s
+- project:
+    name: fleet
+    n: [%s]
+    jobs:
+      - 'job-{n}'
+'''
+
+PARAMETERS = '''      - active-choice:
+          name: A{i}
+          project: 'fleet-{{n}}'
+          groovy:
+            script: "return ['{{n}}-{i}']"
+            classpath: 'file:/lib/{i}.jar'
+      - active-choice-reactive:
+          name: B{i}
+          project: 'fleet-{{n}}'
+          reference: A{i}
+          groovy:
+            script: "return [A{i}]"
+            sandbox: true
+          fallback:
+            script: "return []"
+      - active-choice-reactive-reference:
+          name: C{i}
+          project: 'fleet-{{n}}'
+          reference: A{i},B{i}
+          scriptler:
+            script: 'c{i}.groovy'
+            parameters:
+              - P: '{{n}}'
+      - cascade-choice:
+          name: D{i}
+          project: 'fleet-{{n}}'
+          reference: C{i}
+          script: "return ['{{n}}']"
+'''
+
+
+def fleet(tmpdir, count, parameters=1):
+    path = tmpdir.join('fleet.yaml')
+    body = ''.join(PARAMETERS.format(i=i) for i in range(parameters))
+    path.write(FLEET % (body, ', '.join(str(n) for n in range(count))))
+    return jobs.load([str(path)])
+
+
+def test_chunks_are_contiguous():
+    items = list(range(10))
+    assert parallel.chunks(items, 4) == [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]
+    assert parallel.chunks(items[:2], 4) == [[0], [1]]
+    assert sum(parallel.chunks(items, 3), []) == items
+
+
+@pytest.mark.parametrize('processes', [2, 3])
+def test_parallel_output_is_identical(tmpdir, processes):
+    yaml_parser = fleet(tmpdir, 25)
+    serial = parallel.render_serial(yaml_parser)
+    assert len(serial) == 25
+    assert parallel.render(yaml_parser, processes) == serial
+
+
+def test_worker_stats_are_merged(tmpdir, monkeypatch):
+    # workers inherit the recorder and send what they recorded back with every chunk
+    recorder = stats.Recorder()
+    monkeypatch.setattr(stats, 'recorder', recorder)
+    monkeypatch.setattr(cache, 'subtree_cache', cache.SubtreeCache())
+    yaml_parser = fleet(tmpdir, 10)
+    stats.add_hook(recorder)
+    try:
+        parallel.render(yaml_parser, 2)
+    finally:
+        stats.remove_hook(recorder)
+    assert sum(entry['calls'] for entry in recorder.entries.values()) == 10 * 5
+    recorder.dump(str(tmpdir.join('stats.json')))
+    counters = json.loads(tmpdir.join('stats.json').read())['counters']['subtree_cache']
+    serial = cache.SubtreeCache()
+    monkeypatch.setattr(cache, 'subtree_cache', serial)
+    parallel.render_serial(yaml_parser)
+    assert counters['hits'] + counters['misses'] == serial.hits + serial.misses > 0
+
+
+def test_write(tmpdir):
+    rendered = parallel.render(fleet(tmpdir, 3), 2)
+    parallel.write(rendered, str(tmpdir.join('out')))
+    assert sorted(x.basename for x in tmpdir.join('out').listdir()) == ['job-0', 'job-1', 'job-2']
+    assert tmpdir.join('out', 'job-1').read_binary() == rendered[1][1]
+
+
+def test_write_folder_jobs(tmpdir):
+    rendered = [('folder/job', b'<project/>'), ('folder/nested/job', b'<flow/>'), ('top', b'<top/>')]
+    parallel.write(rendered, str(tmpdir.join('out')))
+    parallel.write(rendered, str(tmpdir.join('out')))
+    assert tmpdir.join('out', 'folder', 'job').read_binary() == b'<project/>'
+    assert tmpdir.join('out', 'folder', 'nested', 'job').read_binary() == b'<flow/>'
+    assert tmpdir.join('out', 'top').read_binary() == b'<top/>'
+
+
+def test_entry_points_from_threads(tmpdir, monkeypatch):
+    # the subtree cache, the render cache and the stats hooks are shared by all threads
+    monkeypatch.setattr(cache, 'subtree_cache', cache.SubtreeCache(size=8))
+    monkeypatch.setattr(cache, 'disk_cache', cache.DiskCache(str(tmpdir), size=64 * 1024))
+    items = [(kind, dict(data, name='%s%d' % (data['name'], i))) for i in range(50) for kind, data in BATCH]
+
+    expected = Xml.Element('parameterDefinitions')
+    for kind, data in items:
+        active_choice.ENTRY_POINTS[kind](None, expected, data)
+    expected = Xml.tostring(expected)
+
+    results = [None] * 8
+    recorder = stats.Recorder()
+
+    def render(index):
+        parent = Xml.Element('parameterDefinitions')
+        for kind, data in items:
+            active_choice.ENTRY_POINTS[kind](None, parent, data)
+        results[index] = Xml.tostring(parent)
+
+    stats.add_hook(recorder)
+    try:
+        threads = [threading.Thread(target=render, args=(i,)) for i in range(len(results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stats.remove_hook(recorder)
+
+    assert results == [expected] * len(results)
+    assert sum(entry['calls'] for entry in recorder.entries.values()) == len(results) * len(items)
+    disk_stats = cache.disk_cache.stats()
+    assert disk_stats['hits'] + disk_stats['misses'] == (len(results) + 1) * len(items)
+
+
+BATCH = [
+    ('active-choice', {'name': 'A', 'project': 'p', 'groovy': {'script': "return ['a']", 'classpath': 'file:/a.jar'}}),
+    ('active-choice-reactive', {'name': 'B', 'project': 'p', 'groovy': {'script': "return ['b']", 'sandbox': True},
+                                'fallback': {'script': 'return []'}, 'reference': 'A'}),
+    ('active-choice-reactive-reference', {'name': 'C', 'project': 'p', 'reference': 'A,B',
+                                          'scriptler': {'script': 'c.groovy', 'parameters': [{'P': 'v'}]}}),
+    ('cascade-choice', {'name': 'D', 'project': 'p', 'script': "return ['d']", 'reference': 'C'}),
+]
+
+
+@pytest.mark.skipif(multiprocessing.cpu_count() < 2, reason='needs at least two cores')
+def test_speedup_with_more_processes(tmpdir):
+    yaml_parser = fleet(tmpdir, 100, parameters=5)
+    timings = {}
+    for processes in (1, 2):
+        start = _clock()
+        parallel.render(yaml_parser, processes)
+        timings[processes] = _clock() - start
+    # two cores must pay for the pool start-up and the transfer of the yaml data and results
+    assert timings[2] < timings[1] * 0.8, timings
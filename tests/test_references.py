@@ -0,0 +1,82 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import references
+
+
+JOBS = '''
+- job:
+    name: cascade
+    parameters:
+      - string:
+          name: REGION
+      - active-choice-reactive:
+          name: ENV
+          project: p
+          groovy:
+            script: return ['a']
+          reference: REGION
+      - active-choice-reactive:
+          name: HOST
+          project: p
+          groovy:
+            script: return ['b']
+          reference: ENV, REGION
+      - active-choice-reactive-reference:
+          name: INFO
+          project: p
+          scriptler:
+            script: info.groovy
+          reference: HOST,MISSING
+      - active-choice-reactive:
+          name: LOOP_A
+          project: p
+          groovy:
+            script: return []
+          reference: LOOP_B
+      - active-choice-reactive:
+          name: LOOP_B
+          project: p
+          groovy:
+            script: return []
+          reference: LOOP_A
+'''
+
+
+def load_graph(tmpdir):
+    path = tmpdir.join('jobs.yaml')
+    path.write(JOBS)
+    [(name, xml_root)] = list(jobs.iter_xml(jobs.load([str(path)])))
+    return references.ReferenceGraph(xml_root)
+
+
+def test_graph(tmpdir):
+    graph = load_graph(tmpdir)
+    assert graph.dangling() == [('INFO', 'MISSING')]
+    assert graph.cycles() == [['LOOP_A', 'LOOP_B']]
+    fanout = graph.fanout()
+    assert fanout['REGION'] == (3, len("return ['a']") + len("return ['b']"))
+    assert fanout['ENV'][0] == 2
+    assert fanout['INFO'] == (0, 0)
+    assert graph.affected('LOOP_A') == ['LOOP_B']
+
+
+def test_check_levels(tmpdir):
+    graph = load_graph(tmpdir)
+    problems = references.check('cascade', graph, max_fanout=2)
+    assert [(level, name) for level, job, name, message in problems] == [
+        ('error', 'LOOP_A'), ('warning', 'INFO'), ('warning', 'REGION')]
+    problems = references.check('cascade', graph, max_fanout=2, fail=True, strict=True)
+    assert [level for level, job, name, message in problems] == ['error'] * 3
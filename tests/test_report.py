@@ -0,0 +1,122 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+import stat
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import jobs
+from jenkins_jobs_active_choice import report
+
+
+JOBS = '''
+- job:
+    name: small
+    parameters:
+      - active-choice:
+          name: A
+          project: p
+          scriptler:
+            script: s.groovy
+            parameters:
+              - P: v
+- job:
+    name: large
+    parameters:
+      - string:
+          name: S
+      - active-choice-reactive:
+          name: B
+          project: p
+          reference: S
+          groovy:
+            script: "return ['%s']"
+            classpath: file:/lib/a.jar
+          fallback:
+            script: "return []"
+      - cascade-choice:
+          name: C
+          project: p
+          script: "return ['c']"
+''' % ('x' * 1000)
+
+
+def load(tmpdir):
+    path = tmpdir.join('jobs.yaml')
+    path.write(JOBS)
+    return str(path)
+
+
+def test_breakdown():
+    parent = Xml.Element('parent')
+    active_choice.active_choice_reactive(None, parent, {
+        'name': 'B', 'project': 'p', 'groovy': {'script': 'return []', 'classpath': 'file:/a.jar'},
+        'fallback': {'script': 'return'}})
+    parts = report.breakdown(parent[0])
+    assert sum(parts.values()) == len(Xml.tostring(parent[0], encoding='utf-8'))
+    assert parts['classpath'] == len(b'<classpath><entry>file:/a.jar</entry></classpath>')
+    assert parts['script'] == len(b'<secureScript><script>return []</script><sandbox>false</sandbox></secureScript>')
+    assert parts['fallback'] == len(b'<secureFallbackScript><script>return</script>'
+                                    b'<sandbox>false</sandbox></secureFallbackScript>')
+    assert parts['scriptler'] == 0
+
+
+def test_collect(tmpdir):
+    small, large = report.collect(jobs.load([load(tmpdir)]))
+    assert (small.name, large.name) == ('small', 'large')
+    assert list(small.kinds) == ['active-choice']
+    assert small.totals()['scriptler'] > 0 and small.totals()['script'] == 0
+    assert list(large.kinds) == ['active-choice-reactive', 'cascade-choice']
+    assert large.kinds['cascade-choice']['parameters'] == 1
+    assert large.totals()['script'] > 1000
+    assert large.totals()['total'] < large.size
+
+    assert large.over_budget({'script': 1000, 'fallback': 1000}) == {'script': large.totals()['script']}
+    assert not small.over_budget({'script': 1000})
+
+
+def test_prometheus_labels():
+    job = report.JobReport('folder/"quoted"\\job')
+    job('cascade-choice', Xml.fromstring('<p><name>C</name></p>'), 0.0)
+    text = report.prometheus([job], {'total': 1})
+    assert 'jjb_active_choice_bytes{job="folder/\\"quoted\\"\\\\job",kind="cascade-choice",part="other"} 21\n' in text
+    assert 'jjb_active_choice_parameters{job="folder/\\"quoted\\"\\\\job",kind="cascade-choice"} 1\n' in text
+    assert 'jjb_active_choice_over_budget{job="folder/\\"quoted\\"\\\\job",part="total"} 1\n' in text
+    assert text.count('# TYPE ') == 4
+
+
+def test_main(tmpdir, capsys):
+    path = load(tmpdir)
+    assert report.main(['--top', '1', path]) == 0
+    assert capsys.readouterr()[0].startswith('large: ')
+
+    prom = tmpdir.join('jjb.prom')
+    assert report.main(['--budget', 'script=1000', '--json', '-', '--prometheus', str(prom), path]) == 1
+    out, err = capsys.readouterr()
+    result = json.loads(out)
+    assert result['budgets'] == {'script': 1000}
+    assert [(x['name'], sorted(x['over_budget'])) for x in result['jobs']] == [('small', []), ('large', ['script'])]
+    assert err == '1 job(s) over budget\n'
+    assert 'jjb_active_choice_over_budget{job="large",part="script"} 1' in prom.read()
+
+
+def test_written_files_are_readable_by_others(tmpdir):
+    umask = os.umask(0o022)
+    try:
+        report.write_atomically(str(tmpdir.join('jjb.prom')), 'x 1\n')
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(str(tmpdir.join('jjb.prom'))).st_mode) == 0o644
@@ -0,0 +1,131 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# every input dimension is grown geometrically and the measured cost fitted on a log-log scale:
+# a slope of 1 is linear, 2 quadratic. The limits leave room for timer noise, not for a worse order,
+# and a time fit above its limit is measured again before failing: a slower order fails every attempt.
+import gc
+import math
+import time
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import cache
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+SIZES = [2 ** k for k in range(5)]
+MAX_TIME_SLOPE = 1.5
+MAX_MEMORY_SLOPE = 1.2
+REPEAT = 5
+ATTEMPTS = 3
+
+
+def slope(sizes, values):
+    """Returns the least squares slope of log(values) against log(sizes)."""
+    xs = [math.log(x) for x in sizes]
+    ys = [math.log(max(y, 1e-9)) for y in values]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    return (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) /
+            sum((x - mean_x) ** 2 for x in xs))
+
+
+def classpath(n):
+    return {'name': 'P', 'project': 'p',
+            'groovy': {'script': 'return []', 'classpath': ', '.join('file:/lib/%d.jar' % i for i in range(n))}}
+
+
+def scriptler_parameters(n):
+    return {'name': 'P', 'project': 'p',
+            'scriptler': {'script': 's.groovy', 'parameters': [{'P%d' % i: 'value %d' % i} for i in range(n)]}}
+
+
+def script(n, minify=False):
+    body = ''.join("// line %d\ndef v%d = \"${x} %d\" + /a\\/b/  // end\n" % (i, i, i) for i in range(n))
+    return {'name': 'P', 'project': 'p', 'groovy': {'script': body + 'return []', 'minify': minify}}
+
+
+DIMENSIONS = [
+    # (name, input for a size, base size)
+    ('classpath', classpath, 1000),
+    ('scriptler parameters', scriptler_parameters, 1000),
+    ('script', script, 2000),
+    ('minified script', lambda n: script(n, minify=True), 200),
+]
+
+
+def render(data):
+    parent = Xml.Element('parameterDefinitions')
+    active_choice.active_choice(None, parent, data)
+    return parent
+
+
+def measure_time(data):
+    best = None
+    for _ in range(REPEAT):
+        gc.collect()
+        start = _clock()
+        render(data)
+        elapsed = _clock() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_memory(data):
+    tracemalloc.start()
+    try:
+        parent = render(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del parent
+    return peak
+
+
+@pytest.fixture(autouse=True)
+def no_subtree_cache(monkeypatch):
+    # every render has to build its subtree, a cache hit would hide the cost being measured
+    monkeypatch.setattr(cache, 'subtree_cache', cache.SubtreeCache(size=0))
+
+
+def test_slope():
+    assert abs(slope(SIZES, [3.0 * x for x in SIZES]) - 1) < 1e-9
+    assert abs(slope(SIZES, [x * x for x in SIZES]) - 2) < 1e-9
+
+
+@pytest.mark.parametrize('name,make,base', DIMENSIONS, ids=[x[0] for x in DIMENSIONS])
+def test_time_is_linear(name, make, base):
+    sizes = [base * x for x in SIZES]
+    inputs = [make(n) for n in sizes]
+    render(inputs[0])
+    for _ in range(ATTEMPTS):
+        times = [measure_time(x) for x in inputs]
+        if slope(sizes, times) < MAX_TIME_SLOPE:
+            break
+    assert slope(sizes, times) < MAX_TIME_SLOPE, '%s: %s' % (name, ', '.join('%.2gs' % x for x in times))
+
+
+@pytest.mark.skipif(tracemalloc is None, reason='tracemalloc is not available')
+@pytest.mark.parametrize('name,make,base', DIMENSIONS, ids=[x[0] for x in DIMENSIONS])
+def test_memory_is_linear(name, make, base):
+    sizes = [base * x for x in SIZES]
+    peaks = [measure_memory(make(n)) for n in sizes]
+    assert slope(sizes, peaks) < MAX_MEMORY_SLOPE, '%s: %s' % (name, ', '.join('%d bytes' % x for x in peaks))
@@ -0,0 +1,113 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import xml.etree.ElementTree as Xml
+
+import pytest
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import cache
+from jenkins_jobs_active_choice import scriptler
+
+
+CATALOG = '''<?xml version='1.1' encoding='UTF-8'?>
+<scriptler-config plugin="scriptler@3.5">
+  <scriptSet>
+    <org.jenkinsci.plugins.scriptler.config.Script>
+      <id>hosts.groovy</id>
+      <name>hosts</name>
+      <parameters>
+        <org.jenkinsci.plugins.scriptler.config.Parameter>
+          <name>REGION</name>
+          <value>eu</value>
+        </org.jenkinsci.plugins.scriptler.config.Parameter>
+        <org.jenkinsci.plugins.scriptler.config.Parameter>
+          <name>LIMIT</name>
+          <value>10</value>
+        </org.jenkinsci.plugins.scriptler.config.Parameter>
+      </parameters>
+    </org.jenkinsci.plugins.scriptler.config.Script>
+    <org.jenkinsci.plugins.scriptler.config.Script>
+      <id>gone.groovy</id>
+      <parameters/>
+    </org.jenkinsci.plugins.scriptler.config.Script>
+  </scriptSet>
+</scriptler-config>
+'''
+
+
+@pytest.fixture
+def catalog(tmpdir, monkeypatch):
+    tmpdir.join('scriptler.xml').write(CATALOG)
+    tmpdir.mkdir('scripts').join('hosts.groovy').write('return [REGION]')
+    loaded = scriptler.load_catalog(str(tmpdir.join('scriptler.xml')))
+    monkeypatch.setattr(scriptler, 'catalog', loaded)
+    return loaded
+
+
+def _data(script, parameters=None):
+    return {'name': 'P', 'project': 'p', 'scriptler': {'script': script, 'parameters': parameters}}
+
+
+def test_load_catalog(catalog):
+    assert catalog.scripts == {'hosts.groovy': frozenset(['REGION', 'LIMIT']), 'gone.groovy': frozenset()}
+    assert catalog.missing == frozenset(['gone.groovy'])
+
+
+def test_unknown_scripts_are_errors(catalog):
+    for script, error in (('host.groovy', "unknown scriptler script 'host.groovy' in P"),
+                          ('gone.groovy', "the file of scriptler script 'gone.groovy' is missing in P")):
+        assert active_choice.validate('active-choice', _data(script)) == [error]
+        with pytest.raises(Exception) as e:
+            active_choice.active_choice(None, Xml.Element('parent'), _data(script))
+        assert str(e.value) == error
+
+
+def test_parameter_names(catalog):
+    data = _data('hosts.groovy', [{'REGION': 'us'}, {'REGOIN': 'eu'}])
+    assert active_choice.validate('active-choice', data) == [
+        "scriptler script 'hosts.groovy' has no parameter 'REGOIN' in P"]
+    assert catalog.unknown == {}
+
+    parent = Xml.Element('parent')
+    active_choice.active_choice(None, parent, data)
+    active_choice.active_choice_reactive(None, parent, dict(data, name='Q'))
+    active_choice.active_choice_reactive(None, parent, dict(_data('hosts.groovy', [{'REGION': 'us'},
+                                                                                   {'LIMIT': 1}]), name='R'))
+    assert catalog.unknown == {('hosts.groovy', 'REGOIN'): ['P', 'Q']}
+    assert catalog.unused == {('hosts.groovy', 'LIMIT'): ['P', 'Q']}
+    assert catalog.summary() == [
+        'parameter REGOIN passed to scriptler script hosts.groovy but not declared, in P and 1 more',
+        'parameter LIMIT declared by scriptler script hosts.groovy but never passed, in P and 1 more',
+    ]
+
+
+def test_report_at_exit(catalog, caplog):
+    catalog.check('P', {'script': 'hosts.groovy'})
+    with caplog.at_level(logging.WARNING):
+        scriptler._report_at_exit(catalog)
+    assert [x.getMessage() for x in caplog.records] == [
+        'parameter LIMIT declared by scriptler script hosts.groovy but never passed, in P',
+        'parameter REGION declared by scriptler script hosts.groovy but never passed, in P',
+    ]
+
+
+def test_cached_parameters_are_checked(catalog, tmpdir, monkeypatch):
+    monkeypatch.setattr(cache, 'disk_cache', cache.DiskCache(str(tmpdir.join('cache'))))
+    data = _data('hosts.groovy', [{'REGION': 'us'}])
+    for _ in range(2):
+        active_choice.active_choice(None, Xml.Element('parent'), data)
+    assert cache.disk_cache.hits == 1
+    assert catalog.unused == {('hosts.groovy', 'LIMIT'): ['P', 'P']}
@@ -0,0 +1,64 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import stats
+
+
+PARAMETER = {
+    'name': 'P',
+    'project': 'p',
+    'groovy': {'script': u"return ['\u00e9']"},
+    'fallback': {'script': "return []"},
+}
+
+
+def test_recorder(tmpdir):
+    recorder = stats.Recorder()
+    stats.add_hook(recorder)
+    try:
+        parent = Xml.Element('parent')
+        active_choice.active_choice(None, parent, PARAMETER)
+        active_choice.active_choice(None, parent, PARAMETER)
+        active_choice.cascade_choice_parameter(None, parent, {'name': 'C', 'project': 'p', 'script': 'return []'})
+    finally:
+        stats.remove_hook(recorder)
+
+    assert sorted(recorder.entries) == ['active-choice', 'cascade-choice']
+    entry = recorder.entries['active-choice']
+    assert entry['calls'] == 2
+    assert entry['script_bytes'] == 2 * (len(u"return ['\u00e9']".encode('utf-8')) + len("return []"))
+    assert entry['seconds'] > 0
+
+    path = str(tmpdir.join('stats.json'))
+    recorder.dump(path)
+    dumped = json.loads(tmpdir.join('stats.json').read())
+    assert dumped['active-choice']['calls'] == 2
+    assert sorted(dumped['counters']['subtree_cache']) == ['evictions', 'hits', 'misses']
+    assert 'render_cache' not in dumped['counters']
+
+
+def test_counters(monkeypatch):
+    monkeypatch.setattr(stats, '_counters', {})
+    stats.add_counters('on', lambda: {'hits': 1})
+    stats.add_counters('off', lambda: None)
+    assert stats.counters() == {'on': {'hits': 1}}
+
+
+def test_no_hooks_keeps_entry_point_metadata():
+    assert active_choice.active_choice.__name__ == 'active_choice'
+    assert active_choice.active_choice.__doc__.startswith('yaml: active-choice\n')
@@ -0,0 +1,99 @@
+# Copyright 2016 Bulat Gaifullin
+#
+# This file is part of jenkins-job-builder-active-choice
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import collections
+import xml.etree.ElementTree as Xml
+
+from jenkins_jobs_active_choice import active_choice
+from jenkins_jobs_active_choice import cache
+from jenkins_jobs_active_choice import templates
+
+
+def test_groovy_string():
+    assert templates.groovy_string("it's a \\ test\n") == "'it\\'s a \\\\ test\\n'"
+
+
+def test_reference_names():
+    assert templates.reference_names(' A, B ,,') == ['A', 'B']
+    assert templates.reference_names(None) == []
+
+
+def test_memoize():
+    script = "import a.B\nreturn B.values() // last line"
+    wrapped = templates.memoize(script, 'P', "o'brien", 'A,B', 60, 10)
+    assert wrapped.startswith('import a.B\n// generated by jenkins-job-builder')
+    assert "computeIfAbsent('jjb.active-choice.cache'," in wrapped
+    assert "computeIfAbsent((binding.variables.get('jenkinsProject')?.fullName ?: 'o\\'brien') + '/' + 'P'," in wrapped
+    assert '_jjbCacheRegistry.size() > %d' % templates.CACHE_STORES in wrapped
+    assert "[binding.variables.get('A'), binding.variables.get('B')].toString()" in wrapped
+    assert '< 60000L' in wrapped and '> 10 ||' in wrapped
+    # the closure ends on its own line, after the trailing comment of the script
+    assert 'def _jjbResult = {\nreturn B.values() // last line\n}.call()\n' in wrapped
+    assert wrapped.endswith('return _jjbResult\n')
+    assert templates.memoize(script + ' ', 'P', 's', 'A', 60) != templates.memoize(script, 'P', 's', 'A', 60)
+
+
+def test_result_cache_is_per_parameter(monkeypatch):
+    # equal groovy sections share a cached subtree, the generated wrapper must not
+    monkeypatch.setattr(cache, 'subtree_cache', cache.SubtreeCache())
+    groovy = {'script': 'return []', 'cache-ttl': 60, 'classpath': 'file:/a.jar'}
+    parent = Xml.Element('parent')
+    for name in ('A', 'B'):
+        active_choice.active_choice_reactive(None, parent, {'name': name, 'project': 'p', 'groovy': groovy,
+                                                            'reference': 'R'})
+    scripts = [x.text for x in parent.iter('script') if x.text]
+    assert "?: 'choice-param-p-a') + '/' + 'A'" in scripts[0]
+    assert "?: 'choice-param-p-b') + '/' + 'B'" in scripts[1]
+
+
+def test_timeout():
+    wrapped = templates.timeout("import a.B\nreturn B.values()", "o'brien", 's', 1.5,
+                                "#!/usr/bin/env groovy\nimport a.B\nimport c.D\nreturn [D.NONE]")
+    assert wrapped.startswith('import a.B\nimport c.D\n// generated by jenkins-job-builder')
+    assert '_jjbFuture.get(1500L, java.util.concurrent.TimeUnit.MILLISECONDS)' in wrapped
+    assert "computeIfAbsent('jjb.active-choice.executors'," in wrapped
+    assert "computeIfAbsent((binding.variables.get('jenkinsProject')?.fullName ?: 's'), {" in wrapped
+    assert '_jjbExecutorRegistry.get(_jjbExecutorEldest).shutdown()' in wrapped
+    assert '        try {\nreturn B.values()\n        } finally {' in wrapped
+    assert '    return {\nreturn [D.NONE]\n    }.call()' in wrapped
+    assert "_jjbLog.fine('o\\'brien' + ': script took '" in wrapped
+    assert '    return {\nreturn []\n    }.call()' in templates.timeout('return [1]', 'P', 's', 2)
+
+
+def test_timeout_runs_outside_of_result_cache():
+    groovy = {'script': 'return []', 'cache-ttl': 60, 'timeout': 2}
+    parent = Xml.Element('parent')
+    active_choice.active_choice(None, parent, {'name': 'A', 'project': 'p', 'groovy': groovy})
+    script = parent.find('.//secureScript/script').text
+    assert script.index('_jjbExecutor') < script.index('_jjbCache')
+
+
+def test_lookup_of_thousands_of_values_is_built_in_chunks():
+    choices = collections.OrderedDict(
+        ('host-%05d' % i, ['a-%d' % (i % 7), 'b-%d' % (i % 7)] if i % 2 else ['c-%d' % i]) for i in range(5000))
+    script = templates.lookup(choices, 'hosts.yaml', 'REGION')
+    lines = script.splitlines()
+    assert lines[1] == 'def _jjbShared=[]'
+    assert "{_jjbShared.addAll([['a-1','b-1'],\n['a-3','b-3']," in script
+    assert "'host-00001':_jjbShared[0]" in script and "'host-00002':['c-2']" in script
+    chunks = script.split('}.call()')[:-1]
+    assert len(chunks) > 5
+    # each closure is a method of its own, kept far below the 64KB bytecode limit
+    assert all(x.count("'") // 2 <= templates.LOOKUP_CHUNK for x in chunks)
+    assert lines[-1] == 'return _jjbChoices.get(REGION)?:[]'
+    assert sum(x.count("'host-") for x in chunks) == 5000
+
+    script = templates.lookup(['v%d' % i for i in range(2500)], 'values.txt')
+    assert script.count('{_jjbChoices.addAll([') == 3 and script.endswith('}.call()\nreturn _jjbChoices\n')
+    assert templates.lookup(['a', 'b'], 'values.txt').endswith("\nreturn ['a','b']\n")